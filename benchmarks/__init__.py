@@ -0,0 +1,3 @@
+"""
+Performance benchmarks and long-run harnesses for the host application.
+"""
@@ -0,0 +1,220 @@
+"""
+Headless GUI Module
+
+Builds a MotorControlGUI that can run without a display.
+
+With a display (a real one or Xvfb), the real Tk window is created and
+withdrawn. Without one, the instance is assembled from the same services as
+MotorControlGUI.__init__ through its create_variables(), setup_services() and
+start_background_tasks() methods, and only the Tk objects are replaced by the
+small stand-ins below. The host-side logic then runs unchanged, while widget
+rendering costs are not included.
+
+Classes:
+    StubVar: tk.StringVar stand-in.
+    StubMaster: Root window stand-in that records after() callbacks.
+    StubText: tk.Text stand-in modelling lines, tag ranges and tag configuration.
+"""
+
+import itertools
+import logging
+import tkinter as tk
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StubVar:
+    """
+    tk.StringVar stand-in.
+
+    Attributes:
+        writes (int): Number of set() calls.
+    """
+    def __init__(self, value: str = "") -> None:
+        self._value = value
+        self.writes = 0
+
+    def get(self) -> str:
+        return self._value
+
+    def set(self, value: str) -> None:
+        self._value = value
+        self.writes += 1
+
+
+class StubMaster:
+    """
+    Root window stand-in.
+
+    after() callbacks are recorded, not run; run_pending() fires the due ones,
+    which lets a harness drive the GUI's periodic callbacks in virtual time.
+
+    Attributes:
+        now_ms (float): Virtual clock (ms).
+        pending (dict): after id -> (due ms, callback, args).
+    """
+    def __init__(self) -> None:
+        self.now_ms = 0.0
+        self.pending: Dict[str, Tuple[float, Callable, tuple]] = {}
+        self._ids = itertools.count()
+
+    def after(self, ms: int, func: Callable, *args) -> str:
+        after_id = f"after#{next(self._ids)}"
+        self.pending[after_id] = (self.now_ms + ms, func, args)
+        return after_id
+
+    def after_cancel(self, after_id: str) -> None:
+        self.pending.pop(after_id, None)
+
+    def run_pending(self, advance_ms: float = 0.0) -> int:
+        """
+        Advance the virtual clock and run every due callback once.
+
+        :param advance_ms: Time to advance (ms).
+        :return: Number of callbacks run.
+        """
+        self.now_ms += advance_ms
+        due = [(after_id, entry) for after_id, entry in self.pending.items() if entry[0] <= self.now_ms]
+        for after_id, (_, func, args) in sorted(due, key=lambda item: item[1][0]):
+            del self.pending[after_id]
+            func(*args)
+        return len(due)
+
+    def protocol(self, name: str, func: Callable) -> None:
+        pass
+
+    def destroy(self) -> None:
+        self.pending.clear()
+
+
+class StubText:
+    """
+    tk.Text stand-in implementing the calls made by MotorControlGUI.log_message.
+
+    Like Tk, deleting text drops a tag's ranges but not its configuration, so
+    tag_names() grows with every distinct tag ever configured.
+
+    Attributes:
+        lines (list): Text lines (the last one is the open line).
+        tag_ranges (dict): Tag name -> list of (start, end) line indices.
+        tag_options (dict): Tag name -> configured options.
+    """
+    def __init__(self) -> None:
+        self.lines: List[str] = [""]
+        self.tag_ranges: Dict[str, List[Tuple[int, int]]] = {}
+        self.tag_options: Dict[str, dict] = {}
+
+    def configure(self, **options) -> None:
+        pass
+
+    def insert(self, index: str, text: str, *tags: str) -> None:
+        first = len(self.lines)
+        parts = text.split("\n")
+        self.lines[-1] += parts[0]
+        self.lines.extend(parts[1:])
+        for name in tags:
+            self.tag_ranges.setdefault(name, []).append((first, len(self.lines) - 1))
+
+    def index(self, index: str) -> str:
+        # Only 'end-1c' is used: the position just before the final newline.
+        return f"{len(self.lines)}.{len(self.lines[-1])}"
+
+    def delete(self, start: str, end: str) -> None:
+        first = int(start.split(".")[0])
+        last = int(end.split(".")[0])
+        removed = last - first
+        del self.lines[first - 1:last - 1]
+        for name, ranges in self.tag_ranges.items():
+            self.tag_ranges[name] = [(a - removed, b - removed) for a, b in ranges if a >= last]
+
+    def tag_add(self, name: str, start: str, end: str) -> None:
+        line = int(start.split(".")[0])
+        self.tag_ranges.setdefault(name, []).append((line, line))
+
+    def tag_config(self, name: str, **options) -> None:
+        self.tag_options.setdefault(name, {}).update(options)
+
+    tag_configure = tag_config
+
+    def tag_names(self) -> Tuple[str, ...]:
+        names = dict.fromkeys(self.tag_options)
+        names.update(dict.fromkeys(self.tag_ranges))
+        return ("sel",) + tuple(names)
+
+    def see(self, index: str) -> None:
+        pass
+
+
+def display_available() -> bool:
+    """
+    Check whether Tk can open a window (DISPLAY set and reachable).
+
+    :return: True if a real Tk root can be created.
+    """
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return False
+    root.destroy()
+    return True
+
+
+def build_gui(serial_comm, real_tk: bool = False, session_store=None, capture_session=None):
+    """
+    Create a MotorControlGUI for a harness.
+
+    :param serial_comm: SerialInterface (usually connected to a PtyDevice).
+    :param real_tk: Use a real, withdrawn Tk window instead of the stand-ins.
+    :param session_store: Optional SessionStore.
+    :param capture_session: Replaces the SSH CaptureSession (e.g. a simulated camera).
+    :return: (gui, master) tuple; master is the tk root or a StubMaster.
+    """
+    from gui.gui import MotorControlGUI
+
+    if real_tk:
+        import ttkbootstrap as ttkb
+
+        root = ttkb.Window(themename="superhero")
+        root.withdraw()
+        gui = MotorControlGUI(root, serial_comm, session_store, capture_session=capture_session)
+        return gui, root
+
+    from gui.gui import LOG_COLORS
+    from gui.ui_monitor import LoopLagMonitor
+
+    # Only the Tk parts of MotorControlGUI.__init__ are replaced; the services are the real ones.
+    master = StubMaster()
+    gui = MotorControlGUI.__new__(MotorControlGUI)
+    gui.master = master
+    gui.serial = serial_comm
+    gui.session_store = session_store
+    gui.ui_monitor = LoopLagMonitor(master)
+    gui.profiler = None
+    gui.create_variables(StubVar)
+    gui.setup_services(capture_session=capture_session)
+    gui.text_log = StubText()
+    for level, color in LOG_COLORS.items():
+        gui.text_log.tag_config(f"log_{level}", foreground=color)
+    gui.start_background_tasks()
+    return gui, master
+
+
+def shutdown_gui(gui, master) -> None:
+    """
+    Release what build_gui() started, mirroring MotorControlGUI.on_closing without the dialog.
+
+    :param gui: GUI returned by build_gui().
+    :param master: Master returned by build_gui().
+    """
+    gui.stop_event.set()
+    gui.command_thread.join(timeout=1)
+    if gui.profiler:
+        gui.profiler.stop()
+    gui.ui_monitor.uninstall()
+    gui.capture_session.close()
+    for subscription in gui.bus.subscriptions():
+        gui.bus.unsubscribe(subscription)
+    if gui.session_store:
+        gui.session_store.close()
+    master.destroy()
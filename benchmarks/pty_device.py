@@ -0,0 +1,215 @@
+"""
+Pty Device Module
+
+Exposes the emulated firmware on a Linux pseudo-terminal, so the host code is
+exercised through the real pyserial/termios stack (serial.Serial opens the
+slave path exactly like /dev/ttyACM0) instead of an in-process object.
+
+The bridge thread forwards every byte written by the host to a
+SimulatedSerialDevice and copies its output back to the pty. Like the board,
+the emulated firmware never waits for the host: while nobody reads the port
+(e.g. during a reconnect) its output is buffered up to MAX_PENDING_BYTES and
+then dropped, oldest lines first. flood() writes pre-rendered lines straight
+to the master end, waiting for the host, to measure raw ingest.
+
+At high time scales the emulated firmware is CPU bound; PtyDeviceProcess
+serves it from a child process so it does not compete with the host threads
+for the GIL (the real board is a separate device, too).
+
+Classes:
+    PtyDevice: SimulatedSerialDevice served on a pty.
+    PtyDeviceProcess: PtyDevice served from a child process.
+"""
+
+import multiprocessing
+import os
+import select
+import threading
+import tty
+from typing import Iterable, Optional
+
+from gui.simulator import SIM_DEFAULT_BAUD, SimulatedSerialDevice
+
+POLL_INTERVAL_S = 0.001     # Bridge wake-up period when neither side has data.
+MAX_PENDING_BYTES = 65536   # Device output held while the host is not reading.
+
+
+class PtyDevice:
+    """
+    SimulatedSerialDevice served on a pseudo-terminal.
+
+    Usage:
+        with PtyDevice() as device:
+            serial_if = SerialInterface(port=device.port)
+
+    Attributes:
+        device (SimulatedSerialDevice): Emulated firmware behind the pty.
+        port (str): Slave path to open with serial.Serial.
+        forwarded_in (int): Bytes forwarded from the host to the device.
+        forwarded_out (int): Bytes forwarded from the device to the host.
+        dropped_out (int): Device output bytes dropped while the host was not reading.
+    """
+    def __init__(self, device: Optional[SimulatedSerialDevice] = None) -> None:
+        self.device = device or SimulatedSerialDevice(baudrate=SIM_DEFAULT_BAUD, timeout=0)
+        self.port = ""
+        self.forwarded_in = 0
+        self.forwarded_out = 0
+        self.dropped_out = 0
+        self._master = -1
+        self._slave = -1
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._write_lock = threading.Lock()
+
+    def __enter__(self) -> "PtyDevice":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Open the pty pair and start the bridge thread."""
+        self._master, self._slave = os.openpty()
+        # Raw mode: no echo, no CR/LF translation, no line buffering.
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        os.set_blocking(self._master, False)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._bridge, name="pty-device", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop the bridge and close both ends."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self.device.close()
+        for fd in (self._master, self._slave):
+            if fd >= 0:
+                os.close(fd)
+        self._master = self._slave = -1
+
+    def _write(self, data: bytes) -> None:
+        with self._write_lock:
+            view = memoryview(data)
+            while view:
+                select.select([], [self._master], [])
+                try:
+                    written = os.write(self._master, view)
+                except BlockingIOError:
+                    continue
+                view = view[written:]
+        self.forwarded_out += len(data)
+
+    def flood(self, lines: Iterable[str]) -> None:
+        """
+        Write lines to the host as fast as the pty accepts them (blocks on a full buffer).
+
+        :param lines: Lines without terminator; CRLF is appended like Serial.println.
+        """
+        self._write("".join(f"{line}\r\n" for line in lines).encode("utf-8"))
+
+    def _bridge(self) -> None:
+        device = self.device
+        pending = bytearray()
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._master], [], [], POLL_INTERVAL_S)
+            if readable:
+                try:
+                    data = os.read(self._master, 4096)
+                except BlockingIOError:
+                    data = b""
+                except OSError:
+                    break
+                self.forwarded_in += len(data)
+                device.write(data)
+            while device.in_waiting:
+                line = device.readline()
+                if not line:
+                    break
+                pending += line
+            # flood() holds the lock while it waits for the host; keep the firmware running meanwhile.
+            if pending and self._write_lock.acquire(blocking=False):
+                try:
+                    written = os.write(self._master, pending)
+                except BlockingIOError:
+                    written = 0
+                finally:
+                    self._write_lock.release()
+                del pending[:written]
+                self.forwarded_out += written
+            if len(pending) > MAX_PENDING_BYTES:
+                cut = pending.find(b"\n", len(pending) - MAX_PENDING_BYTES) + 1
+                del pending[:cut]
+                self.dropped_out += cut
+
+
+def _serve(device_kwargs: dict, conn, stop, sim_time) -> None:
+    device = PtyDevice(SimulatedSerialDevice(**device_kwargs))
+    device.start()
+    conn.send(device.port)
+    try:
+        while not stop.wait(0.05):
+            sim_time.value = device.device.sim_time
+    finally:
+        device.close()
+
+
+class PtyDeviceProcess:
+    """
+    PtyDevice served from a child process.
+
+    Attributes:
+        device_kwargs (dict): SimulatedSerialDevice arguments (timeout defaults to 0).
+        port (str): Slave path to open with serial.Serial.
+    """
+    def __init__(self, **device_kwargs) -> None:
+        self.device_kwargs = dict({"baudrate": SIM_DEFAULT_BAUD, "timeout": 0}, **device_kwargs)
+        self.port = ""
+        context = multiprocessing.get_context("spawn")
+        self._context = context
+        self._stop = context.Event()
+        self._sim_time = context.Value("d", 0.0)
+        self._process: Optional[multiprocessing.Process] = None
+
+    def __enter__(self) -> "PtyDeviceProcess":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def sim_time(self) -> float:
+        """Simulated seconds of the emulated firmware (updated every 50 ms)."""
+        return self._sim_time.value
+
+    def start(self, timeout: float = 10.0) -> None:
+        """
+        Start the child process and wait for its pty.
+
+        :param timeout: Longest wait for the child to report the port (s).
+        :raises RuntimeError: If the child does not come up.
+        """
+        receiver, sender = self._context.Pipe(duplex=False)
+        self._process = self._context.Process(target=_serve, name="pty-device",
+                                              args=(self.device_kwargs, sender, self._stop, self._sim_time),
+                                              daemon=True)
+        self._process.start()
+        sender.close()
+        if not receiver.poll(timeout):
+            self.close()
+            raise RuntimeError("Device process did not start")
+        self.port = receiver.recv()
+        receiver.close()
+
+    def close(self) -> None:
+        """Stop the child process."""
+        self._stop.set()
+        if self._process:
+            self._process.join(timeout=2)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
@@ -0,0 +1,414 @@
+"""
+Benchmark Runner
+
+End-to-end performance benchmarks for the host application, run headless on
+Linux against a pty-backed device stand-in (PtyDevice):
+
+    serial_ingest     Lines/s from the pty through SerialInterface onto the bus.
+    line_parsing      parse_distance() and SerialInterface._dispatch() rates.
+    gui_queue_drain   MotorControlGUI.process_queue() rate for mixed firmware lines.
+    command_dispatch  Send-to-ACK latency, direct and through the GUI command queue.
+    log_insert        MotorControlGUI.log_message() rate into the log widget.
+
+The GUI benchmarks use a real (withdrawn) Tk window when a display is
+available, e.g. under xvfb-run, and the stand-ins from headless.py otherwise;
+the mode is recorded in the results and only results of the same mode are
+compared.
+
+Results are written as JSON and compared with a baseline; any metric worse
+than the baseline by more than the threshold fails the run. Absolute numbers
+only mean something on the machine that produced them, so a baseline whose
+machine (Python, platform, CPU count) differs from the current one is shown
+for information and never fails the run; create a local baseline first:
+
+    python -m benchmarks.run_benchmarks --update-baseline  # local baseline from the current numbers
+    python -m benchmarks.run_benchmarks                    # compare with baseline.json
+    python -m benchmarks.run_benchmarks --threshold 10     # stricter (percent)
+
+CPU-bound metrics are also divided by a calibration score, a fixed pure-Python
+workload timed around each run in the same process, so load from other
+processes or a throttled CPU moves both and cancels out in the comparison.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# gui.gui configures file logging at import; keep benchmark runs out of logs/app.log.
+logging.basicConfig(level=logging.WARNING)
+
+from gui.event_bus import ACK, DISTANCE, LATEST_ONLY, SERIAL_LINE, STATE, EventBus
+from gui.serial_comm import SerialInterface, parse_distance
+from gui.simulator import SIM_DEFAULT_BAUD, SimulatedSerialDevice
+
+from .headless import build_gui, display_available, shutdown_gui
+from .pty_device import PtyDevice
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCH_DIR, "results", "latest.json")
+DEFAULT_THRESHOLD_PCT = 25.0  # Allowed regression before a metric fails.
+DEFAULT_REPEAT = 3            # Runs per benchmark; the median is reported.
+CALIBRATION_LOOPS = 20000     # Iterations of the calibration workload (~0.1 s).
+MACHINE_KEYS = ("python", "platform", "machine", "cpus")  # Meta that must match for a gated comparison.
+
+# Representative firmware output: mostly telemetry, some acks and state lines.
+LINE_MIX = (
+    ["Current distance: 12.34 cm"] * 16
+    + ["Command received: PUMP_ON", "Vacuum pump ON.", "Auto mode activated.",
+       "Upper limit reached. Moving down.", "Lower limit reached. Dwelling for capture.",
+       "Capture confirmed. Moving up.", "Max speed set to: 800.00 steps/s.", "TRAJ_OK 12"]
+)
+
+
+def metric(value: float, unit: str, higher_is_better: bool, tk: bool = False, cpu_bound: bool = False) -> dict:
+    """
+    One benchmark measurement.
+
+    :param value: Measured value.
+    :param unit: Unit label.
+    :param higher_is_better: Direction used by the regression check.
+    :param tk: Depends on the Tk mode (real window or stand-ins).
+    :param cpu_bound: Scales with CPU speed, so it is normalised by the calibration score.
+    :return: Metric dict as stored in the results file.
+    """
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better, "tk": tk, "cpu_bound": cpu_bound}
+
+
+def calibrate(loops: int = CALIBRATION_LOOPS) -> float:
+    """
+    Time a fixed pure-Python workload (line splitting, float parsing, dict updates).
+
+    :param loops: Iterations of the workload.
+    :return: Iterations per second on this machine, right now.
+    """
+    counts: Dict[str, float] = {}
+    start = time.perf_counter()
+    for i in range(loops):
+        words = LINE_MIX[i % len(LINE_MIX)].split()
+        key = words[0]
+        counts[key] = counts.get(key, 0.0) + float(len(words)) * 1.5
+    return loops / (time.perf_counter() - start)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _pty_serial(device: Optional[SimulatedSerialDevice] = None):
+    """Start a PtyDevice and connect a SerialInterface to it through pyserial."""
+    pty = PtyDevice(device)
+    pty.start()
+    serial_comm = SerialInterface(port=pty.port, baudrate=SIM_DEFAULT_BAUD)
+    if not serial_comm.connect():
+        pty.close()
+        raise RuntimeError(f"Could not open {pty.port}")
+    return pty, serial_comm
+
+
+def _quiet_device() -> SimulatedSerialDevice:
+    """Device stand-in without periodic telemetry, so only the benchmark traffic flows."""
+    return SimulatedSerialDevice(baudrate=SIM_DEFAULT_BAUD, timeout=0, telemetry_interval=1e6)
+
+
+def bench_serial_ingest(lines: int = 20000, **_) -> Dict[str, dict]:
+    pty, serial_comm = _pty_serial(_quiet_device())
+    subscription = serial_comm.bus.subscribe(SERIAL_LINE, name="bench", maxsize=lines + 1000)
+    payload = [LINE_MIX[i % len(LINE_MIX)] for i in range(lines)]
+    try:
+        start = time.perf_counter()
+        writer = threading.Thread(target=pty.flood, args=(payload,), daemon=True)
+        writer.start()
+        received = 0
+        while received < lines:
+            if subscription.get(timeout=5.0) is None:
+                raise RuntimeError(f"Ingest stalled after {received}/{lines} lines")
+            received += 1
+        elapsed = time.perf_counter() - start
+        writer.join()
+        bus = serial_comm.bus.stats()
+    finally:
+        serial_comm.disconnect()
+        pty.close()
+    return {
+        "lines_per_s": metric(lines / elapsed, "lines/s", True, cpu_bound=True),
+        "publish_us": metric(bus["mean_publish_us"], "us", False),
+    }
+
+
+def bench_line_parsing(lines: int = 100000, **_) -> Dict[str, dict]:
+    payload = [LINE_MIX[i % len(LINE_MIX)] for i in range(lines)]
+    start = time.perf_counter()
+    for line in payload:
+        parse_distance(line)
+    parse_rate = lines / (time.perf_counter() - start)
+
+    # Same subscriber topology as the GUI (polled, so handler threads do not skew timing).
+    serial_comm = SerialInterface(port="BENCH", bus=EventBus())
+    bus = serial_comm.bus
+    subscriptions = [
+        bus.subscribe(SERIAL_LINE, name="gui", maxsize=5000),
+        bus.subscribe(SERIAL_LINE, name="trajectory-streamer", maxsize=1000),
+        bus.subscribe(DISTANCE, name="distance-controller", policy=LATEST_ONLY),
+        bus.subscribe((DISTANCE, STATE), name="capture-scheduler", maxsize=1000),
+        bus.subscribe((DISTANCE, STATE), name="cycle-tracker", maxsize=5000),
+    ]
+    start = time.perf_counter()
+    for i, line in enumerate(payload):
+        serial_comm._dispatch(line)
+        if i % 500 == 0:
+            for subscription in subscriptions:
+                subscription.drain()
+    dispatch_rate = lines / (time.perf_counter() - start)
+    return {
+        "parse_lines_per_s": metric(parse_rate, "lines/s", True, cpu_bound=True),
+        "dispatch_lines_per_s": metric(dispatch_rate, "lines/s", True, cpu_bound=True),
+    }
+
+
+def bench_gui_queue_drain(lines: int = 5000, passes: int = 10, real_tk: bool = False, **_) -> Dict[str, dict]:
+    serial_comm = SerialInterface(port="BENCH", bus=EventBus())
+    gui, master = build_gui(serial_comm, real_tk=real_tk)
+    payload = [LINE_MIX[i % len(LINE_MIX)] for i in range(lines)]
+    elapsed = 0.0
+    try:
+        for _ in range(passes):
+            for line in payload:
+                serial_comm._dispatch(line)
+            start = time.perf_counter()
+            gui.process_queue()
+            if real_tk:
+                master.update_idletasks()
+            elapsed += time.perf_counter() - start
+    finally:
+        shutdown_gui(gui, master)
+    return {"lines_per_s": metric(lines * passes / elapsed, "lines/s", True, tk=True, cpu_bound=True)}
+
+
+def _ack_latencies(serial_comm: SerialInterface, send: Callable[[str], bool], count: int,
+                   spacing: float = 0.0) -> List[float]:
+    """Send alternating commands and time each one until its ACK is published."""
+    acks = serial_comm.bus.subscribe(ACK, name="bench-acks", maxsize=100)
+    latencies = []
+    try:
+        for i in range(count):
+            command = "PUMP_ON" if i % 2 else "PUMP_OFF"
+            start = time.perf_counter()
+            if not send(command):
+                raise RuntimeError(f"{command} was rejected")
+            while True:
+                event = acks.get(timeout=2.0)
+                if event is None:
+                    raise RuntimeError(f"No ACK for {command}")
+                if event.payload == command:
+                    break
+            latencies.append(1000 * (time.perf_counter() - start))
+            if spacing:
+                time.sleep(spacing)
+    finally:
+        serial_comm.bus.unsubscribe(acks)
+    return latencies
+
+
+def bench_command_dispatch(commands: int = 200, gui_commands: int = 25, real_tk: bool = False,
+                           **_) -> Dict[str, dict]:
+    pty, serial_comm = _pty_serial(_quiet_device())
+    gui = master = None
+    try:
+        direct = _ack_latencies(serial_comm, serial_comm.send_command, commands)
+        gui, master = build_gui(serial_comm, real_tk=real_tk)
+        # Space the GUI commands past the throttle so none are rejected.
+        queued = _ack_latencies(serial_comm, gui.send_command, gui_commands, spacing=gui.command_throttle)
+    finally:
+        if gui:
+            shutdown_gui(gui, master)
+        serial_comm.disconnect()
+        pty.close()
+    return {
+        "direct_p50_ms": metric(statistics.median(direct), "ms", False),
+        "direct_p95_ms": metric(percentile(direct, 95), "ms", False),
+        "gui_queue_p50_ms": metric(statistics.median(queued), "ms", False),
+        "gui_queue_p95_ms": metric(percentile(queued, 95), "ms", False),
+    }
+
+
+def bench_log_insert(messages: int = 3000, real_tk: bool = False, **_) -> Dict[str, dict]:
+    serial_comm = SerialInterface(port="BENCH", bus=EventBus())
+    gui, master = build_gui(serial_comm, real_tk=real_tk)
+    levels = ("INFO", "INFO", "INFO", "WARNING", "ERROR")
+    try:
+        start = time.perf_counter()
+        for i in range(messages):
+            gui.log_message(f"Benchmark message {i}", level=levels[i % len(levels)])
+        if real_tk:
+            master.update_idletasks()
+        elapsed = time.perf_counter() - start
+        tags = len(gui.text_log.tag_names())
+    finally:
+        shutdown_gui(gui, master)
+    return {
+        "messages_per_s": metric(messages / elapsed, "msg/s", True, tk=True, cpu_bound=True),
+        "tags": metric(tags, "tags", False, tk=True),
+    }
+
+
+BENCHMARKS: Dict[str, Callable[..., Dict[str, dict]]] = {
+    "serial_ingest": bench_serial_ingest,
+    "line_parsing": bench_line_parsing,
+    "gui_queue_drain": bench_gui_queue_drain,
+    "command_dispatch": bench_command_dispatch,
+    "log_insert": bench_log_insert,
+}
+
+
+def run(names: Optional[List[str]] = None, repeat: int = DEFAULT_REPEAT, real_tk: bool = False) -> dict:
+    """
+    Run the benchmarks.
+
+    :param names: Benchmarks to run (default: all).
+    :param repeat: Runs per benchmark; each metric reports the median.
+    :param real_tk: Use a real Tk window for the GUI benchmarks.
+    :return: Results dict: {"meta": {...}, "metrics": {"bench.metric": metric(...)}}; CPU-bound
+        metrics also carry "normalized", the median of value / calibration score.
+    """
+    metrics: Dict[str, dict] = {}
+    for name in names or list(BENCHMARKS):
+        runs, scores = [], []
+        for _ in range(repeat):
+            before = calibrate()
+            runs.append(BENCHMARKS[name](real_tk=real_tk))
+            scores.append((before + calibrate()) / 2)
+        for key, first in runs[0].items():
+            value = statistics.median(r[key]["value"] for r in runs)
+            metrics[f"{name}.{key}"] = dict(first, value=value)
+            if first["cpu_bound"]:
+                metrics[f"{name}.{key}"]["normalized"] = statistics.median(
+                    r[key]["value"] / score for r, score in zip(runs, scores))
+            print(f"{name}.{key}: {value:.4g} {first['unit']}", flush=True)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "tk": "real" if real_tk else "stub",
+            "repeat": repeat,
+        },
+        "metrics": metrics,
+    }
+
+
+def machine_mismatch(results: dict, baseline: dict) -> List[str]:
+    """
+    List the machine properties that differ between a baseline and the current results.
+
+    :param results: Output of run().
+    :param baseline: Previously stored output of run().
+    :return: One "key: baseline -> current" entry per differing MACHINE_KEYS entry.
+    """
+    return [f"{key}: {baseline['meta'].get(key)} -> {results['meta'].get(key)}"
+            for key in MACHINE_KEYS if baseline["meta"].get(key) != results["meta"].get(key)]
+
+
+def compare(results: dict, baseline: dict, threshold_pct: float = DEFAULT_THRESHOLD_PCT) -> List[dict]:
+    """
+    Compare results with a baseline.
+
+    Metrics missing from either side are skipped, as are Tk-dependent metrics
+    when the Tk modes differ. The change of a metric normalised on both sides
+    is computed from the normalised values; nothing is marked as regressed
+    when the baseline comes from another machine (see machine_mismatch()).
+
+    :param results: Output of run().
+    :param baseline: Previously stored output of run().
+    :param threshold_pct: Allowed change in the bad direction (percent).
+    :return: One dict per compared metric with name, baseline, value, change_pct and regressed.
+    """
+    same_tk = results["meta"].get("tk") == baseline["meta"].get("tk")
+    same_machine = not machine_mismatch(results, baseline)
+    rows = []
+    for name, current in results["metrics"].items():
+        reference = baseline["metrics"].get(name)
+        if reference is None or (current.get("tk") and not same_tk):
+            continue
+        normalized = "normalized" in current and "normalized" in reference
+        base, value = (reference["normalized"], current["normalized"]) if normalized else \
+            (reference["value"], current["value"])
+        change_pct = 100.0 * (value - base) / base if base else 0.0
+        worse = -change_pct if current["higher_is_better"] else change_pct
+        rows.append({"name": name, "baseline": reference["value"], "value": current["value"],
+                     "unit": current["unit"], "change_pct": change_pct, "normalized": normalized,
+                     "regressed": same_machine and worse > threshold_pct})
+    return rows
+
+
+def save(results: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Host application performance benchmarks")
+    parser.add_argument("--only", action="append", choices=list(BENCHMARKS),
+                        help="Run only this benchmark (repeatable)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per benchmark (median reported)")
+    parser.add_argument("--tk", choices=("auto", "real", "stub"), default="auto",
+                        help="Tk mode for the GUI benchmarks (auto: real if a display is available)")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write the results JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD_PCT,
+                        help="Allowed regression per metric, in percent")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to the baseline")
+    args = parser.parse_args(argv)
+
+    if sys.platform != "linux":
+        parser.error("The pty device stand-in requires Linux.")
+    real_tk = args.tk == "real" or (args.tk == "auto" and display_available())
+    results = run(args.only, args.repeat, real_tk)
+    save(results, args.output)
+    print(f"Results written to {args.output} (Tk: {results['meta']['tk']}).")
+
+    if args.update_baseline:
+        save(results, args.baseline)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.threshold)
+    print(f"{'metric':40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regressed"] else ""
+        basis = "*" if row["normalized"] else " "
+        print(f"{row['name']:40} {row['baseline']:12.4g} {row['value']:12.4g} "
+              f"{row['change_pct']:+7.1f}%{basis}{flag}")
+    print("* change of the value normalised by the calibration score")
+    mismatch = machine_mismatch(results, baseline)
+    if mismatch:
+        print(f"Baseline {args.baseline} comes from another machine ({'; '.join(mismatch)}); "
+              f"changes are for information only. Run with --update-baseline to create a local baseline.")
+        return 0
+    regressions = [row["name"] for row in rows if row["regressed"]]
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    print(f"No regressions beyond {args.threshold:g}%.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
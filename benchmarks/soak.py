@@ -0,0 +1,515 @@
+"""
+Soak Test Harness
+
+Runs the full host stack for the equivalent of a long shift at accelerated
+time and checks that it stays healthy:
+
+- The emulated firmware (SimulatedSerialDevice with time_scale) runs the auto
+  cycle behind a pty in a child process (PtyDeviceProcess), so
+  SerialInterface, the event bus, every consumer subscription, the capture
+  scheduler and the GUI handlers see shift-length traffic in minutes.
+- Captures go through the real CaptureSession with a simulated SSH client
+  (SimulatedCamera), including dropped connections.
+- The serial port is yanked periodically, so the GUI health check has to
+  reconnect like it would after a cable glitch.
+- The operator toggles the pump now and then, which goes through the GUI
+  command queue.
+
+Every sample records traced Python memory (tracemalloc), RSS, thread count,
+open file descriptors, Tk object counts (text tags, pending after() callbacks,
+widgets), queue depths and open SSH clients. After a warm-up period the first
+sample becomes the reference. Counts (threads, descriptors, Tk objects, SSH
+clients) may not grow beyond their budget by the end; the Python heap may not
+grow faster than its budget in KB per simulated hour, fitted by least squares
+over the samples from the reference on, so a slow leak fails however long the
+run and a one-off allocation does not. The bounded buffers that legitimately
+fill during a shift (the cycle history and the log lines) are measured in every
+sample and left out of the fitted heap, so the soak runs the shipped settings.
+On failure the top allocation sites since the reference are listed.
+
+    python -m benchmarks.soak                        # 8 h at 60x (about 8 min)
+    python -m benchmarks.soak --hours 24 --time-scale 120
+    xvfb-run python -m benchmarks.soak --tk real     # real Tk widgets
+
+Classes:
+    SimulatedCamera: SSH client factory emulating the Raspberry Pi capture script.
+    SoakRun: One soak run with its samples and budget check.
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter
+from typing import Dict, List, Optional
+
+# gui.gui configures file logging at import; keep soak runs out of logs/app.log.
+logging.basicConfig(level=logging.ERROR)
+
+import psutil
+
+from gui.gui import RASPBERRY_IP
+from gui.serial_comm import SerialInterface
+from gui.session_store import SessionStore
+from gui.simulator import SIM_DEFAULT_BAUD
+from remote_capture import CaptureSession
+
+from .headless import build_gui, display_available, shutdown_gui
+from .pty_device import PtyDeviceProcess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_PATH = os.path.join(BENCH_DIR, "results", "soak.json")
+TICK_S = 0.02                 # Harness loop period (wall s).
+SAMPLE_MINUTES = 15.0         # Simulated minutes between samples.
+WARMUP_MINUTES = 60.0         # Simulated minutes before the reference sample (connections and caches settled).
+RECONNECT_MINUTES = 45.0      # Simulated minutes between forced port drops.
+OPERATOR_MINUTES = 10.0       # Simulated minutes between pump toggles.
+TRACE_FRAMES = 10             # Stack depth kept by tracemalloc.
+TOP_SITES = 10                # Allocation sites reported on failure.
+
+# Allowed growth from the reference sample to the end of the run; keys ending
+# in RATE_SUFFIX bound the growth slope of the sampled quantity instead.
+RATE_SUFFIX = "_per_h"
+DEFAULT_BUDGETS = {
+    "heap_kb_per_h": 64.0,    # Python heap (tracemalloc) minus bounded buffers, KB per simulated hour.
+    "threads": 2,             # Capture/warm-up workers may be alive at sampling time.
+    "fds": 2,
+    "tk_objects": 20,         # Text tags + pending after() callbacks + widgets.
+    "ssh_clients": 1,
+}
+
+
+def growth_rate(samples: List[dict], key: str) -> float:
+    """
+    Least-squares slope of a sampled quantity against simulated time.
+
+    :param samples: Samples with sim_hours and `key`.
+    :param key: Sampled quantity.
+    :return: Growth per simulated hour (0 with fewer than two distinct times).
+    """
+    hours = [s["sim_hours"] for s in samples]
+    values = [s[key] for s in samples]
+    mean_h = sum(hours) / len(hours)
+    mean_v = sum(values) / len(values)
+    spread = sum((h - mean_h) ** 2 for h in hours)
+    if not spread:
+        return 0.0
+    return sum((h - mean_h) * (v - mean_v) for h, v in zip(hours, values)) / spread
+
+
+class _SimulatedTransport:
+    def __init__(self) -> None:
+        self.active = True
+
+    def is_active(self) -> bool:
+        return self.active
+
+    def set_keepalive(self, interval: int) -> None:
+        pass
+
+
+class _SimulatedChannel:
+    def __init__(self, status: int) -> None:
+        self.status = status
+        self.closed = False
+
+    def recv_exit_status(self) -> int:
+        return self.status
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _SimulatedStream:
+    def __init__(self, lines: List[str], delay: float, status: int = 0) -> None:
+        self.lines = lines
+        self.delay = delay
+        self.channel = _SimulatedChannel(status)
+
+    def __iter__(self):
+        time.sleep(self.delay)
+        return iter(self.lines)
+
+    def read(self) -> bytes:
+        return b""
+
+    def close(self) -> None:
+        pass
+
+
+class _SimulatedSSHClient:
+    """paramiko.SSHClient stand-in created by SimulatedCamera.client()."""
+    def __init__(self, camera: "SimulatedCamera") -> None:
+        self.camera = camera
+        self.transport: Optional[_SimulatedTransport] = None
+        self.channels: List[_SimulatedChannel] = []
+
+    def set_missing_host_key_policy(self, policy) -> None:
+        pass
+
+    def connect(self, host: str, username: Optional[str] = None, password: Optional[str] = None) -> None:
+        time.sleep(self.camera.connect_time / self.camera.time_scale)
+        self.transport = _SimulatedTransport()
+        self.camera.opened += 1
+
+    def get_transport(self) -> Optional[_SimulatedTransport]:
+        return self.transport
+
+    def exec_command(self, command: str):
+        camera = self.camera
+        if camera.rng.random() < camera.drop_rate:
+            self.transport.active = False
+            raise EOFError("Simulated connection drop")
+        stdout = _SimulatedStream(["cam0 ok", "cam1 ok"], camera.exec_time / camera.time_scale)
+        self.channels.append(stdout.channel)
+        # Like paramiko, a transport only keeps its open channels.
+        self.channels = [c for c in self.channels if not c.closed]
+        camera.captures += 1
+        return _SimulatedStream([], 0.0), stdout, _SimulatedStream([], 0.0)
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.active = False
+            self.transport = None
+            self.camera.closed += 1
+
+
+class SimulatedCamera:
+    """
+    Emulates the Raspberry Pi side of a capture for CaptureSession(client_factory=camera.client).
+
+    Attributes:
+        time_scale (float): Simulated seconds per wall-clock second.
+        connect_time (float): SSH connection setup time (simulated s).
+        exec_time (float): Capture script run time (simulated s).
+        drop_rate (float): Probability that a capture finds the connection dropped.
+        opened (int): Connections established.
+        closed (int): Connections closed.
+        captures (int): Capture scripts run.
+    """
+    def __init__(self, time_scale: float = 1.0, connect_time: float = 1.5, exec_time: float = 0.5,
+                 drop_rate: float = 0.02, seed: Optional[int] = None) -> None:
+        self.time_scale = time_scale
+        self.connect_time = connect_time
+        self.exec_time = exec_time
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self.opened = 0
+        self.closed = 0
+        self.captures = 0
+
+    @property
+    def open_clients(self) -> int:
+        return self.opened - self.closed
+
+    def client(self) -> _SimulatedSSHClient:
+        return _SimulatedSSHClient(self)
+
+
+def deep_size(*objects) -> int:
+    """
+    Memory held by objects and everything they reference, each object counted once.
+
+    Classes, modules and functions are not followed, so only data is counted.
+
+    :param objects: Roots to measure.
+    :return: Size in bytes.
+    """
+    seen = set()
+    stack = list(objects)
+    size = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType)):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return size
+
+
+def bounded_buffers(gui) -> list:
+    """
+    Containers that fill up to a fixed size during a shift and then stay there.
+
+    :param gui: MotorControlGUI.
+    :return: The cycle history (HISTORY_CYCLES) and, with the stand-ins, the log lines (LOG_MAX_LINES).
+    """
+    tracker = gui.cycle_tracker
+    buffers = [tracker.history, tracker._recent]
+    # A real Tk text widget keeps its lines in Tcl memory, outside tracemalloc.
+    if hasattr(gui.text_log, "lines"):
+        buffers += [gui.text_log.lines, gui.text_log.tag_ranges]
+    return buffers
+
+
+def open_fds() -> int:
+    """Open file descriptors of this process."""
+    return len(os.listdir("/proc/self/fd"))
+
+
+def tk_objects(gui, master) -> Dict[str, int]:
+    """
+    Count the Tk objects that can accumulate in a long session.
+
+    :param gui: MotorControlGUI.
+    :param master: Tk root or StubMaster.
+    :return: Dict with tags, after_callbacks, widgets and log_lines.
+    """
+    log_lines = int(gui.text_log.index("end-1c").split(".")[0])
+    tags = len(gui.text_log.tag_names())
+    if hasattr(master, "pending"):
+        return {"tags": tags, "after_callbacks": len(master.pending), "widgets": 0, "log_lines": log_lines}
+    widgets, stack = 0, [master]
+    while stack:
+        widget = stack.pop()
+        children = widget.winfo_children()
+        widgets += len(children)
+        stack.extend(children)
+    after_callbacks = len(master.tk.splitlist(master.tk.call("after", "info")))
+    return {"tags": tags, "after_callbacks": after_callbacks, "widgets": widgets, "log_lines": log_lines}
+
+
+class SoakRun:
+    """
+    One accelerated soak run.
+
+    Attributes:
+        hours (float): Simulated duration (h).
+        time_scale (float): Simulated seconds per wall-clock second.
+        real_tk (bool): Drive a real Tk window instead of the stand-ins.
+        budgets (dict): Allowed growth (or growth per hour) per sampled quantity.
+        samples (list): Recorded samples.
+        rates (dict): Fitted growth per hour of the RATE_SUFFIX budgets.
+        failures (list): Budget violations found by check().
+        top_sites (list): Largest allocation growth since the reference sample.
+    """
+    def __init__(self, hours: float = 8.0, time_scale: float = 60.0, real_tk: bool = False,
+                 budgets: Optional[Dict[str, float]] = None, db: bool = False, seed: int = 1) -> None:
+        self.hours = hours
+        self.time_scale = time_scale
+        self.real_tk = real_tk
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self.db = db
+        self.seed = seed
+        self.samples: List[dict] = []
+        self.rates: Dict[str, float] = {}
+        self.failures: List[str] = []
+        self.top_sites: List[str] = []
+        self._reference: Optional[tracemalloc.Snapshot] = None
+        self._last: Optional[tracemalloc.Snapshot] = None
+        self._process = psutil.Process()
+
+    def _sample(self, sim_s: float, wall_s: float, gui, master, serial_comm, camera) -> dict:
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        threads = threading.enumerate()
+        tk = tk_objects(gui, master)
+        traced_kb = tracemalloc.get_traced_memory()[0] / 1024
+        bounded_kb = deep_size(*bounded_buffers(gui)) / 1024
+        sample = {
+            "sim_hours": sim_s / 3600,
+            "wall_s": wall_s,
+            "traced_kb": traced_kb,
+            "bounded_kb": bounded_kb,
+            "heap_kb": traced_kb - bounded_kb,
+            "rss_kb": self._process.memory_info().rss / 1024,
+            "threads": len(threads),
+            "thread_names": dict(Counter(t.name.split("-")[0] if t.name.startswith("Thread-") else t.name
+                                         for t in threads)),
+            "fds": open_fds(),
+            "tk": tk,
+            "tk_objects": tk["tags"] + tk["after_callbacks"] + tk["widgets"],
+            "command_queue": gui.command_queue.qsize(),
+            "bus_pending": sum(s.pending for s in gui.bus.subscriptions()),
+            "cycles": gui.cycle_tracker.completed,
+            "ssh_clients": camera.open_clients,
+            "captures": camera.captures,
+            "serial_lines": serial_comm.stats.lines,
+        }
+        if self._reference is None and sim_s >= WARMUP_MINUTES * 60:
+            self._reference = snapshot
+            sample["reference"] = True
+        self._last = snapshot
+        self.samples.append(sample)
+        return sample
+
+    def run(self) -> bool:
+        """
+        Run the soak and check the budgets.
+
+        :return: True if every quantity stayed within its budget.
+        """
+        rng = random.Random(self.seed)
+        device = PtyDeviceProcess(time_scale=self.time_scale, seed=self.seed)
+        device.start()
+        tracemalloc.start(TRACE_FRAMES)
+        camera = SimulatedCamera(self.time_scale, seed=self.seed)
+        serial_comm = SerialInterface(port=device.port, baudrate=SIM_DEFAULT_BAUD)
+        serial_comm.connect()
+        db_dir = tempfile.TemporaryDirectory() if self.db else None
+        store = SessionStore(os.path.join(db_dir.name, "soak.db"), port=device.port) if db_dir else None
+        # SimulatedCamera has no SFTP side; the soak covers the capture and RESUME path only.
+        session = CaptureSession(RASPBERRY_IP, client_factory=camera.client, fetch=False)
+        gui, master = build_gui(serial_comm, self.real_tk, store, session)
+        gui.activate_auto()
+
+        # The device clock drives the run: if the host cannot keep up with time_scale,
+        # the firmware waits for it and the run simply takes longer.
+        duration = self.hours * 3600
+        start = time.monotonic()
+        last_sim = 0.0
+        next_sample = 0.0
+        next_reconnect = RECONNECT_MINUTES * 60
+        next_operator = OPERATOR_MINUTES * 60
+        pump_on = False
+        try:
+            while True:
+                wall = time.monotonic() - start
+                sim = device.sim_time
+                if self.real_tk:
+                    master.update()
+                else:
+                    master.run_pending(advance_ms=(sim - last_sim) * 1000)
+                last_sim = sim
+                if sim >= next_sample or sim >= duration:
+                    sample = self._sample(sim, wall, gui, master, serial_comm, camera)
+                    print(f"{sample['sim_hours']:6.2f} h  heap {sample['heap_kb']:9.1f} KB  "
+                          f"bounded {sample['bounded_kb']:7.1f} KB  "
+                          f"threads {sample['threads']:3}  fds {sample['fds']:3}  "
+                          f"tk {sample['tk_objects']:4}  cycles {sample['cycles']:5}  "
+                          f"ssh {sample['ssh_clients']}  ({sim / max(wall, 1e-9):.0f}x)", flush=True)
+                    next_sample += SAMPLE_MINUTES * 60
+                if sim >= duration:
+                    break
+                if sim >= next_reconnect:
+                    # Yank the port; the GUI health check must reconnect.
+                    serial_comm.serial_conn.close()
+                    next_reconnect += RECONNECT_MINUTES * 60
+                if sim >= next_operator:
+                    pump_on = not pump_on
+                    if pump_on:
+                        gui.pump_on()
+                    else:
+                        gui.pump_off()
+                    next_operator += OPERATOR_MINUTES * 60 * rng.uniform(0.5, 1.5)
+                time.sleep(TICK_S)
+        finally:
+            shutdown_gui(gui, master)
+            serial_comm.disconnect()
+            device.close()
+            if db_dir:
+                db_dir.cleanup()
+        self.check()
+        tracemalloc.stop()
+        return not self.failures
+
+    def check(self) -> List[str]:
+        """
+        Compare the last sample with the reference sample, and the growth
+        slope of the samples since the reference with the rate budgets.
+
+        :return: Budget violations (also stored in failures).
+        """
+        reference = next((s for s in self.samples if s.get("reference")), None)
+        if reference is None or reference is self.samples[-1]:
+            self.failures = ["Run too short: no samples after the warm-up."]
+            return self.failures
+        last = self.samples[-1]
+        steady = self.samples[self.samples.index(reference):]
+        self.failures = []
+        self.rates = {}
+        for key, budget in self.budgets.items():
+            if key.endswith(RATE_SUFFIX):
+                quantity = key[:-len(RATE_SUFFIX)]
+                rate = self.rates[key] = growth_rate(steady, quantity)
+                if rate > budget:
+                    self.failures.append(f"{quantity} grew by {rate:.1f} per hour (budget {budget}) over "
+                                         f"{len(steady)} samples: {reference[quantity]:.1f} -> {last[quantity]:.1f}")
+                continue
+            growth = last[key] - reference[key]
+            if growth > budget:
+                self.failures.append(f"{key} grew by {growth:.1f} (budget {budget}): "
+                                     f"{reference[key]:.1f} -> {last[key]:.1f}")
+        self.top_sites = []
+        for stat in self._last.compare_to(self._reference, "traceback")[:TOP_SITES]:
+            # Frames run oldest to newest: name the allocating line and the application code behind it.
+            site = stat.traceback[-1]
+            owner = next((f for f in reversed(stat.traceback)
+                          if f.filename.startswith(REPO_ROOT) and not f.filename.startswith(BENCH_DIR)), None)
+            via = f" via {os.path.relpath(owner.filename, REPO_ROOT)}:{owner.lineno}" if owner and owner != site else ""
+            self.top_sites.append(f"{site.filename}:{site.lineno}{via}  {stat.size_diff / 1024:+.1f} KB "
+                                  f"({stat.count_diff:+d} blocks)")
+        return self.failures
+
+    def report(self) -> dict:
+        """
+        Run summary for the results file.
+
+        :return: Dict with the settings, samples, failures and top allocation sites.
+        """
+        return {
+            "hours": self.hours,
+            "time_scale": self.time_scale,
+            "tk": "real" if self.real_tk else "stub",
+            "budgets": self.budgets,
+            "rates": self.rates,
+            "samples": self.samples,
+            "failures": self.failures,
+            "top_sites": self.top_sites,
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Accelerated soak test of the host application")
+    parser.add_argument("--hours", type=float, default=8.0, help="Simulated duration (h)")
+    parser.add_argument("--time-scale", type=float, default=60.0, help="Simulated seconds per wall second")
+    parser.add_argument("--tk", choices=("auto", "real", "stub"), default="auto",
+                        help="Tk mode (auto: real if a display is available)")
+    parser.add_argument("--db", action="store_true", help="Record to a temporary session store as well")
+    parser.add_argument("--budget", action="append", default=[], metavar="KEY=VALUE",
+                        help=f"Override a growth budget ({', '.join(DEFAULT_BUDGETS)})")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write the samples JSON")
+    args = parser.parse_args(argv)
+
+    if sys.platform != "linux":
+        parser.error("The pty device stand-in requires Linux.")
+    budgets = {}
+    for item in args.budget:
+        key, _, value = item.partition("=")
+        if key not in DEFAULT_BUDGETS or not value:
+            parser.error(f"Invalid budget: {item}")
+        budgets[key] = float(value)
+    real_tk = args.tk == "real" or (args.tk == "auto" and display_available())
+    soak = SoakRun(args.hours, args.time_scale, real_tk, budgets, args.db)
+    ok = soak.run()
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(soak.report(), f, indent=2)
+    print(f"Samples written to {args.output}.")
+    if ok:
+        print(f"Soak passed: {args.hours:g} h simulated within budget.")
+        return 0
+    for failure in soak.failures:
+        print(f"FAIL: {failure}")
+    print("Top allocation sites since the reference sample:")
+    for site in soak.top_sites:
+        print(f"  {site}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Telemetry Fan-out Benchmark
+
+Publishes telemetry into the shared-memory ring at a fixed rate while several
+reader processes follow it with TelemetryReader.wait(), like vision or QA
+scripts attached to a running host. Each reader reports how many records it
+saw, how many were overwritten before it got to them, how often the seqlock
+made it retry, and the publish-to-read latency (time.monotonic() is shared by
+local processes).
+
+    python -m benchmarks.telemetry_fanout                     # 4 readers, 1 kHz, 5 s
+    python -m benchmarks.telemetry_fanout --readers 8 --rate 5000
+
+Results are written to benchmarks/results/telemetry_fanout.json.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from typing import List, Optional
+
+from gui.telemetry_shm import HISTORY_RECORDS, TelemetryPublisher, TelemetryReader
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(BENCH_DIR, "results", "telemetry_fanout.json")
+STATES = ("AUTO", "LOWER_LIMIT", "AUTO", "UPPER_LIMIT")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _follow(name: str, ready, done, results, poll_interval: float) -> None:
+    reader = TelemetryReader(name)
+    latencies: List[float] = []
+    received = 0
+    last = reader.count - 1
+    ready.release()
+    try:
+        while True:
+            samples = reader.wait(last, timeout=0.05, poll_interval=poll_interval)
+            now = time.monotonic()
+            for sample in samples:
+                latencies.append(now - sample.mono)
+            if samples:
+                received += len(samples)
+                last = samples[-1].index
+            elif done.is_set() and reader.count <= last + 1:
+                break
+        results.put({"pid": os.getpid(), "received": received, "missed": reader.missed,
+                     "retries": reader.retries,
+                     "latency_us": {"p50": percentile(latencies, 0.5) * 1e6,
+                                    "p99": percentile(latencies, 0.99) * 1e6,
+                                    "max": max(latencies, default=0.0) * 1e6}})
+    finally:
+        reader.close()
+
+
+def run(readers: int, rate: float, duration: float, capacity: int, poll_interval: float) -> dict:
+    """
+    Publish for `duration` seconds with `readers` processes following.
+
+    :return: Publisher stats and one entry per reader.
+    """
+    context = multiprocessing.get_context("spawn")
+    name = f"telemetry_fanout_{os.getpid()}"
+    publisher = TelemetryPublisher(name, capacity)
+    ready = context.Semaphore(0)
+    done = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=_follow, name=f"telemetry-reader-{i}",
+                                 args=(name, ready, done, results, poll_interval), daemon=True)
+                 for i in range(readers)]
+    try:
+        for process in processes:
+            process.start()
+        for _ in processes:
+            if not ready.acquire(timeout=30):
+                raise RuntimeError("Reader process did not start")
+        period = 1.0 / rate
+        start = time.monotonic()
+        next_at = start
+        i = 0
+        while next_at - start < duration:
+            now = time.monotonic()
+            if now < next_at:
+                time.sleep(min(next_at - now, 0.001))
+                continue
+            publisher.publish(distance=10.0 + (i % 500) * 0.01, state=STATES[(i // 500) % len(STATES)])
+            i += 1
+            next_at += period
+        elapsed = time.monotonic() - start
+        done.set()
+        report = [results.get(timeout=30) for _ in processes]
+        for process in processes:
+            process.join(timeout=5)
+    finally:
+        done.set()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        publisher.close()
+    return {"readers": readers, "rate_hz": rate, "duration_s": duration, "capacity": capacity,
+            "published": publisher.published, "achieved_hz": publisher.published / elapsed,
+            "mean_publish_us": publisher.mean_publish_us, "reader_results": report}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Shared-memory telemetry fan-out benchmark")
+    parser.add_argument("--readers", type=int, default=4, help="Reader processes")
+    parser.add_argument("--rate", type=float, default=1000.0, help="Publish rate (Hz)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Publish time (s)")
+    parser.add_argument("--capacity", type=int, default=HISTORY_RECORDS, help="Ring capacity (records)")
+    parser.add_argument("--poll-interval", type=float, default=0.0005, help="Reader sleep between polls (s)")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write the results JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args.readers, args.rate, args.duration, args.capacity, args.poll_interval)
+    print(f"published {result['published']} records at {result['achieved_hz']:.0f} Hz "
+          f"(mean publish {result['mean_publish_us']:.1f} us)")
+    print(f"{'reader':<8}{'received':>10}{'missed':>8}{'retries':>9}{'p50 us':>9}{'p99 us':>9}{'max us':>9}")
+    for i, entry in enumerate(result["reader_results"]):
+        latency = entry["latency_us"]
+        print(f"{i:<8}{entry['received']:>10}{entry['missed']:>8}{entry['retries']:>9}"
+              f"{latency['p50']:>9.0f}{latency['p99']:>9.0f}{latency['max']:>9.0f}")
+    p50s = [entry["latency_us"]["p50"] for entry in result["reader_results"]]
+    print(f"median p50 across readers: {statistics.median(p50s):.0f} us")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
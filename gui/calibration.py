@@ -0,0 +1,323 @@
+"""
+Calibration Module
+
+Builds the distance-to-step lookup table that lets auto mode move to exact
+step targets at full speed instead of stopping on 10 Hz sonar thresholds.
+
+The sweep zeroes the step counter (CAL_ZERO), moves the axis through a series
+of step positions (CAL_MOVE), averages several distance samples at each stop
+and fits a monotonic table (isotonic regression), which is saved on the host
+and pushed to the board as CAL_CLEAR / CAL_POINT lines. The firmware anchors its step counter to the
+table with a sensor reading when auto mode starts, and afterwards uses the
+sensor only to verify the position at each target.
+
+Classes:
+    CalibrationTable: Monotonic distance/step table with linear interpolation.
+    CalibrationRoutine: Sweeps the axis over the serial link and pushes tables.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import CAL_TABLE_CAPACITY, DIST_LOWER_TARGET, DIST_UPPER_TARGET, STEPS_PER_CM
+from .event_bus import SERIAL_LINE
+from .serial_comm import parse_distance
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CALIBRATION_PATH = os.path.join("calibration", "distance_steps.json")
+SWEEP_MARGIN_CM = 1.0      # Sweep this far beyond both targets.
+SWEEP_STEP = 125           # Steps between calibration stops (0.5 cm).
+SAMPLES_PER_POINT = 5      # Distance samples averaged at each stop.
+MOVE_TIMEOUT = 30.0        # Longest wait for CAL_AT (s).
+
+
+def make_monotonic(points: Sequence[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """
+    Isotonic (pool-adjacent-violators) fit: distance non-increasing in steps.
+
+    :param points: (steps, distance) pairs in any order.
+    :return: Fitted (steps, distance) pairs sorted by steps; violating
+             neighbours are replaced by their mean.
+    """
+    points = sorted(points)
+    blocks: List[List[float]] = []  # [sum, count, first index]
+    for i, (_, distance) in enumerate(points):
+        blocks.append([distance, 1, i])
+        while len(blocks) > 1 and blocks[-2][0] / blocks[-2][1] < blocks[-1][0] / blocks[-1][1]:
+            total, count, _ = blocks.pop()
+            blocks[-1][0] += total
+            blocks[-1][1] += count
+    fitted: List[Tuple[float, float]] = []
+    for total, count, first in blocks:
+        for j in range(first, first + int(count)):
+            fitted.append((points[j][0], total / count))
+    return fitted
+
+
+class CalibrationTable:
+    """
+    Monotonic distance/step table with linear interpolation.
+
+    Attributes:
+        points (list): (steps, distance) pairs, steps strictly increasing and
+                       distance strictly decreasing.
+        created (float): Creation time (epoch s).
+    """
+    def __init__(self, points: Sequence[Tuple[float, float]], created: Optional[float] = None) -> None:
+        points = sorted((int(round(s)), float(d)) for s, d in points)
+        if len(points) < 2:
+            raise ValueError("A calibration table needs at least two points.")
+        for (s0, d0), (s1, d1) in zip(points, points[1:]):
+            if s1 <= s0 or d1 >= d0:
+                raise ValueError(f"Calibration table is not strictly monotonic at {s0}/{s1} steps.")
+        self.points = points
+        self.created = created or time.time()
+
+    @classmethod
+    def fit(cls, samples: Sequence[Tuple[float, float]]) -> "CalibrationTable":
+        """
+        Build a table from raw sweep samples.
+
+        Points left flat by the monotonic fit are merged, so the result is
+        strictly monotonic.
+
+        :param samples: (steps, distance) measurements.
+        :return: The table.
+        """
+        points: List[Tuple[float, float]] = []
+        for steps, distance in make_monotonic(samples):
+            if points and distance >= points[-1][1] - 1e-6:
+                continue  # Pooled block: keep its first stop only.
+            points.append((steps, distance))
+        return cls(points)
+
+    @staticmethod
+    def _interpolate(x: float, xs: Sequence[float], ys: Sequence[float]) -> float:
+        # xs ascending; end segments are extrapolated.
+        i = 1
+        while i < len(xs) - 1 and x > xs[i]:
+            i += 1
+        x0, x1, y0, y1 = xs[i - 1], xs[i], ys[i - 1], ys[i]
+        return y0 + (x - x0) * (y1 - y0) / (x1 - x0)
+
+    def steps_for(self, distance: float) -> int:
+        """
+        Step position of a distance (the firmware's Logic::calStepsFor).
+
+        :param distance: Distance in cm.
+        :return: Step position.
+        """
+        reversed_points = self.points[::-1]
+        return int(round(self._interpolate(distance, [d for _, d in reversed_points],
+                                           [s for s, _ in reversed_points])))
+
+    def distance_for(self, steps: float) -> float:
+        """
+        Distance at a step position.
+
+        :param steps: Step position.
+        :return: Distance in cm.
+        """
+        return self._interpolate(steps, [s for s, _ in self.points], [d for _, d in self.points])
+
+    def reduce(self, capacity: int = CAL_TABLE_CAPACITY) -> "CalibrationTable":
+        """
+        Keep at most `capacity` points, dropping those whose removal adds the
+        least interpolation error (the end points are always kept).
+
+        :param capacity: Maximum number of points (firmware CAL_TABLE_CAPACITY).
+        :return: A new table.
+        """
+        points = list(self.points)
+        while len(points) > max(2, capacity):
+            best, best_error = 1, float("inf")
+            for i in range(1, len(points) - 1):
+                (s0, d0), (s, d), (s1, d1) = points[i - 1], points[i], points[i + 1]
+                error = abs(d - (d0 + (s - s0) * (d1 - d0) / (s1 - s0)))
+                if error < best_error:
+                    best, best_error = i, error
+            del points[best]
+        return CalibrationTable(points, self.created)
+
+    def accuracy(self, reference: Callable[[float], float], positions: Sequence[float]) -> Dict[str, float]:
+        """
+        Interpolation accuracy against a known steps-to-distance mapping.
+
+        :param reference: True distance (cm) for a step position.
+        :param positions: Step positions to evaluate.
+        :return: Dict with max/mean error in cm and the max step error of steps_for().
+        """
+        errors = [abs(self.distance_for(s) - reference(s)) for s in positions]
+        step_errors = [abs(self.steps_for(reference(s)) - s) for s in positions]
+        return {
+            "max_error_cm": max(errors),
+            "mean_error_cm": sum(errors) / len(errors),
+            "max_error_steps": max(step_errors),
+        }
+
+    def commands(self) -> List[str]:
+        """
+        Serial lines loading this table into the firmware.
+
+        :return: CAL_CLEAR followed by one CAL_POINT per point, in firmware order.
+        """
+        return ["CAL_CLEAR"] + [f"CAL_POINT {d:.3f} {s}" for s, d in self.points]
+
+    def save(self, path: str = DEFAULT_CALIBRATION_PATH) -> None:
+        """
+        Write the table as JSON.
+
+        :param path: Output file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": self.created, "steps_per_cm": STEPS_PER_CM,
+                       "points": [{"steps": s, "distance": d} for s, d in self.points]}, f, indent=2)
+        os.replace(tmp_path, path)
+        logger.info(f"Calibration table with {len(self.points)} points saved to {path}.")
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CALIBRATION_PATH) -> "CalibrationTable":
+        """
+        Read a table written by save().
+
+        :param path: Input file.
+        :return: The table.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls([(p["steps"], p["distance"]) for p in data["points"]], data.get("created"))
+
+
+class CalibrationRoutine:
+    """
+    Sweeps the axis over the serial link and pushes tables to the board.
+
+    Uses a private subscription to the serial interface's bus, so the GUI and
+    the other consumers keep receiving telemetry during the sweep.
+
+    Attributes:
+        serial (SerialInterface): Connected serial interface.
+        samples_per_point (int): Distance samples averaged at each stop.
+    """
+    def __init__(self, serial, samples_per_point: int = SAMPLES_PER_POINT) -> None:
+        self.serial = serial
+        self.samples_per_point = samples_per_point
+        self._abort = threading.Event()
+
+    def abort(self) -> None:
+        """Stop a running sweep after the current point."""
+        self._abort.set()
+
+    def _wait_line(self, subscription, predicate: Callable[[str], bool], timeout: float) -> Optional[str]:
+        deadline = time.monotonic() + timeout
+        while not self._abort.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            event = subscription.get(timeout=remaining)
+            if event is not None and predicate(event.payload):
+                return event.payload
+        return None
+
+    @staticmethod
+    def sweep_positions(start_distance: float, step: int = SWEEP_STEP) -> List[int]:
+        """
+        Stops of a sweep covering both targets plus SWEEP_MARGIN_CM.
+
+        Positions are relative to the point where the sweep starts (step 0 after
+        CAL_ZERO) and use the nominal STEPS_PER_CM; the firmware re-anchors the
+        table with a sensor reading when auto mode starts, so the frame is free.
+
+        :param start_distance: Distance at step 0 (cm).
+        :param step: Steps between stops.
+        :return: Step positions, top to bottom.
+        """
+        start = int((start_distance - DIST_UPPER_TARGET - SWEEP_MARGIN_CM) * STEPS_PER_CM)
+        end = int((start_distance - DIST_LOWER_TARGET + SWEEP_MARGIN_CM) * STEPS_PER_CM)
+        return list(range(start, end + 1, step))
+
+    def sweep(self, positions: Optional[Sequence[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Move to every position and average the distance readings there.
+
+        :param positions: Step positions (defaults to sweep_positions() from the current distance).
+        :return: (steps, mean distance) samples.
+        """
+        self._abort.clear()
+        bus = self.serial.bus
+        subscription = bus.subscribe(SERIAL_LINE, name="calibration", maxsize=1000)
+        samples: List[Tuple[int, float]] = []
+        try:
+            self.serial.send_command("CAL_ZERO")
+            if self._wait_line(subscription, lambda line: line.startswith("CAL_OK"), 2.0) is None:
+                logger.error("Calibration sweep: the board did not answer CAL_ZERO.")
+                return samples
+            if positions is None:
+                line = self._wait_line(subscription, lambda line: parse_distance(line) is not None, 2.0)
+                if line is None:
+                    logger.error("Calibration sweep: no distance reading.")
+                    return samples
+                positions = self.sweep_positions(parse_distance(line))
+            for position in positions:
+                subscription.drain()
+                self.serial.send_command(f"CAL_MOVE {position}")
+                if self._wait_line(subscription, lambda line: line.startswith("CAL_AT"), MOVE_TIMEOUT) is None:
+                    logger.error(f"Calibration move to {position} steps timed out.")
+                    break
+                readings = []
+                while len(readings) < self.samples_per_point:
+                    line = self._wait_line(subscription, lambda line: parse_distance(line) is not None, 2.0)
+                    if line is None:
+                        break
+                    readings.append(parse_distance(line))
+                if readings:
+                    samples.append((position, sum(readings) / len(readings)))
+                    logger.debug(f"Calibration point {position} steps: {samples[-1][1]:.2f} cm")
+        finally:
+            bus.unsubscribe(subscription)
+            self.serial.send_command("STOP")
+        logger.info(f"Calibration sweep collected {len(samples)} points.")
+        return samples
+
+    def calibrate(self, path: Optional[str] = DEFAULT_CALIBRATION_PATH) -> CalibrationTable:
+        """
+        Sweep, fit, reduce to the firmware capacity and save.
+
+        :param path: Where to save the table (None skips saving).
+        :return: The table.
+        """
+        table = CalibrationTable.fit(self.sweep()).reduce()
+        if path:
+            table.save(path)
+        return table
+
+    def push(self, table: CalibrationTable, timeout: float = 2.0) -> bool:
+        """
+        Load a table into the firmware.
+
+        :param table: Table to send.
+        :param timeout: Longest wait for each CAL_OK (s).
+        :return: True if every line was acknowledged.
+        """
+        bus = self.serial.bus
+        subscription = bus.subscribe(SERIAL_LINE, name="calibration", maxsize=1000)
+        try:
+            for command in table.commands():
+                self.serial.send_command(command)
+                reply = self._wait_line(subscription, lambda line: line.startswith(("CAL_OK", "CAL_ERR")), timeout)
+                if reply is None or reply.startswith("CAL_ERR"):
+                    logger.error(f"Calibration push failed at '{command}': {reply}")
+                    return False
+        finally:
+            bus.unsubscribe(subscription)
+        logger.info(f"Calibration table with {len(table.points)} points loaded on the board.")
+        return True
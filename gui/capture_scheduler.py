@@ -0,0 +1,240 @@
+"""
+Capture Scheduler Module
+
+Overlaps the remote capture with the auto-mode motion:
+
+- While the actuator descends, ThresholdPredictor fits the recent distance
+  samples and estimates when the lower threshold will be crossed; once that is
+  closer than the SSH connection time (plus a margin), the capture session is
+  warmed up so the capture can start the moment CAPTURE arrives.
+- The capture runs off the UI thread, and as soon as it confirms the exposure
+  the scheduler sends RESUME, which ends the firmware dwell (CAPTURE_DWELL_MS is
+  only the upper bound now) and starts the ascent.
+- The next capture may start as soon as the script has exited. The images
+  are fetched by a separate fetch worker while the actuator ascends
+  (CaptureSession.fetch_captured), so a slow fetch never makes the next
+  CAPTURE be ignored; a failed fetch is reported as a failed capture.
+
+Classes:
+    ThresholdPredictor: Time-to-threshold estimate from recent distance samples.
+    CaptureScheduler: Warms up, triggers and confirms captures from bus events.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Optional, Tuple
+
+from .config import DIST_LOWER_TARGET, DIST_MARGIN
+from .event_bus import DISTANCE, STATE, Event
+
+logger = logging.getLogger(__name__)
+
+WARMUP_LEAD_S = 3.0       # Warm up this long before the predicted arrival (at least).
+WARMUP_MARGIN = 1.5       # Lead time as a multiple of the last measured connect time.
+PREDICTOR_WINDOW = 5      # Distance samples used for the velocity fit (0.5 s at 10 Hz).
+MIN_APPROACH_SPEED = 0.2  # cm/s; slower motion is treated as stationary.
+
+
+class ThresholdPredictor:
+    """
+    Estimates when a descending distance will cross a threshold.
+
+    The velocity is the least-squares slope of the last `window` samples, which
+    averages out the sensor noise of single differences.
+
+    Attributes:
+        threshold (float): Distance that triggers the capture (cm).
+        window (int): Number of samples in the fit.
+    """
+    def __init__(self, threshold: float = DIST_LOWER_TARGET + DIST_MARGIN, window: int = PREDICTOR_WINDOW) -> None:
+        self.threshold = threshold
+        self.window = window
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=window)
+
+    def reset(self) -> None:
+        self._samples.clear()
+
+    def update(self, distance: float, t: float) -> None:
+        """
+        Add a distance sample.
+
+        :param distance: Distance (cm).
+        :param t: Sample time (s).
+        """
+        self._samples.append((t, distance))
+
+    @property
+    def velocity(self) -> Optional[float]:
+        """Fitted velocity in cm/s (negative while descending), or None without enough samples."""
+        n = len(self._samples)
+        if n < 2:
+            return None
+        mean_t = sum(t for t, _ in self._samples) / n
+        mean_d = sum(d for _, d in self._samples) / n
+        var_t = sum((t - mean_t) ** 2 for t, _ in self._samples)
+        if var_t <= 0:
+            return None
+        return sum((t - mean_t) * (d - mean_d) for t, d in self._samples) / var_t
+
+    def time_to_threshold(self) -> Optional[float]:
+        """
+        Predicted time from the last sample until the threshold is crossed.
+
+        :return: Seconds (0 if already crossed), or None if not approaching.
+        """
+        velocity = self.velocity
+        if velocity is None or velocity > -MIN_APPROACH_SPEED:
+            return None
+        distance = self._samples[-1][1]
+        return max(0.0, (distance - self.threshold) / -velocity)
+
+
+class CaptureScheduler:
+    """
+    Warms up, triggers and confirms captures from DISTANCE and STATE events.
+
+    Subscribe handle_event() to the bus; capture results are reported in
+    trigger order through on_result(success, start, exposure_latency,
+    duration, transfer) from the fetch worker thread, where duration runs
+    from the trigger to the end of the capture script and transfer is the
+    TransferStats of the image fetch (or None if nothing was fetched).
+
+    Attributes:
+        session (CaptureSession): Persistent SSH capture session.
+        send (Callable[[str], bool]): Writes a command line to the board (RESUME).
+        predictor (ThresholdPredictor): Arrival estimate.
+        lead_time (float): Minimum warm-up lead before the predicted arrival (s).
+        predicted_arrival (float | None): Threshold crossing predicted at warm-up time (epoch s).
+        prediction_errors (deque): Recent actual - predicted arrival times (s).
+    """
+    def __init__(self, session, send: Callable[[str], bool],
+                 on_result: Optional[Callable[[bool, float, Optional[float], float, Any], None]] = None,
+                 predictor: Optional[ThresholdPredictor] = None, lead_time: float = WARMUP_LEAD_S) -> None:
+        self.session = session
+        self.send = send
+        self.on_result = on_result
+        self.predictor = predictor or ThresholdPredictor()
+        self.lead_time = lead_time
+        self.predicted_arrival: Optional[float] = None
+        self.prediction_errors: Deque[float] = deque(maxlen=50)
+        self._last_state: Optional[str] = None
+        self._busy = threading.Lock()
+        # (success, start, latency, duration) of finished scripts awaiting their fetch.
+        self._finished: "queue.Queue[Tuple[bool, float, Optional[float], float]]" = queue.Queue()
+        self._fetcher: Optional[threading.Thread] = None
+        self._fetcher_lock = threading.Lock()
+
+    @property
+    def pending_fetches(self) -> int:
+        """Finished captures whose images are not fetched yet."""
+        return self._finished.qsize()
+
+    @property
+    def warmup_lead(self) -> float:
+        """Lead time covering the measured connection time."""
+        connect = self.session.connect_time or 0.0
+        return max(self.lead_time, connect * WARMUP_MARGIN)
+
+    def handle_event(self, event: Event) -> None:
+        """
+        Bus handler for DISTANCE and STATE events.
+
+        :param event: The event.
+        """
+        if event.topic is DISTANCE:
+            self._on_distance(event.payload.distance, event.t)
+        elif event.topic is STATE:
+            self._on_state(event.payload, event.t)
+
+    def _on_distance(self, distance: float, t: float) -> None:
+        self.predictor.update(distance, t)
+        remaining = self.predictor.time_to_threshold()
+        if remaining is None:
+            return
+        if remaining <= self.warmup_lead:
+            if self.predicted_arrival is None:
+                # Judge the prediction that triggered the warm-up, not later refinements.
+                self.predicted_arrival = t + remaining
+            self.session.warm_async()
+
+    def _on_state(self, state: str, t: float) -> None:
+        if state == "CAPTURE":
+            if self.predicted_arrival is not None:
+                self.prediction_errors.append(t - self.predicted_arrival)
+                self.predicted_arrival = None
+            # Only the auto cycle dwells for RESUME; a planned cycle keeps moving.
+            resume = self._last_state == "LOWER_LIMIT"
+            self.trigger(resume=resume, t=t)
+        elif state in ("UPPER_LIMIT", "AUTO", "STOPPED", "MANUAL_UP", "MANUAL_DOWN"):
+            self.predictor.reset()
+            self.predicted_arrival = None
+        self._last_state = state
+
+    def trigger(self, resume: bool = False, t: Optional[float] = None) -> bool:
+        """
+        Start a capture on a worker thread.
+
+        :param resume: Send RESUME once the exposure is confirmed.
+        :param t: Time the capture was requested (epoch s); defaults to now.
+        :return: False if a capture is already running.
+        """
+        if not self._busy.acquire(blocking=False):
+            logger.warning("Capture already in progress; trigger ignored.")
+            return False
+        threading.Thread(target=self._run, args=(resume, t or time.time()), name="capture", daemon=True).start()
+        return True
+
+    def _run(self, resume: bool, start: float) -> None:
+        exposed_at = []
+
+        def on_exposed() -> None:
+            exposed_at.append(time.time())
+            if resume:
+                self.send("RESUME")
+
+        try:
+            success = self.session.capture(on_exposed=on_exposed, fetch=False)
+        finally:
+            # The script has exited: the next CAPTURE may start while the images are fetched.
+            self._busy.release()
+        latency = exposed_at[0] - start if exposed_at else None
+        duration = time.time() - start
+        if latency is not None:
+            logger.info(f"Capture exposed {latency:.2f} s after trigger"
+                        f"{', ascent resumed' if resume else ''}; script done in {duration:.2f} s.")
+        self._finished.put((success, start, latency, duration))
+        with self._fetcher_lock:
+            if self._fetcher is None:
+                self._fetcher = threading.Thread(target=self._fetch_loop, name="capture-fetch", daemon=True)
+                self._fetcher.start()
+
+    def _fetch_loop(self) -> None:
+        """Fetch the images of finished captures one at a time and report the results."""
+        while True:
+            success, start, latency, duration = self._finished.get()
+            transfer = None
+            if success and self.session.fetch:
+                transfer = self.session.fetch_captured()
+                success = not transfer.errors
+                logger.info(f"Capture images: {transfer}"
+                            f"{f' ({self.pending_fetches} more waiting)' if self.pending_fetches else ''}.")
+            if self.on_result:
+                try:
+                    self.on_result(success, start, latency, duration, transfer)
+                except Exception as e:
+                    logger.error(f"Capture result handler failed: {e}")
+
+    def stats(self) -> dict:
+        """
+        Prediction accuracy.
+
+        :return: Dict with samples, mean_error_s and max_abs_error_s of the arrival prediction.
+        """
+        errors = list(self.prediction_errors)
+        if not errors:
+            return {"samples": 0, "mean_error_s": None, "max_abs_error_s": None}
+        return {"samples": len(errors), "mean_error_s": sum(errors) / len(errors),
+                "max_abs_error_s": max(abs(e) for e in errors)}
@@ -0,0 +1,36 @@
+"""
+Host Configuration Module
+
+Mirrors the mechanical and motion parameters defined in lineal_actuator/config.h
+so that host-side planning and simulation use the same numbers as the firmware.
+Keep both files in sync when the hardware changes.
+"""
+
+# System parameters (units in cm)
+DIST_LOWER_TARGET = 10.0   # Lower distance target (in cm).
+DIST_UPPER_TARGET = 20.0   # Upper distance target (in cm).
+DIST_MARGIN = 0.1          # Acceptable margin for distance measurement (in cm).
+
+# Motor parameters (for AccelStepper)
+MOTOR_ACCELERATION = 2000.0  # Motor acceleration (in steps/s²).
+MOTOR_MAX_SPEED = 1000.0     # Maximum motor speed (in steps/s).
+
+# Sensor parameters
+SENSOR_READ_INTERVAL_S = 0.1  # Interval between sensor readings (in s).
+
+# Mechanics: 200 steps/rev driving an 8 mm lead screw. Moving "down" increases
+# the step position and reduces the measured distance.
+STEPS_PER_CM = 250.0
+
+# Longest dwell at the lower limit while the cameras capture (CAPTURE_DWELL_MS);
+# RESUME from the host ends it as soon as the exposure is confirmed.
+CAPTURE_DWELL_S = 10.0
+
+# Trajectory streaming (see gui/trajectory.py and Logic::handleTrajectory)
+TRAJ_PERIOD_MS = 20           # Setpoint period interpolated by the firmware.
+TRAJ_BUFFER_CAPACITY = 32     # Entries in the firmware trajectory ring buffer.
+TRAJ_TOKENS_PER_LINE = 8      # Keeps each TRAJ line well under the 64-byte RX buffer.
+
+# Distance-to-step calibration (see gui/calibration.py and Logic::handleCalibration)
+CAL_TABLE_CAPACITY = 16        # Points in the firmware calibration table.
+CAL_VERIFY_TOLERANCE_CM = 0.5  # Allowed sensor deviation at a calibrated target.
@@ -0,0 +1,351 @@
+"""
+Closed-Loop Distance Control Module
+
+Replaces the bang-bang approach of auto mode (move until a threshold, then
+stop()) with a PID position controller that drives the actuator toward a
+distance setpoint through velocity commands ("VEL <steps/s>").
+
+The controller runs on a dedicated fixed-rate thread and records loop-period
+jitter and step-response metrics (settling time, overshoot) for tuning.
+
+Classes:
+    PIDController: Discrete PID with output clamping and anti-windup.
+    JitterStats: Summary of loop-period deviations.
+    FixedRateLoop: Runs a function at a fixed rate on its own thread.
+    StepResponseMetrics: Settling time, overshoot and rise time of a response.
+    DistanceController: PID distance hold/approach fed by serial distance samples.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Sequence, Tuple
+
+from .config import MOTOR_MAX_SPEED, SENSOR_READ_INTERVAL_S, STEPS_PER_CM
+
+logger = logging.getLogger(__name__)
+
+# Default gains, tuned on the simulated plant (see gui/simulator.py).
+DEFAULT_KP = 3.0 * STEPS_PER_CM   # steps/s per cm of error
+DEFAULT_KI = 0.2 * STEPS_PER_CM
+DEFAULT_KD = 0.0
+SETTLE_BAND_CM = 0.1
+VEL_KEEPALIVE_S = 0.25  # Firmware stops after VEL_WATCHDOG_MS without a VEL command.
+STALE_MEASUREMENT_S = 3 * SENSOR_READ_INTERVAL_S  # No distance sample for this long stops the loop.
+TRACE_MAX_SAMPLES = 3000  # Distance samples kept for step-response metrics (5 min at 10 Hz).
+
+
+class PIDController:
+    """
+    Discrete PID controller.
+
+    The derivative acts on the measurement to avoid kicks on setpoint changes,
+    and the integrator is frozen while the output saturates (anti-windup).
+
+    Attributes:
+        kp, ki, kd (float): Gains.
+        output_limit (float): Absolute output clamp.
+    """
+    def __init__(self, kp: float = DEFAULT_KP, ki: float = DEFAULT_KI, kd: float = DEFAULT_KD,
+                 output_limit: float = MOTOR_MAX_SPEED) -> None:
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_limit = output_limit
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear the integrator and derivative history."""
+        self._integral = 0.0
+        self._last_measurement: Optional[float] = None
+
+    def update(self, setpoint: float, measurement: float, dt: float) -> float:
+        """
+        Compute the next output.
+
+        :param setpoint: Desired value.
+        :param measurement: Measured value.
+        :param dt: Time since the previous update (s).
+        :return: Clamped controller output.
+        """
+        error = setpoint - measurement
+        derivative = 0.0
+        if self._last_measurement is not None and dt > 0:
+            derivative = -(measurement - self._last_measurement) / dt
+        self._last_measurement = measurement
+        candidate = self._integral + error * dt
+        output = self.kp * error + self.ki * candidate + self.kd * derivative
+        if abs(output) < self.output_limit:
+            self._integral = candidate
+        return max(-self.output_limit, min(self.output_limit, output))
+
+
+class JitterStats:
+    """
+    Summary of the deviation of loop periods from their nominal value.
+
+    Attributes:
+        count (int): Number of periods measured.
+        mean_ms (float): Mean period.
+        std_ms (float): Standard deviation of the period.
+        max_jitter_ms (float): Largest absolute deviation from nominal.
+        p99_jitter_ms (float): 99th percentile absolute deviation.
+        overruns (int): Iterations that started a full period late.
+    """
+    def __init__(self, periods: Sequence[float], nominal: float, overruns: int = 0) -> None:
+        self.count = len(periods)
+        self.overruns = overruns
+        if not periods:
+            self.mean_ms = self.std_ms = self.max_jitter_ms = self.p99_jitter_ms = 0.0
+            return
+        mean = sum(periods) / len(periods)
+        self.mean_ms = mean * 1000
+        self.std_ms = math.sqrt(sum((p - mean) ** 2 for p in periods) / len(periods)) * 1000
+        deviations = sorted(abs(p - nominal) * 1000 for p in periods)
+        self.max_jitter_ms = deviations[-1]
+        self.p99_jitter_ms = deviations[min(len(deviations) - 1, int(0.99 * len(deviations)))]
+
+    def __str__(self) -> str:
+        return (f"period {self.mean_ms:.2f}±{self.std_ms:.2f} ms, jitter p99 {self.p99_jitter_ms:.2f} ms, "
+                f"max {self.max_jitter_ms:.2f} ms, overruns {self.overruns}")
+
+
+class FixedRateLoop:
+    """
+    Calls a function at a fixed rate on a dedicated thread.
+
+    Deadlines are absolute (start + n * period), so a late iteration does not
+    shift the schedule; iterations that fall a full period behind are skipped
+    and counted as overruns.
+
+    Attributes:
+        period (float): Loop period (s).
+        func (Callable[[float], None]): Called with the actual dt since the last call.
+    """
+    def __init__(self, period: float, func: Callable[[float], None], max_samples: int = 10000) -> None:
+        self.period = period
+        self.func = func
+        self.max_samples = max_samples
+        self.periods: List[float] = []
+        self.overruns = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the loop thread."""
+        self._stop.clear()
+        self.periods = []
+        self.overruns = 0
+        self._thread = threading.Thread(target=self._run, name="fixed-rate-loop", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the loop thread and wait for it to exit."""
+        self._stop.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self) -> None:
+        next_deadline = time.perf_counter()
+        last = None
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            if last is not None and len(self.periods) < self.max_samples:
+                self.periods.append(now - last)
+            dt = self.period if last is None else now - last
+            last = now
+            try:
+                self.func(dt)
+            except Exception as e:
+                logger.error(f"Control loop error: {e}")
+            next_deadline += self.period
+            now = time.perf_counter()
+            if now - next_deadline > self.period:
+                missed = int((now - next_deadline) // self.period)
+                self.overruns += missed
+                next_deadline += missed * self.period
+            remaining = next_deadline - time.perf_counter()
+            if remaining > 0:
+                self._stop.wait(remaining)
+
+    def jitter(self) -> JitterStats:
+        """
+        Loop-period jitter measured so far.
+
+        :return: JitterStats for the recorded periods.
+        """
+        return JitterStats(list(self.periods), self.period, self.overruns)
+
+
+class StepResponseMetrics:
+    """
+    Step-response figures of a recorded approach.
+
+    Attributes:
+        settling_time (float | None): Time until the response stays within the band (s).
+        overshoot (float): Largest excursion past the setpoint (same units as the data).
+        overshoot_pct (float): Overshoot relative to the step size.
+        rise_time (float | None): 10%-90% rise time (s).
+    """
+    def __init__(self, samples: Sequence[Tuple[float, float]], setpoint: float,
+                 band: float = SETTLE_BAND_CM) -> None:
+        """
+        :param samples: (time, value) pairs starting at the step.
+        :param setpoint: Target value.
+        :param band: Settling band around the setpoint.
+        """
+        self.settling_time: Optional[float] = None
+        self.rise_time: Optional[float] = None
+        self.overshoot = 0.0
+        self.overshoot_pct = 0.0
+        if not samples:
+            return
+        t0, start = samples[0]
+        step = setpoint - start
+        direction = 1.0 if step >= 0 else -1.0
+        self.overshoot = max(0.0, max((v - setpoint) * direction for _, v in samples))
+        if step:
+            self.overshoot_pct = 100.0 * self.overshoot / abs(step)
+
+        for t, v in reversed(samples):
+            if abs(v - setpoint) > band:
+                break
+            self.settling_time = t - t0
+        if self.settling_time is not None and abs(samples[-1][1] - setpoint) > band:
+            self.settling_time = None
+
+        t10 = t90 = None
+        for t, v in samples:
+            progress = (v - start) / step if step else 1.0
+            if t10 is None and progress >= 0.1:
+                t10 = t
+            if t90 is None and progress >= 0.9:
+                t90 = t
+                break
+        if t10 is not None and t90 is not None:
+            self.rise_time = t90 - t10
+
+    def __str__(self) -> str:
+        settle = f"{self.settling_time:.2f} s" if self.settling_time is not None else "not settled"
+        return f"settling {settle}, overshoot {self.overshoot:.2f} ({self.overshoot_pct:.1f}%)"
+
+
+class DistanceController:
+    """
+    PID distance controller driving the actuator with VEL commands.
+
+    Distance samples arrive from the serial reader via update_measurement();
+    the control step runs on a FixedRateLoop. A positive velocity moves down
+    (toward smaller distances), so the output sign is inverted.
+
+    On a sensor error the firmware prints no distance, so the last sample would
+    stay in place while the keepalive defeats the firmware watchdog. If no
+    sample arrives for STALE_MEASUREMENT_S, the loop sends VEL 0 and stops.
+
+    Attributes:
+        send (Callable[[str], bool]): Writes one command line to the board.
+        setpoint (float): Target distance (cm).
+        pid (PIDController): The controller.
+        loop (FixedRateLoop): The timing thread.
+        on_fault (Callable[[str], None] | None): Called with a message when the loop stops itself.
+        trace (deque): (time, distance) samples since the last setpoint change,
+            capped at TRACE_MAX_SAMPLES so a setpoint held for a shift stays bounded.
+    """
+    def __init__(self, send: Callable[[str], bool], pid: Optional[PIDController] = None,
+                 rate_hz: float = 1.0 / SENSOR_READ_INTERVAL_S, deadband_steps: float = 5.0,
+                 on_fault: Optional[Callable[[str], None]] = None) -> None:
+        self.send = send
+        self.on_fault = on_fault
+        self.pid = pid or PIDController()
+        self.setpoint: Optional[float] = None
+        self.deadband_steps = deadband_steps
+        self.loop = FixedRateLoop(1.0 / rate_hz, self._step)
+        self.trace: Deque[Tuple[float, float]] = deque(maxlen=TRACE_MAX_SAMPLES)
+        self._measurement: Optional[float] = None
+        self._measured_at = 0.0
+        self._last_velocity: Optional[int] = None
+        self._last_send = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.loop.running
+
+    def start(self, setpoint: float) -> None:
+        """
+        Approach and hold a distance setpoint.
+
+        :param setpoint: Target distance in cm.
+        """
+        with self._lock:
+            self.setpoint = setpoint
+            self.trace.clear()
+            self.pid.reset()
+            # A sample from a previous run must not drive this one; the timeout counts from here.
+            self._measurement = None
+            self._measured_at = time.monotonic()
+            self._last_velocity = None
+        if not self.loop.running:
+            self.loop.start()
+        logger.info(f"Distance control started, setpoint {setpoint} cm.")
+
+    def stop(self) -> None:
+        """Stop the control loop and command zero velocity."""
+        self.loop.stop()
+        self.send("VEL 0")
+        logger.info(f"Distance control stopped: {self.metrics()}; {self.loop.jitter()}")
+
+    def update_measurement(self, distance: float) -> None:
+        """
+        Feed a distance sample; safe to call from the serial reader thread.
+
+        :param distance: Measured distance in cm.
+        """
+        with self._lock:
+            self._measurement = distance
+            self._measured_at = time.monotonic()
+            if self.setpoint is not None:
+                self.trace.append((time.monotonic(), distance))
+
+    def _step(self, dt: float) -> None:
+        # The update runs under the lock so start() cannot reset the PID state halfway through it.
+        now = time.monotonic()
+        with self._lock:
+            measurement, setpoint = self._measurement, self.setpoint
+            if setpoint is None:
+                return
+            stale = now - self._measured_at > STALE_MEASUREMENT_S
+            if measurement is None and not stale:
+                return
+            if not stale:
+                velocity = -self.pid.update(setpoint, measurement, dt)
+                last_velocity = self._last_velocity
+        if stale:
+            message = f"No distance sample for {STALE_MEASUREMENT_S:.1f} s (sensor error?); distance control stopped."
+            logger.error(message)
+            self.stop()
+            if self.on_fault:
+                self.on_fault(message)
+            return
+        command = 0 if abs(velocity) < self.deadband_steps else int(round(velocity))
+        # Resend unchanged commands before the firmware watchdog zeroes the speed.
+        if command != last_velocity or now - self._last_send > VEL_KEEPALIVE_S:
+            if self.send(f"VEL {command}"):
+                with self._lock:
+                    self._last_velocity = command
+                self._last_send = now
+
+    def metrics(self) -> StepResponseMetrics:
+        """
+        Step-response metrics of the current approach.
+
+        :return: StepResponseMetrics over the recorded trace.
+        """
+        with self._lock:
+            return StepResponseMetrics(list(self.trace), self.setpoint or 0.0)
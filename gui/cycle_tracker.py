@@ -0,0 +1,294 @@
+"""
+Cycle Tracker Module
+
+Follows the auto-mode event stream and splits it into cycles:
+
+    upper limit (or AUTO) -> descent -> CAPTURE -> dwell -> ascent -> upper limit
+
+Capture time is measured separately (trigger to result) because it runs in
+parallel with the dwell and, since RESUME is sent at exposure, may only be
+known after the cycle has finished; it is matched to its cycle by the time of
+the CAPTURE event that triggered it. Rolling statistics give the throughput in
+parts per hour, the p95 cycle time and the slowest phase.
+
+Only the last HISTORY_CYCLES cycles are kept in memory; the session store
+holds the complete record.
+
+The tracker consumes the same state names the session store records (see
+STATE_MESSAGES in serial_comm.py), so it works live and on recorded sessions.
+
+Classes:
+    Cycle: Timing of one completed cycle.
+    CycleTracker: Incremental cycle detector with rolling statistics.
+"""
+
+import csv
+import json
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from .config import DIST_MARGIN, DIST_UPPER_TARGET
+
+PHASES = ("descent", "dwell", "capture", "ascent")
+MOTION_THRESHOLD_CM = 0.3  # Rise above the capture distance that marks the start of the ascent.
+HISTORY_CYCLES = 500       # Completed cycles kept for export without a session store (about 2 h).
+CAPTURE_MATCH_S = 1e-3     # Tolerance when matching a capture to its CAPTURE event time.
+
+
+class Cycle:
+    """
+    Timing of one completed cycle.
+
+    Attributes:
+        number (int): Cycle number within the session.
+        start (float): Cycle start time (s).
+        end (float): Cycle end time (s).
+        phases (dict): Duration of each phase in PHASES (s); capture may be None.
+    """
+    __slots__ = ("number", "start", "end", "phases")
+
+    def __init__(self, number: int, start: float, end: float, phases: Dict[str, Optional[float]]) -> None:
+        self.number = number
+        self.start = start
+        self.end = end
+        self.phases = phases
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def as_dict(self) -> Dict[str, object]:
+        row: Dict[str, object] = {"cycle": self.number, "start": self.start, "end": self.end,
+                                  "duration": self.duration}
+        row.update(self.phases)
+        return row
+
+
+class CycleTracker:
+    """
+    Incremental cycle detector with rolling statistics.
+
+    Attributes:
+        window (int): Number of recent cycles used for the statistics.
+        completed (int): Cycles completed so far.
+        history (deque): The last `history_size` completed cycles.
+        on_cycle (Callable[[Cycle], None] | None): Called for every completed cycle.
+    """
+    def __init__(self, window: int = 50, on_cycle: Optional[Callable[[Cycle], None]] = None,
+                 history_size: int = HISTORY_CYCLES) -> None:
+        self.window = window
+        self.on_cycle = on_cycle
+        self.completed = 0
+        self.history: Deque[Cycle] = deque(maxlen=max(window, history_size))
+        self._recent: Deque[Cycle] = deque(maxlen=window)
+        # (CAPTURE event time, cycle number) of recent captures, for results arriving late.
+        self._capture_times: Deque[Tuple[float, int]] = deque(maxlen=8)
+        self._lock = threading.Lock()
+        self._reset_cycle(None)
+
+    def _reset_cycle(self, start: Optional[float]) -> None:
+        self._start = start
+        self._lower_at: Optional[float] = None
+        self._lower_distance: Optional[float] = None
+        self._ascent_at: Optional[float] = None
+        self._capture_duration: Optional[float] = None
+
+    @property
+    def cycle_number(self) -> int:
+        """Number of the cycle in progress (1-based)."""
+        return self.completed + 1
+
+    # Event input
+
+    def on_event(self, state: str, t: float) -> None:
+        """
+        Feed a state transition.
+
+        :param state: AUTO, CAPTURE, LOWER_LIMIT, UPPER_LIMIT, STOPPED, ...
+        :param t: Event time (s).
+        """
+        with self._lock:
+            if state == "AUTO":
+                self._reset_cycle(t)
+            elif state == "CAPTURE" and self._start is not None and self._lower_at is None:
+                self._lower_at = t
+                self._capture_times.append((t, self.cycle_number))
+            elif state == "UPPER_LIMIT":
+                self._finish(t)
+            elif state in ("STOPPED", "MANUAL_UP", "MANUAL_DOWN"):
+                self._reset_cycle(None)
+
+    def on_distance(self, distance: float, t: float) -> None:
+        """
+        Feed a distance sample; used to detect the start and end of the ascent.
+
+        :param distance: Distance (cm).
+        :param t: Sample time (s).
+        """
+        with self._lock:
+            if self._lower_at is None:
+                return
+            if self._lower_distance is None:
+                self._lower_distance = distance
+            elif self._ascent_at is None and distance > self._lower_distance + MOTION_THRESHOLD_CM:
+                self._ascent_at = t
+            if self._ascent_at is not None and distance >= DIST_UPPER_TARGET - DIST_MARGIN:
+                # Planned cycles never print "Upper limit reached".
+                self._finish(t)
+
+    def on_capture(self, duration: float, t: Optional[float] = None) -> Optional[int]:
+        """
+        Feed the duration of a capture.
+
+        With t, the capture is applied to the cycle whose CAPTURE event happened
+        at t, even if that cycle has finished meanwhile (its Cycle in history is
+        updated; on_cycle has already been called without it). Without t, it is
+        applied to the cycle in progress.
+
+        :param duration: Time from trigger to result (s).
+        :param t: Time of the CAPTURE event that triggered the capture (s).
+        :return: Number of the cycle the capture was applied to, or None.
+        """
+        with self._lock:
+            if t is None:
+                if self._lower_at is None or self._capture_duration is not None:
+                    return None
+                self._capture_duration = duration
+                return self.cycle_number
+            number = next((n for capture_t, n in self._capture_times if abs(capture_t - t) <= CAPTURE_MATCH_S),
+                          None)
+            if number is None:
+                return None
+            if number == self.cycle_number:
+                # Unless the cycle was aborted after its CAPTURE and restarted under the same number.
+                if self._lower_at is None or abs(self._lower_at - t) > CAPTURE_MATCH_S:
+                    return None
+                if self._capture_duration is None:
+                    self._capture_duration = duration
+                return number
+            for cycle in reversed(self.history):
+                if cycle.number == number:
+                    if cycle.phases.get("capture") is None:
+                        cycle.phases["capture"] = duration
+                    return number
+            return None
+
+    def _finish(self, t: float) -> None:
+        if self._start is None or self._lower_at is None:
+            # Partial cycle (e.g. started mid-ascent): start counting from here.
+            self._reset_cycle(t)
+            return
+        ascent_at = self._ascent_at if self._ascent_at is not None else self._lower_at
+        cycle = Cycle(self.cycle_number, self._start, t, {
+            "descent": self._lower_at - self._start,
+            "dwell": ascent_at - self._lower_at,
+            "capture": self._capture_duration,
+            "ascent": t - ascent_at,
+        })
+        self.completed += 1
+        self.history.append(cycle)
+        self._recent.append(cycle)
+        self._reset_cycle(t)
+        if self.on_cycle:
+            self.on_cycle(cycle)
+
+    # Statistics
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """
+        Rolling statistics over the last `window` cycles.
+
+        :return: Dict with count, mean, p95, parts_per_hour, slowest_phase and
+                 the mean duration of every phase.
+        """
+        with self._lock:
+            recent = list(self._recent)
+        result: Dict[str, Optional[float]] = {"count": len(recent), "mean": None, "p95": None,
+                                              "parts_per_hour": None, "slowest_phase": None}
+        if not recent:
+            return result
+        durations = sorted(c.duration for c in recent)
+        mean = sum(durations) / len(durations)
+        result["mean"] = mean
+        result["p95"] = durations[min(len(durations) - 1, int(round(0.95 * (len(durations) - 1))))]
+        result["parts_per_hour"] = 3600.0 / mean if mean else None
+        slowest, slowest_mean = None, -1.0
+        for phase in PHASES:
+            values = [c.phases[phase] for c in recent if c.phases.get(phase) is not None]
+            phase_mean = sum(values) / len(values) if values else None
+            result[phase] = phase_mean
+            # Capture overlaps the dwell, so it does not add to the cycle time.
+            if phase != "capture" and phase_mean is not None and phase_mean > slowest_mean:
+                slowest, slowest_mean = phase, phase_mean
+        result["slowest_phase"] = slowest
+        return result
+
+    def summary(self) -> str:
+        """One-line summary for the GUI."""
+        s = self.stats()
+        if not s["count"]:
+            return "No cycles yet"
+        return (f"{s['parts_per_hour']:.0f} parts/h, mean {s['mean']:.1f} s, p95 {s['p95']:.1f} s, "
+                f"slowest phase {s['slowest_phase']}")
+
+    # Export
+
+    def export(self, path: str, cycles: Optional[Iterable[Cycle]] = None) -> int:
+        """
+        Write cycles to CSV or JSON (chosen by file extension).
+
+        :param path: Output file ending in .csv or .json.
+        :param cycles: Cycles to write (e.g. from the session store); defaults to the in-memory history.
+        :return: Number of cycles written.
+        """
+        with self._lock:
+            rows = [c.as_dict() for c in (self.history if cycles is None else cycles)]
+        if path.lower().endswith(".json"):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"cycles": rows, "stats": self.stats()}, f, indent=2)
+            return len(rows)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["cycle", "start", "end", "duration", *PHASES])
+            writer.writeheader()
+            writer.writerows(rows)
+        return len(rows)
+
+
+def replay_session(store, session_id: Optional[int] = None, window: int = 50) -> CycleTracker:
+    """
+    Rebuild cycles from a recorded session.
+
+    :param store: SessionStore holding the session.
+    :param session_id: Session to replay (defaults to the store's current session).
+    :param window: Statistics window of the returned tracker.
+    :return: A CycleTracker fed with the whole session.
+    """
+    session_id = session_id or store.session_id
+    events = store.query(
+        "SELECT t, 0, state, NULL FROM state_transitions WHERE session_id = ? "
+        "UNION ALL SELECT t, 1, NULL, distance FROM distance_samples WHERE session_id = ? "
+        "UNION ALL SELECT t + COALESCE(duration, 0), 2, t, duration FROM captures WHERE session_id = ? "
+        "ORDER BY 1, 2",
+        (session_id, session_id, session_id))
+    tracker = CycleTracker(window)
+    for t, kind, state, value in events:
+        if kind == 0:
+            tracker.on_event(state, t)
+        elif kind == 1:
+            tracker.on_distance(value, t)
+        elif value is not None:
+            # The captures row is stamped with the trigger time, i.e. the CAPTURE event.
+            tracker.on_capture(value, state)
+    return tracker
+
+
+def cycles_from_rows(rows: Iterable[tuple]) -> List[Cycle]:
+    """
+    Build Cycle objects from SessionStore.cycles() rows.
+
+    :param rows: (cycle, start, end, descent, dwell, capture, ascent) rows.
+    :return: The cycles.
+    """
+    return [Cycle(number, start, end, dict(zip(PHASES, (descent, dwell, capture, ascent))))
+            for number, start, end, descent, dwell, capture, ascent in rows]
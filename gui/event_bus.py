@@ -0,0 +1,334 @@
+"""
+Event Bus Module
+
+In-process publish/subscribe bus that decouples the serial reader from its
+consumers (GUI, session store, cycle tracker, controllers, streamers).
+
+Every subscription owns a bounded queue with its own overflow policy, so a
+slow consumer only ever loses or delays its own events:
+
+    DROP_OLDEST  Discard the oldest queued event to make room.
+    LATEST_ONLY  Keep only the newest event (queue of one).
+    BLOCK        Make the publisher wait for room (up to block_timeout, then drop).
+
+Subscriptions are either polled (drain()) or served by a dedicated dispatcher
+thread that calls a handler. Publish cost and per-subscriber lag are measured.
+
+Classes:
+    Topic: Named, typed event channel.
+    Event: One published payload with its timestamps.
+    Subscription: Bounded per-subscriber queue with lag statistics.
+    EventBus: Topic registry and publisher.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+LATEST_ONLY = "latest_only"
+BLOCK = "block"
+POLICIES = (DROP_OLDEST, LATEST_ONLY, BLOCK)
+
+
+class Topic:
+    """
+    Named, typed event channel.
+
+    Attributes:
+        name (str): Unique topic name.
+        payload_type (type): Type every payload must be an instance of.
+    """
+    def __init__(self, name: str, payload_type: type) -> None:
+        self.name = name
+        self.payload_type = payload_type
+
+    def __repr__(self) -> str:
+        return f"Topic({self.name!r}, {self.payload_type.__name__})"
+
+
+class DistanceSample:
+    """
+    Distance telemetry payload.
+
+    Attributes:
+        t (float): Receive time (epoch s).
+        distance (float): Distance in cm.
+    """
+    __slots__ = ("t", "distance")
+
+    def __init__(self, t: float, distance: float) -> None:
+        self.t = t
+        self.distance = distance
+
+
+# Topics published by SerialInterface.
+SERIAL_LINE = Topic("serial.line", str)              # Every received line.
+DISTANCE = Topic("telemetry.distance", DistanceSample)
+STATE = Topic("state.transition", str)               # Names from serial_comm.STATE_MESSAGES.
+ACK = Topic("command.ack", str)                      # Commands echoed by the firmware.
+COMMAND = Topic("command.sent", str)                 # Commands written to the port.
+
+
+class Event:
+    """
+    One published payload.
+
+    Attributes:
+        topic (Topic): Topic it was published on.
+        payload: The payload.
+        t (float): Publish time (epoch s).
+        mono (float): Publish time (monotonic s), used for lag.
+    """
+    __slots__ = ("topic", "payload", "t", "mono")
+
+    def __init__(self, topic: Topic, payload, t: float, mono: float) -> None:
+        self.topic = topic
+        self.payload = payload
+        self.t = t
+        self.mono = mono
+
+
+class Subscription:
+    """
+    Bounded per-subscriber event queue.
+
+    Attributes:
+        name (str): Subscriber name used in statistics.
+        topics (tuple): Topics delivered to this subscription.
+        policy (str): Overflow policy.
+        maxsize (int): Queue capacity.
+        delivered (int): Events consumed.
+        dropped (int): Events discarded by the overflow policy.
+    """
+    def __init__(self, name: str, topics: Tuple[Topic, ...], policy: str = DROP_OLDEST,
+                 maxsize: int = 1000, block_timeout: float = 1.0) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.name = name
+        self.topics = topics
+        self.policy = policy
+        self.maxsize = 1 if policy == LATEST_ONLY else maxsize
+        self.block_timeout = block_timeout
+        self.delivered = 0
+        self.dropped = 0
+        self._queue: Deque[Event] = deque()
+        self._cond = threading.Condition()
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _offer(self, event: Event) -> None:
+        """Enqueue an event according to the overflow policy (publisher side)."""
+        with self._cond:
+            if len(self._queue) >= self.maxsize:
+                if self.policy == BLOCK:
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._queue) >= self.maxsize and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    if len(self._queue) >= self.maxsize:
+                        self.dropped += 1
+                        return
+                else:
+                    self._queue.popleft()
+                    self.dropped += 1
+            self._queue.append(event)
+            self._cond.notify_all()
+
+    def _took(self, events: List[Event]) -> None:
+        now = time.monotonic()
+        for event in events:
+            lag = now - event.mono
+            self._lag_total += lag
+            if lag > self._lag_max:
+                self._lag_max = lag
+        self.delivered += len(events)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """
+        Wait for the next event.
+
+        :param timeout: Maximum wait (s); None waits until closed.
+        :return: The event, or None on timeout or after close().
+        """
+        with self._cond:
+            if not self._queue and not self._closed:
+                self._cond.wait(timeout)
+            if not self._queue:
+                return None
+            event = self._queue.popleft()
+            self._cond.notify_all()
+        self._took([event])
+        return event
+
+    def drain(self, max_items: Optional[int] = None) -> List[Event]:
+        """
+        Take all (or up to max_items) queued events without waiting.
+
+        :param max_items: Optional limit.
+        :return: Events in publish order.
+        """
+        with self._cond:
+            n = len(self._queue) if max_items is None else min(max_items, len(self._queue))
+            events = [self._queue.popleft() for _ in range(n)]
+            if events:
+                self._cond.notify_all()
+        self._took(events)
+        return events
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def start_dispatcher(self, handler: Callable[[Event], None]) -> None:
+        """
+        Serve this subscription from a dedicated thread calling handler(event).
+
+        :param handler: Called for every event; exceptions are logged.
+        """
+        def run() -> None:
+            while not self._closed:
+                event = self.get(timeout=0.5)
+                if event is None:
+                    continue
+                try:
+                    handler(event)
+                except Exception as e:
+                    logger.error(f"Subscriber '{self.name}' failed on {event.topic.name}: {e}")
+
+        self._thread = threading.Thread(target=run, name=f"bus-{self.name}", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop delivery and wake any waiting publisher or dispatcher."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Delivery statistics.
+
+        :return: Dict with delivered, dropped, pending, mean_lag_ms and max_lag_ms.
+        """
+        return {
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "pending": self.pending,
+            "mean_lag_ms": 1000 * self._lag_total / self.delivered if self.delivered else 0.0,
+            "max_lag_ms": 1000 * self._lag_max,
+        }
+
+
+class EventBus:
+    """
+    Topic registry and publisher.
+
+    The subscriber list per topic is replaced on (un)subscribe, so publish()
+    iterates a snapshot without taking a lock. Only the publish counters are
+    updated under a short lock of their own, since several threads publish
+    (serial reader, command thread, trajectory streamer).
+
+    Attributes:
+        published (int): Events published.
+    """
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, Tuple[Subscription, ...]] = {}
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.published = 0
+        self._publish_ns = 0
+        self._publish_max_ns = 0
+
+    def subscribe(self, topics: Union[Topic, Iterable[Topic]], name: str = "subscriber",
+                  policy: str = DROP_OLDEST, maxsize: int = 1000, block_timeout: float = 1.0,
+                  handler: Optional[Callable[[Event], None]] = None) -> Subscription:
+        """
+        Create a subscription.
+
+        :param topics: One topic or several.
+        :param name: Subscriber name for statistics.
+        :param policy: DROP_OLDEST, LATEST_ONLY or BLOCK.
+        :param maxsize: Queue capacity (ignored for LATEST_ONLY).
+        :param block_timeout: Longest a BLOCK subscription may stall the publisher (s).
+        :param handler: If given, a dispatcher thread calls it for every event;
+                        otherwise the subscriber polls with drain()/get().
+        :return: The subscription.
+        """
+        topics = (topics,) if isinstance(topics, Topic) else tuple(topics)
+        subscription = Subscription(name, topics, policy, maxsize, block_timeout)
+        with self._lock:
+            for topic in topics:
+                self._subscribers[topic.name] = self._subscribers.get(topic.name, ()) + (subscription,)
+        if handler:
+            subscription.start_dispatcher(handler)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Remove and close a subscription.
+
+        :param subscription: Subscription returned by subscribe().
+        """
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscribers[topic.name] = tuple(
+                    s for s in self._subscribers.get(topic.name, ()) if s is not subscription)
+        subscription.close()
+
+    def publish(self, topic: Topic, payload) -> None:
+        """
+        Publish a payload to every subscriber of the topic.
+
+        :param topic: Target topic.
+        :param payload: Instance of topic.payload_type.
+        :raises TypeError: If the payload has the wrong type.
+        """
+        start = time.perf_counter_ns()
+        if not isinstance(payload, topic.payload_type):
+            raise TypeError(f"{topic.name} expects {topic.payload_type.__name__}, got {type(payload).__name__}")
+        subscribers = self._subscribers.get(topic.name)
+        if subscribers:
+            event = Event(topic, payload, time.time(), time.monotonic())
+            for subscription in subscribers:
+                subscription._offer(event)
+        elapsed = time.perf_counter_ns() - start
+        with self._stats_lock:
+            self.published += 1
+            self._publish_ns += elapsed
+            if elapsed > self._publish_max_ns:
+                self._publish_max_ns = elapsed
+
+    def subscriptions(self) -> List[Subscription]:
+        """All live subscriptions."""
+        with self._lock:
+            seen: Dict[int, Subscription] = {}
+            for subs in self._subscribers.values():
+                for s in subs:
+                    seen[id(s)] = s
+            return list(seen.values())
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Publish cost and per-subscriber statistics.
+
+        :return: Dict with published, mean_publish_us, max_publish_us and subscribers.
+        """
+        with self._stats_lock:
+            published, publish_ns, publish_max_ns = self.published, self._publish_ns, self._publish_max_ns
+        return {
+            "published": published,
+            "mean_publish_us": publish_ns / published / 1000 if published else 0.0,
+            "max_publish_us": publish_max_ns / 1000,
+            "subscribers": {s.name: s.stats() for s in self.subscriptions()},
+        }
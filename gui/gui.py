@@ -8,18 +8,26 @@ and discrete pulse interval selection for 100, 200, 300, and 500 µs.
 """
 
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 import ttkbootstrap as ttkb
 from ttkbootstrap.constants import *
 import threading
 import time
 import logging
 import queue
+import sqlite3
 import psutil
-from typing import Optional
+from typing import Callable, Optional
+from .event_bus import ACK, COMMAND, DISTANCE, DROP_OLDEST, LATEST_ONLY, SERIAL_LINE, STATE, Event
 from .serial_comm import SerialInterface
 from .styles import set_styles
-from remote_capture import capture_images  # Ensure remote_capture.py is in your project root
+from .capture_scheduler import CaptureScheduler
+from .controller import DistanceController
+from .cycle_tracker import Cycle, CycleTracker, cycles_from_rows
+from .session_store import SessionStore
+from .trajectory import TrajectoryPlanner, TrajectoryStreamer, plan_cycle
+from .ui_monitor import LoopLagMonitor, ProfilerToggle
+from remote_capture import CaptureSession, TransferStats  # Ensure remote_capture.py is in your project root
 
 # Logging configuration
 logging.basicConfig(
@@ -29,6 +37,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+RASPBERRY_IP = "192.168.1.96"
+FETCH_IMAGES = True       # Fetch the images over SFTP after every capture (run_gui.py --no-fetch).
+LOG_COLORS = {"INFO": "#ffffff", "WARNING": "#ffa500", "ERROR": "#ff0000"}  # One text tag per level.
+LOG_MAX_LINES = 1000      # Log widget lines kept; the oldest 100 are dropped beyond this.
+COMMAND_QUEUE_SIZE = 100  # Pending commands; a stalled port rejects new ones instead of piling up.
+
 class CreateToolTip:
     """
     A simple tooltip class for displaying contextual information on widget hover.
@@ -120,46 +134,98 @@ class MotorControlGUI:
         current_distance (tk.StringVar): Current distance value displayed.
         system_status (tk.StringVar): Current status of the system.
         pulse_interval_choice (tk.StringVar): Selected discrete pulse interval.
-        queue (queue.Queue): Queue for incoming serial data.
+        bus (EventBus): Event bus of the serial interface.
+        serial_subscription (Subscription): Bounded feed of received lines for the GUI.
         command_queue (queue.Queue): Queue for outgoing commands.
+        ui_calls (queue.SimpleQueue): Calls from worker threads, run on the Tk thread by process_queue.
+        session_store (SessionStore | None): Persistent recorder for the session.
+        ui_monitor (LoopLagMonitor): Main-loop lag and slow-callback instrumentation.
+        profiler (ProfilerToggle): On-demand profiler (Ctrl+F12 menu, SIGUSR1).
+        capture_session (CaptureSession): Persistent SSH session capturing and fetching images.
     """
-    def __init__(self, master: tk.Tk, serial_comm: SerialInterface) -> None:
+    def __init__(self, master: tk.Tk, serial_comm: SerialInterface,
+                 session_store: Optional[SessionStore] = None, fetch_images: bool = FETCH_IMAGES,
+                 capture_session: Optional[CaptureSession] = None) -> None:
         """
         Initialize the MotorControlGUI instance.
 
         :param master: The main tkinter window.
         :param serial_comm: Instance of SerialInterface to handle serial comm.
+        :param session_store: Optional SessionStore recording telemetry and events.
+        :param fetch_images: Fetch the captured images into the local image cache.
+        :param capture_session: Replaces the SSH CaptureSession (e.g. a simulated camera).
         """
         self.master = master
         self.serial = serial_comm
-        self.serial.register_callback(self.enqueue_serial_data)
+        self.session_store = session_store
+
+        # Installed first so every callback registered below is timed.
+        self.ui_monitor = LoopLagMonitor(master)
+        self.ui_monitor.install()
+        self.profiler = ProfilerToggle(self.ui_monitor)
+        self.profiler.install_menu(master)
+        self.profiler.install_signal()
 
         # Apply custom styles using ttkbootstrap
         self.style = ttkb.Style(theme='superhero')
         logger.info("Initializing GUI.")
 
-        # GUI state variables
-        self.mode = tk.StringVar(value="Manual")
-        self.current_distance = tk.StringVar(value="Unknown")
-        self.system_status = tk.StringVar(
+        self.create_variables()
+        self.setup_services(fetch_images, capture_session)
+
+        set_styles()
+        self.create_widgets()
+        self.start_background_tasks()
+        logger.info("GUI initialized.")
+
+        self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def create_variables(self, variable_factory: Callable[..., tk.StringVar] = tk.StringVar) -> None:
+        """
+        Create the GUI state variables.
+
+        :param variable_factory: tk.StringVar, or a stand-in when running without a display.
+        """
+        self.mode = variable_factory(value="Manual")
+        self.current_distance = variable_factory(value="Unknown")
+        self.cycle_stats = variable_factory(value="No cycles yet")
+        self.link_status = variable_factory(value=f"{self.serial.baudrate} bps")
+        self.system_status = variable_factory(
             value="Real Mode" if self.serial.is_connected else "Disconnected"
         )
 
+        # Closed-loop distance setpoint (cm)
+        self.distance_setpoint = variable_factory(value="10.0")
+
         # Discrete pulse interval selection (values: "100", "200", "300", "500")
-        self.pulse_interval_choice = tk.StringVar(value="100")
+        self.pulse_interval_choice = variable_factory(value="100")
+
+    def setup_services(self, fetch_images: bool = FETCH_IMAGES,
+                       capture_session: Optional[CaptureSession] = None) -> None:
+        """
+        Set up everything that does not need Tk: bus subscriptions, command queue,
+        planners, controllers and the capture scheduler.
+
+        Also called by the headless benchmark harness, which replaces only the Tk objects.
+
+        :param fetch_images: Fetch the captured images into the local image cache.
+        :param capture_session: CaptureSession to use instead of a new SSH session.
+        """
+        self.cycle_tracker = CycleTracker(on_cycle=self.on_cycle_completed)
+        self.shown_cycle_count = 0
+        self.bus = self.serial.bus
+        # Polled from process_queue; a stalled UI drops old lines, never the reader.
+        self.serial_subscription = self.bus.subscribe(SERIAL_LINE, name="gui", policy=DROP_OLDEST, maxsize=5000)
+        # Tk is not thread-safe: worker threads hand widget updates to process_queue.
+        self.ui_thread_id = threading.get_ident()
+        self.ui_calls: "queue.SimpleQueue[tuple]" = queue.SimpleQueue()  # (func, args) pairs.
 
         # Flags for manual control
         self.up_pressed = False
         self.down_pressed = False
-        self.queue = queue.Queue()
-
-        set_styles()
-        self.create_widgets()
-        self.master.after(100, self.process_queue)
-        logger.info("GUI initialized.")
 
         # Command queue and system monitoring
-        self.command_queue = queue.Queue()
+        self.command_queue = queue.Queue(maxsize=COMMAND_QUEUE_SIZE)
         self.command_lock = threading.Lock()
         self.last_command_time = 0.0
         self.command_throttle = 0.1
@@ -168,12 +234,44 @@ class MotorControlGUI:
         self.error_count = 0
         self.reconnect_attempts = 0
 
+        # Host-side trajectory planning; the streamer writes directly to the port
+        # so flow control is not delayed by the command throttle.
+        self.trajectory_planner = TrajectoryPlanner()
+        self.trajectory_streamer = TrajectoryStreamer(self.serial.send_command)
+        self.distance_controller = DistanceController(self.serial.send_command,
+                                                      on_fault=self.on_distance_control_fault)
+        # RESUME is written directly: it ends the firmware dwell, so it must not wait in the queue.
+        self.capture_session = capture_session or CaptureSession(RASPBERRY_IP, fetch=fetch_images)
+        self.capture_scheduler = CaptureScheduler(self.capture_session, self.serial.send_command,
+                                                  on_result=self.on_capture_result)
+
+        self.subscribe_consumers()
         self.stop_event = threading.Event()
-        self.command_thread = threading.Thread(target=self.process_command_queue, daemon=True)
-        self.command_thread.start()
 
+    def start_background_tasks(self) -> None:
+        """
+        Start the command thread and schedule the periodic queue and health callbacks.
+        """
+        self.command_thread = threading.Thread(target=self.process_command_queue, name="command-queue", daemon=True)
+        self.command_thread.start()
+        self.master.after(100, self.process_queue)
         self.master.after(5000, self.check_system_health)
-        self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def subscribe_consumers(self) -> None:
+        """
+        Subscribe the background consumers, each with its own queue and dispatcher thread.
+        """
+        self.bus.subscribe(SERIAL_LINE, name="trajectory-streamer", policy=DROP_OLDEST, maxsize=1000,
+                           handler=lambda event: self.trajectory_streamer.handle_line(event.payload))
+        self.bus.subscribe(DISTANCE, name="distance-controller", policy=LATEST_ONLY,
+                           handler=self.feed_distance_controller)
+        self.bus.subscribe((DISTANCE, STATE), name="capture-scheduler", policy=DROP_OLDEST, maxsize=1000,
+                           handler=self.capture_scheduler.handle_event)
+        self.bus.subscribe((DISTANCE, STATE), name="cycle-tracker", policy=DROP_OLDEST, maxsize=5000,
+                           handler=self.feed_cycle_tracker)
+        if self.session_store:
+            self.bus.subscribe((DISTANCE, STATE, ACK, COMMAND), name="session-store", policy=DROP_OLDEST,
+                               maxsize=20000, handler=self.feed_session_store)
 
     def create_widgets(self) -> None:
         """
@@ -193,6 +291,17 @@ class MotorControlGUI:
         ttkb.Label(info_frame, text="Status:").pack(side="left", padx=5)
         ttkb.Label(info_frame, textvariable=self.system_status, foreground="#ff00ff", font=("Consolas", 12, "bold")).pack(side="left", padx=5)
 
+        # Cycle Panel: Rolling throughput statistics of auto mode.
+        cycle_frame = ttkb.Frame(main_frame)
+        cycle_frame.pack(fill="x", pady=5)
+        ttkb.Label(cycle_frame, text="Cycles:").pack(side="left", padx=5)
+        ttkb.Label(cycle_frame, textvariable=self.cycle_stats, foreground="#00bfff", font=("Consolas", 11)).pack(side="left", padx=5)
+        ttkb.Label(cycle_frame, text="Link:").pack(side="left", padx=5)
+        ttkb.Label(cycle_frame, textvariable=self.link_status, font=("Consolas", 11)).pack(side="left", padx=5)
+        btn_export = ttkb.Button(cycle_frame, text="Export Cycles", command=self.export_cycles)
+        btn_export.pack(side="right", padx=5)
+        CreateToolTip(btn_export, "Save cycle timings as CSV or JSON.")
+
         # Button Panel: Contains operational buttons and controls.
         button_frame = ttkb.Frame(main_frame)
         button_frame.pack(fill="x", pady=5)
@@ -214,6 +323,9 @@ class MotorControlGUI:
         btn_down.bind('<ButtonPress>', self.on_up_press)
         btn_down.bind('<ButtonRelease>', self.on_up_release)
         CreateToolTip(btn_down, "Move motor up while pressed.")
+        btn_planned = ttkb.Button(button_frame, text="Planned Cycle", command=self.start_planned_cycle)
+        btn_planned.pack(side="left", padx=5, pady=5)
+        CreateToolTip(btn_planned, "Run auto cycles from host-planned motion profiles.")
         btn_stop = ttkb.Button(button_frame, text="Stop", command=self.stop_motor)
         btn_stop.pack(side="left", padx=5, pady=5)
         CreateToolTip(btn_stop, "Stop motor immediately.")
@@ -240,6 +352,11 @@ class MotorControlGUI:
                 command=self.update_discrete_speed
             )
             r.pack(side="left", padx=5)
+        ttkb.Label(speed_frame, text="Setpoint (cm):").pack(side="left", padx=5)
+        ttkb.Entry(speed_frame, textvariable=self.distance_setpoint, width=6).pack(side="left", padx=5)
+        btn_hold = ttkb.Button(speed_frame, text="Hold Distance", command=self.start_distance_control)
+        btn_hold.pack(side="left", padx=5)
+        CreateToolTip(btn_hold, "Approach and hold the setpoint with the PID controller.")
 
         # Log Area: Displays system logs.
         log_frame = ttkb.LabelFrame(main_frame, text="Logs", padding=10)
@@ -250,6 +367,8 @@ class MotorControlGUI:
         scrollbar = ttkb.Scrollbar(log_frame, orient="vertical", command=self.text_log.yview)
         scrollbar.pack(side="right", fill="y")
         self.text_log.configure(yscrollcommand=scrollbar.set)
+        for level, color in LOG_COLORS.items():
+            self.text_log.tag_config(f"log_{level}", foreground=color)
 
         # Bind keys for movement control (inverted mapping)
         self.master.bind("<KeyPress-Up>", self.on_down_press)
@@ -278,22 +397,119 @@ class MotorControlGUI:
         """
         Trigger remote image capture via SSH.
 
-        Connects to the Raspberry Pi at the specified IP address and
-        executes the remote capture script.
+        Runs the remote capture script on the persistent capture session in
+        the background; the result is reported by on_capture_result().
+        """
+        if self.capture_scheduler.trigger():
+            self.log_message("Remote capture started.", level="INFO")
+
+    def on_capture_result(self, success: bool, start: float, exposure_latency: Optional[float],
+                          duration: float, transfer: Optional[TransferStats] = None) -> None:
+        """
+        Records the result of a capture (called from the capture fetch thread; the
+        log widget is updated from the Tk thread).
+
+        :param success: Whether the capture script and the image fetch succeeded.
+        :param start: Trigger time (epoch s).
+        :param exposure_latency: Time from trigger to confirmed exposure (s), if confirmed.
+        :param duration: Time from trigger to the end of the capture script (s); the fetch is timed in transfer.
+        :param transfer: Stats of the image fetch, if one ran.
+        """
+        # Matched by the CAPTURE time: the cycle may have finished before the script did.
+        cycle = self.cycle_tracker.on_capture(duration, t=start)
+        if self.session_store:
+            details = []
+            if exposure_latency is not None:
+                details.append(f"exposed after {exposure_latency:.3f} s")
+            if transfer is not None and transfer.errors:
+                details.append(f"fetch failed ({len(transfer.errors)} errors)")
+            self.session_store.record_capture(success, duration, "; ".join(details) or None, t=start, cycle=cycle)
+            if cycle is not None and cycle < self.cycle_tracker.cycle_number:
+                self.session_store.record_cycle_capture(cycle, duration)
+            if transfer is not None:
+                latencies = transfer.latencies.values()
+                self.session_store.record_transfer(transfer.fetched, transfer.skipped, transfer.bytes,
+                                                   transfer.elapsed, max(latencies, default=None),
+                                                   transfer.errors, t=start)
+        if success:
+            self.call_in_ui(self.log_message, "Remote capture succeeded.", "INFO")
+        else:
+            self.call_in_ui(self.log_message, "Remote capture failed.", "ERROR")
+
+    def call_in_ui(self, func: Callable, *args) -> None:
+        """
+        Run func(*args) on the Tk thread at the next process_queue pass.
+
+        :param func: Callable touching widgets or Tk variables.
         """
-        raspberry_ip = "192.168.1.96"
-        if capture_images(raspberry_ip):
-            self.log_message("Remote capture succeeded.", level="INFO")
+        self.ui_calls.put((func, args))
+
+    def feed_distance_controller(self, event: Event) -> None:
+        """
+        Passes the latest distance sample to the closed-loop controller.
+
+        :param event: DISTANCE event.
+        """
+        if self.distance_controller.active:
+            self.distance_controller.update_measurement(event.payload.distance)
+
+    def feed_cycle_tracker(self, event: Event) -> None:
+        """
+        Passes distance samples and state transitions to the cycle tracker.
+
+        :param event: DISTANCE or STATE event.
+        """
+        if event.topic is DISTANCE:
+            self.cycle_tracker.on_distance(event.payload.distance, event.t)
         else:
-            self.log_message("Remote capture failed.", level="ERROR")
+            self.cycle_tracker.on_event(event.payload, event.t)
 
-    def enqueue_serial_data(self, data: str) -> None:
+    def feed_session_store(self, event: Event) -> None:
         """
-        Enqueue data received from the serial interface.
+        Records telemetry, state transitions, acknowledgements and sent commands.
+
+        :param event: DISTANCE, STATE, ACK or COMMAND event.
+        """
+        store = self.session_store
+        if event.topic is DISTANCE:
+            store.record_distance(event.payload.distance, t=event.t)
+        elif event.topic is STATE:
+            store.record_transition(event.payload, t=event.t)
+        elif event.topic is ACK:
+            store.record_ack(event.payload, t=event.t)
+        else:
+            store.record_command(event.payload, t=event.t)
 
-        :param data: Data string received from Arduino.
+    def on_cycle_completed(self, cycle: Cycle) -> None:
         """
-        self.queue.put(data)
+        Records a completed cycle; called by the cycle tracker.
+
+        :param cycle: The completed cycle.
+        """
+        if self.session_store:
+            self.session_store.record_cycle(cycle.number, cycle.start, cycle.end, cycle.phases)
+            self.session_store.cycle = self.cycle_tracker.cycle_number
+        logger.info(f"Cycle {cycle.number}: {cycle.duration:.2f} s "
+                    + ", ".join(f"{k} {v:.2f} s" for k, v in cycle.phases.items() if v is not None))
+
+    def export_cycles(self) -> None:
+        """
+        Exports the tracked cycles to a CSV or JSON file chosen by the user.
+        """
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")],
+            title="Export cycles"
+        )
+        if not path:
+            return
+        try:
+            # The session store has every cycle; the tracker only keeps the recent history.
+            cycles = cycles_from_rows(self.session_store.cycles()) if self.session_store else None
+            count = self.cycle_tracker.export(path, cycles)
+            self.log_message(f"Exported {count} cycles to {path}.", level="INFO")
+        except (OSError, sqlite3.Error) as e:
+            self.log_message(f"Cycle export failed: {e}", level="ERROR")
 
     def process_queue(self) -> None:
         """
@@ -302,11 +518,17 @@ class MotorControlGUI:
         Continuously schedules itself to run every 100 ms.
         """
         try:
-            while not self.queue.empty():
-                data = self.queue.get_nowait()
-                self.handle_serial_data(data)
-        except queue.Empty:
-            pass
+            while True:
+                try:
+                    func, args = self.ui_calls.get_nowait()
+                except queue.Empty:
+                    break
+                func(*args)
+            for event in self.serial_subscription.drain():
+                self.handle_serial_data(event.payload)
+            if self.cycle_tracker.completed != self.shown_cycle_count:
+                self.shown_cycle_count = self.cycle_tracker.completed
+                self.cycle_stats.set(self.cycle_tracker.summary())
         except Exception as e:
             logger.error(f"Queue error: {e}")
             self.log_message(f"Queue error: {e}", level="ERROR")
@@ -370,6 +592,70 @@ class MotorControlGUI:
             self.log_message("Auto mode activated.", level="INFO")
             logger.info("Auto mode activated.")
 
+    def start_planned_cycle(self) -> None:
+        """
+        Streams host-planned auto cycles (descend, dwell with capture, ascend).
+
+        The actuator must be at the upper target; the cycle repeats until Stop
+        or a mode change.
+        """
+        lines = self.trajectory_planner.plan(plan_cycle())
+        if self.trajectory_streamer.start(lines, repeat=True):
+            self.cycle_tracker.on_event("AUTO", time.time())
+            self.mode.set("Auto")
+            self.system_status.set("Planned Cycle Active")
+            self.log_message(f"Planned cycle started ({len(lines)} trajectory lines).", level="INFO")
+            logger.info("Planned cycle started.")
+        else:
+            self.log_message("Failed to start planned cycle.", level="ERROR")
+
+    def start_distance_control(self) -> None:
+        """
+        Starts the closed-loop distance controller toward the entered setpoint.
+
+        Any other motion command stops it and logs its step-response and
+        loop-jitter measurements.
+        """
+        try:
+            setpoint = float(self.distance_setpoint.get())
+        except ValueError:
+            self.log_message(f"Invalid setpoint: {self.distance_setpoint.get()}", level="ERROR")
+            return
+        if self.trajectory_streamer.active:
+            self.trajectory_streamer.abort()
+        self.distance_controller.start(setpoint)
+        self.mode.set("Closed Loop")
+        self.system_status.set(f"Holding {setpoint} cm")
+        self.log_message(f"Distance control started, setpoint {setpoint} cm.", level="INFO")
+
+    def stop_distance_control(self) -> None:
+        """
+        Stops the closed-loop distance controller and reports its metrics.
+        """
+        if not self.distance_controller.active:
+            return
+        self.distance_controller.stop()
+        self.log_message(f"Distance control: {self.distance_controller.metrics()}.", level="INFO")
+        self.log_message(f"Control loop: {self.distance_controller.loop.jitter()}.", level="INFO")
+
+    def on_distance_control_fault(self, message: str) -> None:
+        """
+        Called from the control loop thread when it stopped itself (no distance samples).
+
+        :param message: Reason reported by the controller.
+        """
+        self.call_in_ui(self.show_distance_control_fault, message)
+
+    def show_distance_control_fault(self, message: str) -> None:
+        """
+        Reports a distance control fault and returns the display to manual mode.
+
+        :param message: Reason reported by the controller.
+        """
+        self.mode.set("Manual")
+        self.system_status.set("Distance Control Stopped")
+        self.log_message(message, level="ERROR")
+
     def activate_manual(self) -> None:
         """
         Activates manual mode by sending the "STOP" command.
@@ -432,6 +718,13 @@ class MotorControlGUI:
         :param data: The data string received from the serial port.
         """
         logger.debug(f"Received: {data}")
+        if data.startswith("TRAJ_"):
+            # Flow control is handled by the streamer's own subscription.
+            if data.startswith("TRAJ_UNDERRUN"):
+                self.log_message("Trajectory buffer underrun.", level="WARNING")
+            elif data.startswith("TRAJ_DONE") and not self.trajectory_streamer.active:
+                self.log_message("Planned cycle finished.", level="INFO")
+            return
         if "Current distance" in data:
             try:
                 d_str = data.split(":")[-1].strip().replace(" cm", "")
@@ -455,8 +748,8 @@ class MotorControlGUI:
         elif "Vacuum pump off" in data:
             self.log_message("Vacuum pump turned off.", level="INFO")
         elif "CAPTURE" in data:
+            # The capture itself is started by the capture scheduler subscription.
             self.log_message("Capture command received from Arduino.", level="INFO")
-            self.trigger_capture()
         else:
             logger.debug(f"Unclassified: {data}")
 
@@ -464,23 +757,23 @@ class MotorControlGUI:
         """
         Logs a message in the text log area of the GUI.
 
+        Calls from other threads (e.g. the command queue) are deferred to the Tk thread.
+
         :param message: The message to log.
         :param level: The log level (INFO, WARNING, ERROR).
         """
         if level == "DEBUG":
             return
-        color_map = {"INFO": "#ffffff", "WARNING": "#ffa500", "ERROR": "#ff0000"}
-        color = color_map.get(level, "#ffffff")
+        if threading.get_ident() != self.ui_thread_id:
+            self.call_in_ui(self.log_message, message, level)
+            return
+        # Shared per-level tags: a tag per line would leave one tag behind for every message ever logged.
+        tag_name = f"log_{level}" if level in LOG_COLORS else "log_INFO"
         self.text_log.configure(state='normal')
-        self.text_log.insert(tk.END, f"{message}\n")
-        max_lines = 1000
+        self.text_log.insert(tk.END, f"{message}\n", tag_name)
         current_lines = int(self.text_log.index('end-1c').split('.')[0])
-        if current_lines > max_lines:
+        if current_lines > LOG_MAX_LINES:
             self.text_log.delete('1.0', f"{100}.0")
-        last_line = int(self.text_log.index("end-1c").split('.')[0])
-        tag_name = f"log_{last_line}"
-        self.text_log.tag_add(tag_name, f"{last_line}.0", f"{last_line}.end")
-        self.text_log.tag_config(tag_name, foreground=color)
         self.text_log.configure(state='disabled')
         self.text_log.see(tk.END)
         logger.info(f"Log: {message}")
@@ -516,6 +809,15 @@ class MotorControlGUI:
             logger.info("Application closed by user.")
             self.stop_event.set()
             self.command_thread.join(timeout=1)
+            logger.info(f"Event bus: {self.bus.stats()}")
+            logger.info(self.ui_monitor.summary())
+            self.profiler.stop()
+            self.ui_monitor.uninstall()
+            self.capture_session.close()
+            for subscription in self.bus.subscriptions():
+                self.bus.unsubscribe(subscription)
+            if self.session_store:
+                self.session_store.close()
             self.master.destroy()
 
     def send_command(self, command: str, priority: int = 1) -> bool:
@@ -527,12 +829,22 @@ class MotorControlGUI:
         :return: True if the command was enqueued successfully, False otherwise.
         """
         current_time = time.time()
+        if self.trajectory_streamer.active and not command.startswith("SET_SPEED"):
+            # The firmware drops the trajectory on any other command.
+            self.trajectory_streamer.abort()
+        if self.distance_controller.active and not command.startswith("SET_SPEED"):
+            self.stop_distance_control()
         if current_time - self.last_command_time < self.command_throttle:
             logger.warning(f"Command '{command}' throttled.")
             self.log_message(f"Command '{command}' throttled.", level="WARNING")
             return False
         with self.command_lock:
-            self.command_queue.put((priority, current_time, command))
+            try:
+                self.command_queue.put_nowait((priority, current_time, command))
+            except queue.Full:
+                logger.error(f"Command '{command}' rejected: command queue full.")
+                self.log_message(f"Command '{command}' rejected (queue full).", level="ERROR")
+                return False
             self.last_command_time = current_time
         return True
 
@@ -579,6 +891,8 @@ class MotorControlGUI:
             self.system_health = min(100, self.system_health + 20)
             self.log_message("Recovery successful.", level="INFO")
             logger.info("Recovery successful.")
+        stats = self.serial.stats
+        self.link_status.set(f"{stats.baudrate} bps, {stats.line_errors} errors, {stats.fallbacks} fallbacks")
         if not self.serial.is_connected:
             self.attempt_reconnect()
         self.master.after(5000, self.check_system_health)
@@ -2,9 +2,11 @@
 Serial Communication Module
 
 Handles the serial communication between the GUI and the Arduino.
-Provides functions for connecting, disconnecting, reading, and sending commands.
+Provides functions for connecting, disconnecting, reading, and sending commands,
+and for negotiating a faster baud rate with the firmware at runtime.
 
 Classes:
+    LinkStats: Counters describing the health of the serial link.
     SerialInterface: Manages the serial connection and communication.
 """
 
@@ -13,6 +15,79 @@ import serial.tools.list_ports
 import threading
 import time
 import logging
+from .event_bus import ACK, COMMAND, DISTANCE, SERIAL_LINE, STATE, DistanceSample, EventBus
+
+DEFAULT_BAUDRATE = 9600  # Rate the firmware starts at (SERIAL_DEFAULT_BAUD).
+NEGOTIATION_RATES = (1000000, 500000, 250000, 115200)  # Tried fastest first.
+# Host-side fallback rule: garbled received lines counted within a sliding window.
+# Unrelated to the firmware's LINK_ERROR_LIMIT (consecutive garbled commands, config.h).
+LINK_ERROR_WINDOW_LIMIT = 5   # Garbled lines within LINK_ERROR_WINDOW that trigger a fallback.
+LINK_ERROR_WINDOW = 10.0      # Seconds.
+BAUD_CONFIRM_TIMEOUT = 2.0    # Firmware reverts an unconfirmed switch after this (BAUD_CONFIRM_TIMEOUT_MS).
+
+# Firmware log lines published as state transitions on the STATE topic.
+STATE_MESSAGES = {
+    "Auto mode activated": "AUTO",
+    "Lower limit reached": "LOWER_LIMIT",
+    "Upper limit reached": "UPPER_LIMIT",
+    "Manual mode: Continuous up": "MANUAL_UP",
+    "Manual mode: Continuous down": "MANUAL_DOWN",
+    "Stopping manual motion": "STOPPED",
+    "CAPTURE": "CAPTURE",
+    "TRAJ_DONE": "TRAJ_DONE",
+}
+ACK_PREFIX = "Command received: "
+
+
+def parse_distance(data):
+    """
+    Extracts the distance from a "Current distance: 12.34 cm" line.
+
+    :param data: Received line.
+    :return: Distance in cm, or None if the line is not a valid distance sample.
+    """
+    if not data.startswith("Current distance"):
+        return None
+    try:
+        return float(data.split(":")[-1].strip().replace(" cm", ""))
+    except ValueError:
+        return None
+
+
+class LinkStats:
+    """
+    Counters describing the health of the serial link.
+
+    Attributes:
+        baudrate (int): Current baud rate.
+        lines (int): Lines received.
+        bytes (int): Bytes received.
+        line_errors (int): Garbled lines received.
+        probe_failures (int): PING probes that were lost or corrupted.
+        fallbacks (int): Automatic fallbacks to the default rate.
+        rtt_ms (float | None): Mean PING round trip of the last probe.
+    """
+    def __init__(self, baudrate: int) -> None:
+        self.baudrate = baudrate
+        self.lines = 0
+        self.bytes = 0
+        self.line_errors = 0
+        self.probe_failures = 0
+        self.fallbacks = 0
+        self.rtt_ms = None
+        self.started = time.monotonic()
+
+    @property
+    def lines_per_s(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.lines / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        rtt = f"{self.rtt_ms:.1f} ms" if self.rtt_ms is not None else "n/a"
+        return (f"{self.baudrate} bps, {self.lines} lines ({self.lines_per_s:.1f}/s), "
+                f"{self.line_errors} garbled, {self.probe_failures} probe failures, "
+                f"{self.fallbacks} fallbacks, RTT {rtt}")
+
 
 class SerialInterface:
     """
@@ -23,24 +98,39 @@ class SerialInterface:
         baudrate (int): The communication speed in baud.
         serial_conn: The serial connection object.
         is_connected (bool): Connection status.
-        callback: Function to call when new data is received.
+        callback: Function to call when new data is received (single consumer;
+            prefer subscribing to the bus).
+        bus (EventBus): Receives every line (SERIAL_LINE) plus decoded DISTANCE,
+            STATE and ACK events, and COMMAND for every command sent.
         read_thread: Thread for continuously reading data.
         stop_thread (bool): Flag to stop the reading thread.
+        write_lock (threading.Lock): Serializes writes from the GUI and streaming threads.
+        stats (LinkStats): Link health counters.
+        serial_factory: Callable opening the port (serial.Serial or a simulated device).
     """
-    def __init__(self, port='COM3', baudrate=9600):
+    def __init__(self, port='COM3', baudrate=DEFAULT_BAUDRATE, serial_factory=None, bus=None):
         """
         Initializes the SerialInterface with the given port and baudrate.
 
         :param port: Serial port identifier.
         :param baudrate: Communication baud rate.
+        :param serial_factory: Called as factory(port, baudrate, timeout=...) to open
+                               the port; defaults to serial.Serial.
+        :param bus: EventBus to publish on; a private one is created if omitted.
         """
         self.port = port
         self.baudrate = baudrate
+        self.fallback_baudrate = baudrate
+        self.serial_factory = serial_factory or serial.Serial
         self.serial_conn = None
         self.is_connected = False
         self.callback = None
+        self.bus = bus or EventBus()
         self.read_thread = None
         self.stop_thread = False
+        self.write_lock = threading.Lock()
+        self.stats = LinkStats(baudrate)
+        self._error_times = []
 
     def connect(self):
         """
@@ -48,12 +138,16 @@ class SerialInterface:
 
         :return: True if connected successfully, False otherwise.
         """
+        # A reconnect must not leave the previous reader or port handle behind.
+        self._stop_reader()
+        if self.serial_conn and self.serial_conn.is_open:
+            self.serial_conn.close()
+        # A reconnect usually follows a board reset, which restores the default rate.
+        self.baudrate = self.stats.baudrate = self.fallback_baudrate
         try:
-            self.serial_conn = serial.Serial(self.port, self.baudrate, timeout=1)
+            self.serial_conn = self.serial_factory(self.port, self.baudrate, timeout=1)
             self.is_connected = True
-            self.stop_thread = False
-            self.read_thread = threading.Thread(target=self.read_from_port, daemon=True)
-            self.read_thread.start()
+            self._start_reader()
             logging.info(f"Connected to serial port {self.port} at {self.baudrate} bps.")
             return True
         except serial.SerialException as e:
@@ -65,14 +159,25 @@ class SerialInterface:
         """
         Closes the serial connection and stops the reading thread.
         """
-        self.stop_thread = True
-        if self.read_thread and self.read_thread.is_alive():
-            self.read_thread.join()
+        self._stop_reader()
         if self.serial_conn and self.serial_conn.is_open:
             self.serial_conn.close()
             logging.info(f"Serial port {self.port} closed.")
         self.is_connected = False
 
+    def _start_reader(self):
+        self.stop_thread = False
+        self.read_thread = threading.Thread(target=self.read_from_port, name="serial-reader", daemon=True)
+        self.read_thread.start()
+
+    def _stop_reader(self):
+        """Stops the reading thread; returns True if it was running."""
+        running = bool(self.read_thread and self.read_thread.is_alive())
+        self.stop_thread = True
+        if running and self.read_thread is not threading.current_thread():
+            self.read_thread.join()
+        return running
+
     def register_callback(self, callback):
         """
         Registers a callback function to be called upon receiving serial data.
@@ -81,17 +186,72 @@ class SerialInterface:
         """
         self.callback = callback
 
+    def _dispatch(self, data):
+        """
+        Delivers a received line to the callback and publishes it on the bus.
+
+        :param data: Decoded line.
+        """
+        if self.callback:
+            self.callback(data)
+        bus = self.bus
+        bus.publish(SERIAL_LINE, data)
+        distance = parse_distance(data)
+        if distance is not None:
+            bus.publish(DISTANCE, DistanceSample(time.time(), distance))
+        elif data.startswith(ACK_PREFIX):
+            bus.publish(ACK, data[len(ACK_PREFIX):])
+        else:
+            for message, state in STATE_MESSAGES.items():
+                if message in data:
+                    bus.publish(STATE, state)
+                    break
+
+    def _read_line(self):
+        """
+        Reads one line and updates the link counters.
+
+        :return: The decoded, stripped line; None on timeout or for a garbled line.
+        """
+        raw = self.serial_conn.readline()
+        if not raw:
+            return None
+        self.stats.bytes += len(raw)
+        try:
+            data = raw.decode('utf-8').strip()
+        except UnicodeDecodeError:
+            data = None
+        if data is None or any(ord(c) < 32 and c != '\t' for c in data):
+            self.stats.line_errors += 1
+            now = time.monotonic()
+            self._error_times = [t for t in self._error_times if now - t < LINK_ERROR_WINDOW] + [now]
+            return None
+        self.stats.lines += 1
+        return data
+
+    def _link_degraded(self):
+        return (self.baudrate != self.fallback_baudrate
+                and len(self._error_times) >= LINK_ERROR_WINDOW_LIMIT)
+
     def read_from_port(self):
         """
         Continuously reads data from the serial port and invokes the callback.
+
+        All buffered lines are drained before sleeping, so throughput is bound by
+        the link rather than the polling interval. If garbled lines accumulate at a
+        negotiated rate, the link falls back to the default rate.
         """
         while not self.stop_thread:
             try:
-                if self.serial_conn.in_waiting:
-                    data = self.serial_conn.readline().decode('utf-8').strip()
-                    if self.callback:
-                        self.callback(data)
-                time.sleep(0.1)
+                if not self.serial_conn.in_waiting:
+                    time.sleep(0.01)
+                    continue
+                while self.serial_conn.in_waiting and not self.stop_thread:
+                    data = self._read_line()
+                    if data is not None:
+                        self._dispatch(data)
+                if self._link_degraded():
+                    self._fallback()
             except Exception as e:
                 logging.error(f"Serial read error: {e}")
                 self.is_connected = False
@@ -106,8 +266,10 @@ class SerialInterface:
         """
         if self.is_connected and self.serial_conn:
             try:
-                self.serial_conn.write(f"{command}\n".encode('utf-8'))
+                with self.write_lock:
+                    self.serial_conn.write(f"{command}\n".encode('utf-8'))
                 logging.debug(f"Command sent: {command}")
+                self.bus.publish(COMMAND, command)
                 return True
             except Exception as e:
                 logging.error(f"Error sending command '{command}': {e}")
@@ -116,3 +278,135 @@ class SerialInterface:
         else:
             logging.error("Attempt to send command without serial connection.")
             return False
+
+    # Baud-rate negotiation
+
+    def _write_raw(self, command):
+        with self.write_lock:
+            self.serial_conn.write(f"{command}\n".encode('utf-8'))
+
+    def _set_port_baudrate(self, rate):
+        self.serial_conn.flush()
+        self.serial_conn.baudrate = rate
+        self.serial_conn.reset_input_buffer()
+        self.baudrate = rate
+        self.stats.baudrate = rate
+
+    def _wait_for(self, prefixes, timeout):
+        """
+        Reads lines until one starts with a prefix; other lines reach the callback.
+
+        :param prefixes: Tuple of accepted prefixes.
+        :param timeout: Maximum wait (s).
+        :return: The matching line, or None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            data = self._read_line()
+            if data is None:
+                continue
+            if data.startswith(prefixes):
+                return data
+            self._dispatch(data)
+        return None
+
+    def probe_link(self, count=10, timeout=0.5, stop_on_failure=False):
+        """
+        Sends PING probes and checks every PONG; the reader thread must not be running.
+
+        :param count: Number of probes.
+        :param timeout: Maximum wait per probe (s).
+        :param stop_on_failure: Return at the first failed probe.
+        :return: Number of failed probes.
+        """
+        failures = 0
+        rtts = []
+        for i in range(count):
+            start = time.perf_counter()
+            self._write_raw(f"PING {i}")
+            reply = self._wait_for(("PONG",), timeout)
+            if reply == f"PONG {i}":
+                rtts.append((time.perf_counter() - start) * 1000)
+            else:
+                failures += 1
+                if stop_on_failure:
+                    break
+        self.stats.probe_failures += failures
+        if rtts:
+            self.stats.rtt_ms = sum(rtts) / len(rtts)
+        return failures
+
+    def _try_rate(self, rate, probes):
+        """Switches both ends to a rate and keeps it only if every probe succeeds."""
+        previous = self.baudrate
+        self._write_raw(f"BAUD {rate}")
+        reply = self._wait_for(("BAUD_OK", "BAUD_ERR"), 1.0)
+        if reply != f"BAUD_OK {rate}":
+            logging.info(f"Firmware refused {rate} bps ({reply or 'no reply'}).")
+            return False
+        time.sleep(0.05)  # Let the firmware reopen its port.
+        self._set_port_baudrate(rate)
+        self._error_times = []
+        failures = self.probe_link(probes, stop_on_failure=True)
+        if failures == 0:
+            self._write_raw("BAUD_COMMIT")
+            if self._wait_for(("BAUD_COMMITTED",), 1.0):
+                return True
+        logging.warning(f"Link unreliable at {rate} bps.")
+        # The firmware reverts on its own once BAUD_CONFIRM_TIMEOUT passes without a commit.
+        self._set_port_baudrate(previous)
+        self._wait_for(("BAUD_REVERT",), BAUD_CONFIRM_TIMEOUT + 0.5)
+        self._error_times = []
+        return False
+
+    def negotiate_baudrate(self, rates=NEGOTIATION_RATES, probes=20):
+        """
+        Agrees on the fastest rate both ends handle reliably.
+
+        Each candidate is acknowledged by the firmware, verified with PING probes
+        and committed; a failed candidate is rolled back before the next one.
+
+        :param rates: Candidate rates, fastest first.
+        :param probes: Probes required to pass at each rate.
+        :return: The rate in use afterwards.
+        """
+        if not self.is_connected:
+            return self.baudrate
+        restart = self._stop_reader()
+        try:
+            self.serial_conn.reset_input_buffer()
+            for rate in rates:
+                if rate == self.baudrate:
+                    break
+                if self._try_rate(rate, probes):
+                    logging.info(f"Serial link negotiated at {rate} bps: {self.stats}")
+                    break
+            else:
+                logging.info(f"Keeping {self.baudrate} bps.")
+        except Exception as e:
+            logging.error(f"Baud negotiation error: {e}")
+        finally:
+            if restart:
+                self._start_reader()
+        return self.baudrate
+
+    def _fallback(self):
+        """
+        Returns to the default rate after repeated garbled lines.
+
+        Asks the firmware to switch (it also reverts by itself after repeated
+        garbled commands), then probes until the link answers.
+        """
+        logging.warning(f"Serial link degraded at {self.baudrate} bps; falling back to {self.fallback_baudrate}.")
+        self.stats.fallbacks += 1
+        self._write_raw(f"BAUD {self.fallback_baudrate}")
+        time.sleep(0.05)
+        self._set_port_baudrate(self.fallback_baudrate)
+        self._error_times = []
+        for _ in range(3):
+            if self.probe_link(3) < 3:
+                self._write_raw("BAUD_COMMIT")
+                break
+            # Probes sent at the wrong rate reach the firmware as garbage, which
+            # makes it revert to the default rate as well.
+        logging.info(f"Serial link now at {self.baudrate} bps: {self.stats}")
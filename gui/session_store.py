@@ -0,0 +1,332 @@
+"""
+Session Store Module
+
+Persists what the GUI observes (distance samples, sent commands, firmware
+acknowledgements, state transitions, capture results, image transfers and
+cycles) in SQLite.
+
+Producers only enqueue rows; a background writer thread batches them into a
+single transaction per flush, executing them in queue order, with the database in WAL mode so queries can
+run while ingest continues. Recording never blocks: if the queue is full the
+row is dropped and counted.
+
+Classes:
+    SessionStore: Non-blocking recorder and query helper for one database.
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "logs/sessions.db"
+CLOSE_TIMEOUT_S = 10.0  # Longest close() waits for the writer to take the stop marker and flush.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    port TEXT,
+    note TEXT
+);
+CREATE TABLE IF NOT EXISTS distance_samples (
+    session_id INTEGER NOT NULL,
+    cycle INTEGER,
+    t REAL NOT NULL,
+    distance REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS commands (
+    session_id INTEGER NOT NULL,
+    cycle INTEGER,
+    t REAL NOT NULL,
+    command TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS acks (
+    session_id INTEGER NOT NULL,
+    cycle INTEGER,
+    t REAL NOT NULL,
+    command TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state_transitions (
+    session_id INTEGER NOT NULL,
+    cycle INTEGER,
+    t REAL NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS captures (
+    session_id INTEGER NOT NULL,
+    cycle INTEGER,
+    t REAL NOT NULL,
+    success INTEGER NOT NULL,
+    duration REAL,
+    detail TEXT
+);
+CREATE TABLE IF NOT EXISTS transfers (
+    session_id INTEGER NOT NULL,
+    cycle INTEGER,
+    t REAL NOT NULL,
+    fetched INTEGER NOT NULL,
+    skipped INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    elapsed REAL NOT NULL,
+    max_latency REAL,
+    errors TEXT
+);
+CREATE TABLE IF NOT EXISTS cycles (
+    session_id INTEGER NOT NULL,
+    cycle INTEGER NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    duration REAL NOT NULL,
+    descent REAL,
+    dwell REAL,
+    capture REAL,
+    ascent REAL
+);
+CREATE INDEX IF NOT EXISTS idx_samples_session_t ON distance_samples (session_id, t);
+CREATE INDEX IF NOT EXISTS idx_samples_session_cycle ON distance_samples (session_id, cycle);
+CREATE INDEX IF NOT EXISTS idx_commands_session_t ON commands (session_id, t);
+CREATE INDEX IF NOT EXISTS idx_acks_session_t ON acks (session_id, t);
+CREATE INDEX IF NOT EXISTS idx_transitions_session_t ON state_transitions (session_id, t);
+CREATE INDEX IF NOT EXISTS idx_captures_session_t ON captures (session_id, t);
+CREATE INDEX IF NOT EXISTS idx_transfers_session_t ON transfers (session_id, t);
+CREATE INDEX IF NOT EXISTS idx_cycles_session_cycle ON cycles (session_id, cycle);
+CREATE INDEX IF NOT EXISTS idx_cycles_start_duration ON cycles (start, duration);
+"""
+
+INSERTS = {
+    "distance_samples": "INSERT INTO distance_samples (session_id, cycle, t, distance) VALUES (?, ?, ?, ?)",
+    "commands": "INSERT INTO commands (session_id, cycle, t, command) VALUES (?, ?, ?, ?)",
+    "acks": "INSERT INTO acks (session_id, cycle, t, command) VALUES (?, ?, ?, ?)",
+    "state_transitions": "INSERT INTO state_transitions (session_id, cycle, t, state) VALUES (?, ?, ?, ?)",
+    "captures": "INSERT INTO captures (session_id, cycle, t, success, duration, detail) VALUES (?, ?, ?, ?, ?, ?)",
+    "transfers": ("INSERT INTO transfers (session_id, cycle, t, fetched, skipped, bytes, elapsed, max_latency, errors) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"),
+    "cycles": ("INSERT INTO cycles (session_id, cycle, start, end, duration, descent, dwell, capture, ascent) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"),
+    # The writer keeps queue order across tables, so this always follows the cycle's insert.
+    "cycle_captures": "UPDATE cycles SET capture = ? WHERE session_id = ? AND cycle = ?",
+}
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SessionStore:
+    """
+    Non-blocking session recorder backed by SQLite in WAL mode.
+
+    Attributes:
+        path (str): Database file.
+        session_id (int): Id of the session opened by this instance.
+        cycle (int | None): Cycle number stamped on recorded rows.
+        dropped (int): Rows discarded because the queue was full.
+        written (int): Rows committed so far.
+    """
+    def __init__(self, path: str = DEFAULT_DB_PATH, port: Optional[str] = None, note: Optional[str] = None,
+                 batch_size: int = 500, flush_interval: float = 0.25, max_queue: int = 100000) -> None:
+        """
+        Open (or create) the database and start a new session.
+
+        :param path: Database file.
+        :param port: Serial port recorded with the session.
+        :param note: Free-text note recorded with the session.
+        :param batch_size: Maximum rows per transaction.
+        :param flush_interval: Maximum time rows wait before being committed (s).
+        :param max_queue: Queue capacity; rows beyond it are dropped.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cycle: Optional[int] = None
+        self.dropped = 0
+        self.written = 0
+        self._queue: "queue.Queue[Optional[Tuple[str, tuple]]]" = queue.Queue(maxsize=max_queue)
+
+        conn = _connect(path)
+        with conn:
+            conn.executescript(SCHEMA)
+            cursor = conn.execute("INSERT INTO sessions (started_at, port, note) VALUES (?, ?, ?)",
+                                  (time.time(), port, note))
+            self.session_id = cursor.lastrowid
+        conn.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="session-store-writer", daemon=True)
+        self._writer.start()
+        logger.info(f"Session {self.session_id} recording to {path}.")
+
+    # Recording (safe to call from any thread; never blocks)
+
+    def _put(self, table: str, row: tuple) -> None:
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            self.dropped += 1
+
+    def record_distance(self, distance: float, t: Optional[float] = None) -> None:
+        """Record a distance sample (cm)."""
+        self._put("distance_samples", (self.session_id, self.cycle, time.time() if t is None else t, distance))
+
+    def record_command(self, command: str, t: Optional[float] = None) -> None:
+        """Record a command written to the board."""
+        self._put("commands", (self.session_id, self.cycle, time.time() if t is None else t, command))
+
+    def record_ack(self, command: str, t: Optional[float] = None) -> None:
+        """Record a firmware acknowledgement ("Command received: ...")."""
+        self._put("acks", (self.session_id, self.cycle, time.time() if t is None else t, command))
+
+    def record_transition(self, state: str, t: Optional[float] = None) -> None:
+        """Record a mode or motion state change."""
+        self._put("state_transitions", (self.session_id, self.cycle, time.time() if t is None else t, state))
+
+    def record_capture(self, success: bool, duration: Optional[float] = None, detail: Optional[str] = None,
+                       t: Optional[float] = None, cycle: Optional[int] = None) -> None:
+        """Record the result of a remote capture (cycle defaults to the current one)."""
+        self._put("captures", (self.session_id, self.cycle if cycle is None else cycle, time.time() if t is None else t,
+                               int(success), duration, detail))
+
+    def record_transfer(self, fetched: int, skipped: int, nbytes: int, elapsed: float,
+                        max_latency: Optional[float] = None, errors: Sequence[str] = (),
+                        t: Optional[float] = None) -> None:
+        """Record the image fetch that followed a capture (errors are stored newline-joined)."""
+        self._put("transfers", (self.session_id, self.cycle, time.time() if t is None else t, fetched, skipped, nbytes,
+                                elapsed, max_latency, "\n".join(errors) or None))
+
+    def record_cycle(self, cycle: int, start: float, end: float, phases: Optional[Dict[str, float]] = None) -> None:
+        """
+        Record a completed cycle.
+
+        :param cycle: Cycle number.
+        :param start: Start time (epoch s).
+        :param end: End time (epoch s).
+        :param phases: Optional durations keyed by descent, dwell, capture and ascent.
+        """
+        phases = phases or {}
+        self._put("cycles", (self.session_id, cycle, start, end, end - start, phases.get("descent"),
+                             phases.get("dwell"), phases.get("capture"), phases.get("ascent")))
+
+    def record_cycle_capture(self, cycle: int, duration: float) -> None:
+        """Add the capture duration to a cycle recorded before its capture finished."""
+        self._put("cycle_captures", (duration, self.session_id, cycle))
+
+    # Writer thread
+
+    def _write_loop(self) -> None:
+        conn = _connect(self.path)
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            # Runs of consecutive rows for the same table, in queue order: an UPDATE
+            # must not be executed before the INSERT it follows.
+            batch: List[Tuple[str, List[tuple]]] = []
+            count = 0
+            while True:
+                if item is None:
+                    running = False
+                else:
+                    table, row = item
+                    if batch and batch[-1][0] == table:
+                        batch[-1][1].append(row)
+                    else:
+                        batch.append((table, [row]))
+                    count += 1
+                if count >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    with conn:
+                        for table, rows in batch:
+                            conn.executemany(INSERTS[table], rows)
+                    self.written += count
+                except sqlite3.Error as e:
+                    logger.error(f"Session store write error: {e}")
+        conn.close()
+
+    def close(self) -> None:
+        """
+        Flush pending rows, mark the session as ended and stop the writer.
+        """
+        try:
+            self._queue.put(None, timeout=CLOSE_TIMEOUT_S if self._writer.is_alive() else 0)
+        except queue.Full:
+            logger.error(f"Session store writer not running; {self._queue.qsize()} rows not written.")
+        self._writer.join(timeout=CLOSE_TIMEOUT_S)
+        conn = _connect(self.path)
+        with conn:
+            conn.execute("UPDATE sessions SET ended_at = ? WHERE id = ?", (time.time(), self.session_id))
+        conn.close()
+        if self.dropped:
+            logger.warning(f"Session store dropped {self.dropped} rows (queue full).")
+        logger.info(f"Session {self.session_id} closed, {self.written} rows written.")
+
+    # Queries (each opens its own connection; WAL lets them run during ingest)
+
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        """
+        Run a read-only query.
+
+        :param sql: SQL statement.
+        :param params: Statement parameters.
+        :return: All result rows.
+        """
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def slow_cycles(self, min_duration: float, since: Optional[float] = None) -> List[tuple]:
+        """
+        Cycles slower than a threshold, newest first.
+
+        :param min_duration: Threshold in seconds.
+        :param since: Only cycles starting after this epoch time (default: today).
+        :return: (session_id, cycle, start, duration, descent, dwell, capture, ascent) rows.
+        """
+        if since is None:
+            since = time.mktime(time.localtime()[:3] + (0, 0, 0, 0, 0, -1))
+        return self.query(
+            "SELECT session_id, cycle, start, duration, descent, dwell, capture, ascent FROM cycles "
+            "WHERE start >= ? AND duration > ? ORDER BY start DESC",
+            (since, min_duration))
+
+    def cycles(self, session_id: Optional[int] = None) -> List[tuple]:
+        """
+        Completed cycles of a session.
+
+        :param session_id: Session (defaults to the current one).
+        :return: (cycle, start, end, descent, dwell, capture, ascent) rows ordered by cycle.
+        """
+        return self.query(
+            "SELECT cycle, start, end, descent, dwell, capture, ascent FROM cycles WHERE session_id = ? "
+            "ORDER BY cycle", (session_id or self.session_id,))
+
+    def distance_samples(self, session_id: Optional[int] = None, start: float = 0.0,
+                         end: float = float("inf")) -> List[Tuple[float, float]]:
+        """
+        Distance samples of a session in a time window.
+
+        :param session_id: Session (defaults to the current one).
+        :param start: Window start (epoch s).
+        :param end: Window end (epoch s).
+        :return: (t, distance) rows ordered by time.
+        """
+        return self.query(
+            "SELECT t, distance FROM distance_samples WHERE session_id = ? AND t BETWEEN ? AND ? ORDER BY t",
+            (session_id or self.session_id, start, end))
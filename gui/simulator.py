@@ -0,0 +1,968 @@
+"""
+Simulator Module
+
+Models the linear actuator and the firmware control loop on the host so that
+motion strategies can be compared without hardware.
+
+Classes:
+    StepperModel: Kinematic model of AccelStepper (moveTo/stop and runSpeed modes).
+    ActuatorPlant: Stepper plus ultrasonic sensor mapping steps to distance.
+    LegacyAutoCycle: Replays the original firmware auto mode (sensor thresholds + fixed delay).
+    OverlappedAutoCycle: Auto mode whose dwell ends when the host confirms the exposure.
+    CalibratedAutoCycle: Auto mode moving to calibrated step targets at full speed.
+    TrajectoryExecutor: Replays streamed TRAJ lines the way the firmware interpolates them.
+    SimulatedSerialDevice: pyserial-compatible stand-in for the board (commands,
+        telemetry, auto mode with RESUME, calibration and the BAUD/PING link protocol).
+"""
+
+import math
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .config import (
+    CAL_TABLE_CAPACITY,
+    CAL_VERIFY_TOLERANCE_CM,
+    CAPTURE_DWELL_S,
+    DIST_LOWER_TARGET,
+    DIST_MARGIN,
+    DIST_UPPER_TARGET,
+    MOTOR_ACCELERATION,
+    MOTOR_MAX_SPEED,
+    SENSOR_READ_INTERVAL_S,
+    STEPS_PER_CM,
+    TRAJ_PERIOD_MS,
+)
+from .calibration import CalibrationTable
+from .capture_scheduler import WARMUP_LEAD_S, ThresholdPredictor
+from .controller import PIDController, StepResponseMetrics
+from .trajectory import CAPTURE_MARKER, TrajectoryPlanner, plan_cycle
+
+SIM_DT = 0.001  # Simulation step (s); AccelStepper is polled far faster on the board.
+
+
+class StepperModel:
+    """
+    Kinematic model of an AccelStepper driven motor.
+
+    Attributes:
+        position (float): Current position in steps.
+        speed (float): Current signed speed in steps/s.
+        max_speed (float): Maximum speed in steps/s.
+        acceleration (float): Acceleration in steps/s².
+        target (float | None): moveTo() target, or None in constant-speed mode.
+        velocity_target (float | None): VEL command being ramped to, if any.
+    """
+    def __init__(self, max_speed: float = MOTOR_MAX_SPEED, acceleration: float = MOTOR_ACCELERATION) -> None:
+        self.position = 0.0
+        self.speed = 0.0
+        self.max_speed = max_speed
+        self.acceleration = acceleration
+        self.target: Optional[float] = 0.0
+        self.velocity_target: Optional[float] = None
+
+    def move_to(self, target: float) -> None:
+        """Command an accelerated move to an absolute position."""
+        self.target = float(target)
+
+    def stop(self) -> None:
+        """Decelerate to a stop as quickly as the acceleration allows (AccelStepper::stop)."""
+        if self.speed == 0:
+            self.target = self.position
+            return
+        stopping = self.speed * self.speed / (2 * self.acceleration)
+        self.target = self.position + (stopping if self.speed > 0 else -stopping)
+
+    def halt(self) -> None:
+        """Freeze the motor in place (no steps are issued, e.g. during delay())."""
+        self.speed = 0.0
+        self.target = self.position
+
+    def set_speed(self, speed: float) -> None:
+        """Switch to constant-speed mode (AccelStepper::runSpeed)."""
+        self.target = None
+        self.velocity_target = None
+        self.speed = max(-self.max_speed * 4, min(self.max_speed * 4, speed))
+
+    def run_velocity(self, speed: float) -> None:
+        """Ramp toward a constant speed at the configured acceleration (VEL command)."""
+        self.target = None
+        self.velocity_target = max(-self.max_speed, min(self.max_speed, speed))
+
+    def step(self, dt: float) -> None:
+        """
+        Advance the model by dt seconds.
+
+        :param dt: Time step in seconds.
+        """
+        if self.target is None:
+            if self.velocity_target is not None:
+                change = self.velocity_target - self.speed
+                limit = self.acceleration * dt
+                self.speed += max(-limit, min(limit, change))
+            self.position += self.speed * dt
+            return
+        to_go = self.target - self.position
+        if abs(to_go) < 0.5 and abs(self.speed) <= self.acceleration * dt:
+            self.position = self.target
+            self.speed = 0.0
+            return
+        direction = 1.0 if to_go > 0 else -1.0
+        braking = self.speed * self.speed / (2 * self.acceleration)
+        if self.speed * direction < 0 or braking >= abs(to_go):
+            # Moving away from the target or inside the braking distance: decelerate.
+            decel = -self.acceleration if self.speed > 0 else self.acceleration
+            new_speed = self.speed + decel * dt
+            if self.speed * new_speed < 0:
+                new_speed = 0.0
+            self.speed = new_speed
+        else:
+            self.speed = direction * min(self.max_speed, abs(self.speed) + self.acceleration * dt)
+        self.position += self.speed * dt
+
+
+class ActuatorPlant:
+    """
+    Stepper plus ultrasonic sensor.
+
+    Position 0 corresponds to the upper target; moving down (positive steps)
+    reduces the measured distance.
+
+    Attributes:
+        stepper (StepperModel): The motor model.
+        steps_per_cm (float): Mechanical conversion factor.
+        noise_cm (float): Standard deviation of the sensor noise.
+        sensor_bias (Callable[[float], float] | None): Systematic sensor error (cm)
+            as a function of the true distance.
+        offset (float): Shift between the step counter and the mechanical position
+            (changed by set_current_position()).
+    """
+    def __init__(self, steps_per_cm: float = STEPS_PER_CM, noise_cm: float = 0.0,
+                 seed: Optional[int] = None, stepper: Optional[StepperModel] = None,
+                 sensor_bias: Optional[Callable[[float], float]] = None) -> None:
+        self.stepper = stepper or StepperModel()
+        self.steps_per_cm = steps_per_cm
+        self.noise_cm = noise_cm
+        self.sensor_bias = sensor_bias
+        self.offset = 0.0
+        self._rng = random.Random(seed)
+
+    def true_distance(self, position: Optional[float] = None) -> float:
+        """Distance in cm for the current (or given) step position, without noise."""
+        position = self.stepper.position if position is None else position
+        return DIST_UPPER_TARGET - (position + self.offset) / self.steps_per_cm
+
+    def expected_reading(self, position: Optional[float] = None) -> float:
+        """Noise-free sensor reading (true distance plus sensor bias) in cm."""
+        d = self.true_distance(position)
+        return d + self.sensor_bias(d) if self.sensor_bias else d
+
+    def read_distance(self) -> float:
+        """Simulated sensor reading in cm."""
+        d = self.expected_reading()
+        if self.noise_cm:
+            d += self._rng.gauss(0.0, self.noise_cm)
+        return d
+
+    def set_current_position(self, position: float) -> None:
+        """Redefine the step counter without moving (AccelStepper::setCurrentPosition)."""
+        self.offset += self.stepper.position - position
+        self.stepper.position = float(position)
+        self.stepper.speed = 0.0
+        self.stepper.target = float(position)
+
+
+class LegacyAutoCycle:
+    """
+    Replays Logic::transitionState: bang-bang moves toward far targets, stopping
+    when the 10 Hz sensor sample crosses a threshold and blocking in delay() for
+    the capture dwell.
+
+    Attributes:
+        plant (ActuatorPlant): Simulated actuator.
+        dwell (float): Blocking delay at the lower limit (s).
+        events (list): (time, name) tuples for CAPTURE and UPPER events.
+        capture_errors (list): Noise-free reading minus DIST_LOWER_TARGET at each capture (cm).
+    """
+    def __init__(self, plant: Optional[ActuatorPlant] = None, dwell: float = CAPTURE_DWELL_S) -> None:
+        self.plant = plant or ActuatorPlant()
+        self.dwell = dwell
+        self.events: List[tuple] = []
+        self.capture_errors: List[float] = []
+
+    def run(self, cycles: int = 3, limit: float = 600.0) -> List[float]:
+        """
+        Simulate auto mode from the upper target.
+
+        :param cycles: Number of complete cycles to simulate.
+        :param limit: Safety limit on simulated time (s).
+        :return: Cycle times in seconds, measured between CAPTURE events.
+        """
+        stepper = self.plant.stepper
+        stepper.move_to(10000)  # AUTO: long downward move.
+        state = "MOVING_DOWN"
+        t = 0.0
+        next_sample = SENSOR_READ_INTERVAL_S
+        captures: List[float] = []
+        while t < limit and len(captures) <= cycles:
+            stepper.step(SIM_DT)
+            t += SIM_DT
+            if t + 1e-9 < next_sample:
+                continue
+            next_sample += SENSOR_READ_INTERVAL_S
+            distance = self.plant.read_distance()
+            self._on_sample(t, distance, state)
+            if state == "MOVING_DOWN" and distance <= DIST_LOWER_TARGET + DIST_MARGIN:
+                stepper.stop()
+                captures.append(t)
+                self.events.append((t, "CAPTURE"))
+                stepper.halt()  # delay() blocks run(): the motor stands still.
+                self.capture_errors.append(self.plant.expected_reading() - DIST_LOWER_TARGET)
+                t += self._dwell(t)
+                next_sample = t + SENSOR_READ_INTERVAL_S
+                stepper.move_to(-1e11)
+                state = "MOVING_UP"
+            elif state == "MOVING_UP" and distance >= DIST_UPPER_TARGET - DIST_MARGIN:
+                stepper.stop()
+                self.events.append((t, "UPPER"))
+                stepper.move_to(1e11)
+                state = "MOVING_DOWN"
+        return [b - a for a, b in zip(captures, captures[1:])]
+
+    def _on_sample(self, t: float, distance: float, state: str) -> None:
+        """Hook called for every sensor sample."""
+
+    def _dwell(self, t: float) -> float:
+        """Time spent at the lower limit for a CAPTURE at time t."""
+        return self.dwell
+
+
+class OverlappedAutoCycle(LegacyAutoCycle):
+    """
+    Auto mode with the non-blocking dwell: the ascent starts when RESUME arrives
+    after the host confirms the exposure, or after max_dwell at the latest.
+
+    The host is modelled by its latencies: opening the SSH session
+    (connect_time), starting the script (exec_time), the exposure itself and
+    the RESUME round trip. With predict set, a ThresholdPredictor fed by the
+    10 Hz samples starts the connection lead_time before the predicted arrival;
+    otherwise the host connects only when it sees CAPTURE.
+
+    Attributes:
+        warmup_leads (list): Time between warm-up start and CAPTURE per cycle (s).
+        capture_latencies (list): Time from CAPTURE to RESUME per cycle (s).
+    """
+    def __init__(self, plant: Optional[ActuatorPlant] = None, max_dwell: float = CAPTURE_DWELL_S,
+                 connect_time: float = 1.5, exec_time: float = 0.5, exposure_time: float = 0.8,
+                 resume_latency: float = 0.02, predict: bool = True, keep_warm: bool = False,
+                 lead_time: float = WARMUP_LEAD_S) -> None:
+        super().__init__(plant, max_dwell)
+        self.connect_time = connect_time
+        self.exec_time = exec_time
+        self.exposure_time = exposure_time
+        self.resume_latency = resume_latency
+        self.predict = predict
+        self.keep_warm = keep_warm
+        self.lead_time = lead_time
+        self.predictor = ThresholdPredictor()
+        self.warmup_leads: List[float] = []
+        self.capture_latencies: List[float] = []
+        self._warm_start: Optional[float] = None
+        self._warm = False
+
+    def _on_sample(self, t: float, distance: float, state: str) -> None:
+        if not self.predict or state != "MOVING_DOWN" or self._warm or self._warm_start is not None:
+            return
+        self.predictor.update(distance, t)
+        remaining = self.predictor.time_to_threshold()
+        if remaining is not None and remaining <= max(self.lead_time, 1.5 * self.connect_time):
+            self._warm_start = t
+
+    def _dwell(self, t: float) -> float:
+        if self._warm:
+            ready = t
+        elif self._warm_start is not None:
+            ready = self._warm_start + self.connect_time
+            self.warmup_leads.append(t - self._warm_start)
+        else:
+            ready = t + self.connect_time
+        confirmed = max(t, ready) + self.exec_time + self.exposure_time
+        latency = confirmed + self.resume_latency - t
+        self.capture_latencies.append(latency)
+        self._warm = self.keep_warm
+        self._warm_start = None
+        self.predictor.reset()
+        return min(self.dwell, latency)
+
+
+class CalibratedAutoCycle:
+    """
+    Auto mode with a calibration table: the step counter is anchored with one
+    sensor reading, then the motor runs full accelerated moves between the
+    calibrated step targets and arrival is detected from the step count.
+
+    Attributes:
+        table (CalibrationTable): Distance-to-step table.
+        plant (ActuatorPlant): Simulated actuator.
+        dwell (float): Dwell at the lower target (s).
+        capture_errors (list): Noise-free reading minus DIST_LOWER_TARGET at each capture (cm).
+    """
+    def __init__(self, table: CalibrationTable, plant: Optional[ActuatorPlant] = None,
+                 dwell: float = CAPTURE_DWELL_S) -> None:
+        self.table = table
+        self.plant = plant or ActuatorPlant()
+        self.dwell = dwell
+        self.capture_errors: List[float] = []
+
+    def run(self, cycles: int = 3, limit: float = 600.0) -> List[float]:
+        """
+        Simulate auto mode from the current position.
+
+        :param cycles: Number of complete cycles to simulate.
+        :param limit: Safety limit on simulated time (s).
+        :return: Cycle times in seconds, measured between captures.
+        """
+        stepper = self.plant.stepper
+        self.plant.set_current_position(self.table.steps_for(self.plant.read_distance()))
+        lower = self.table.steps_for(DIST_LOWER_TARGET)
+        upper = self.table.steps_for(DIST_UPPER_TARGET)
+        stepper.move_to(lower)
+        t = 0.0
+        captures: List[float] = []
+        while t < limit and len(captures) <= cycles:
+            stepper.step(SIM_DT)
+            t += SIM_DT
+            if stepper.speed != 0.0 or stepper.position != stepper.target:
+                continue
+            if stepper.target == lower:
+                captures.append(t)
+                self.capture_errors.append(self.plant.expected_reading() - DIST_LOWER_TARGET)
+                t += self.dwell
+                stepper.move_to(upper)
+            else:
+                stepper.move_to(lower)
+        return [b - a for a, b in zip(captures, captures[1:])]
+
+
+class TrajectoryExecutor:
+    """
+    Replays TRAJ lines the way Logic::handleTrajectory interpolates them: every
+    period the setpoint advances by one delta and the motor runs at the constant
+    speed that reaches it by the end of the period.
+
+    Attributes:
+        plant (ActuatorPlant): Simulated actuator.
+        period_ms (int): Setpoint period.
+        events (list): (time, name) tuples for CAPTURE markers.
+    """
+    def __init__(self, plant: Optional[ActuatorPlant] = None, period_ms: int = TRAJ_PERIOD_MS) -> None:
+        self.plant = plant or ActuatorPlant()
+        self.period_ms = period_ms
+        self.events: List[tuple] = []
+        self.t = 0.0
+
+    @staticmethod
+    def decode(lines: Sequence[str]) -> List[object]:
+        """
+        Expand TRAJ lines into a flat list of deltas and capture markers.
+
+        :param lines: Encoded TRAJ lines.
+        :return: List of int deltas and CAPTURE_MARKER strings.
+        """
+        entries: List[object] = []
+        for line in lines:
+            for token in line.split()[1:]:
+                if token == CAPTURE_MARKER:
+                    entries.append(CAPTURE_MARKER)
+                elif "*" in token:
+                    delta, repeat = token.split("*")
+                    entries.extend([int(delta)] * int(repeat))
+                else:
+                    entries.append(int(token))
+        return entries
+
+    def run(self, lines: Sequence[str]) -> float:
+        """
+        Execute the lines on the plant.
+
+        :param lines: Encoded TRAJ lines.
+        :return: Elapsed time in seconds.
+        """
+        dt = self.period_ms / 1000.0
+        stepper = self.plant.stepper
+        setpoint = stepper.position
+        start = self.t
+        for entry in self.decode(lines):
+            if entry == CAPTURE_MARKER:
+                self.events.append((self.t, "CAPTURE"))
+                continue
+            setpoint += entry
+            stepper.set_speed((setpoint - stepper.position) / dt)
+            elapsed = 0.0
+            while elapsed + 1e-9 < dt:
+                stepper.step(SIM_DT)
+                elapsed += SIM_DT
+            self.t += dt
+        stepper.set_speed(0.0)
+        stepper.move_to(stepper.position)
+        return self.t - start
+
+
+SIM_SUPPORTED_BAUD_RATES = (9600, 57600, 115200, 250000, 500000, 1000000)
+SIM_DEFAULT_BAUD = 9600
+SIM_BAUD_CONFIRM_TIMEOUT = 2.0
+DEVICE_DT = 0.005  # Coarser plant step for the real-time device stand-in.
+
+
+class SimulatedSerialDevice:
+    """
+    pyserial-compatible stand-in for the Arduino.
+
+    Opened like serial.Serial(port, baudrate, timeout=...), so it can be passed
+    as SerialInterface(serial_factory=SimulatedSerialDevice). The emulated
+    firmware echoes commands, prints 10 Hz distance telemetry from an
+    ActuatorPlant, runs the auto cycle (the dwell ends on RESUME or after
+    `dwell` seconds) and implements the BAUD/BAUD_COMMIT/PING link protocol.
+
+    A host/device baud mismatch turns traffic into garbage in both directions,
+    and rates above max_reliable_baud corrupt lines with probability error_rate.
+
+    Attributes:
+        baudrate (int): Host-side rate (settable, like pyserial).
+        device_baud (int): Rate the emulated firmware listens at.
+        time_scale (float): Simulated seconds per wall-clock second.
+        plant (ActuatorPlant): The simulated actuator.
+        received (list): Commands the firmware understood.
+    """
+    def __init__(self, port: str = "SIM", baudrate: int = SIM_DEFAULT_BAUD, timeout: float = 1.0,
+                 max_reliable_baud: int = 1000000, error_rate: float = 0.3, time_scale: float = 1.0,
+                 telemetry_interval: float = SENSOR_READ_INTERVAL_S, dwell: float = CAPTURE_DWELL_S,
+                 seed: Optional[int] = None) -> None:
+        self.port = port
+        self._baudrate = baudrate
+        self.timeout = timeout
+        self.device_baud = SIM_DEFAULT_BAUD
+        self.max_reliable_baud = max_reliable_baud
+        self.error_rate = error_rate
+        self.time_scale = time_scale
+        self.telemetry_interval = telemetry_interval
+        self.dwell = dwell
+        self.plant = ActuatorPlant(seed=seed)
+        self.received: List[str] = []
+        self.is_open = True
+        self._rng = random.Random(seed)
+        self._out = bytearray()
+        self._in = bytearray()
+        self._lock = threading.Lock()
+        self._data_ready = threading.Condition(self._lock)
+        self._wall_start = time.monotonic()
+        self._sim_t = 0.0
+        self._next_sample = telemetry_interval
+        self._auto = False
+        self._state = "IDLE"
+        self._dwell_start = 0.0
+        self._cal_points: List[tuple] = []
+        self._cal_table: Optional[CalibrationTable] = None
+        self._cal_moving = False
+        self._cal_targets = (0.0, 0.0)
+        self._manual = 0
+        self._previous_baud = SIM_DEFAULT_BAUD
+        self._baud_pending_since: Optional[float] = None
+        self._link_errors = 0
+
+    @property
+    def sim_time(self) -> float:
+        """Simulated seconds the emulated firmware has run (lags wall time x time_scale under load)."""
+        return self._sim_t
+
+    # pyserial interface
+
+    @property
+    def baudrate(self) -> int:
+        return self._baudrate
+
+    @baudrate.setter
+    def baudrate(self, value: int) -> None:
+        with self._lock:
+            self._baudrate = value
+
+    @property
+    def in_waiting(self) -> int:
+        with self._lock:
+            self._advance()
+            return len(self._out)
+
+    def readline(self) -> bytes:
+        deadline = time.monotonic() + (self.timeout if self.timeout is not None else 1e9)
+        with self._lock:
+            while True:
+                self._advance()
+                idx = self._out.find(b"\n")
+                if idx != -1:
+                    line = bytes(self._out[:idx + 1])
+                    del self._out[:idx + 1]
+                    return line
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.is_open:
+                    line = bytes(self._out)
+                    self._out.clear()
+                    return line
+                self._data_ready.wait(min(remaining, 0.005))
+
+    def write(self, data: bytes) -> int:
+        with self._lock:
+            self._advance()
+            if self._baudrate != self.device_baud or self._corrupt():
+                data = self._garble(data)
+            self._in.extend(data)
+            self._process_input()
+            self._data_ready.notify_all()
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def reset_input_buffer(self) -> None:
+        with self._lock:
+            self._out.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self.is_open = False
+            self._data_ready.notify_all()
+
+    # Emulated firmware
+
+    def _corrupt(self) -> bool:
+        return self.device_baud > self.max_reliable_baud and self._rng.random() < self.error_rate
+
+    def _garble(self, data: bytes) -> bytes:
+        return bytes(self._rng.randrange(128, 256) for _ in data[:-1]) + b"\n"
+
+    def _print(self, text: str) -> None:
+        data = f"{text}\r\n".encode("utf-8")
+        if self._baudrate != self.device_baud or self._corrupt():
+            data = self._garble(data)
+        self._out.extend(data)
+        self._data_ready.notify_all()
+
+    def _advance(self) -> None:
+        """Run the emulated firmware up to the current (scaled) time."""
+        target = (time.monotonic() - self._wall_start) * self.time_scale
+        stepper = self.plant.stepper
+        while self._sim_t + DEVICE_DT <= target:
+            self._sim_t += DEVICE_DT
+            if (self._baud_pending_since is not None
+                    and self._sim_t - self._baud_pending_since >= SIM_BAUD_CONFIRM_TIMEOUT):
+                failed = self.device_baud
+                self.device_baud = self._previous_baud
+                self._baud_pending_since = None
+                self._print(f"BAUD_REVERT {failed}")
+            if self._manual:
+                stepper.move_to(stepper.position + 10 * self._manual)
+            stepper.step(DEVICE_DT)
+            if self._cal_moving and stepper.speed == 0.0 and stepper.position == stepper.target:
+                self._cal_moving = False
+                self._print(f"CAL_AT {int(stepper.position)}")
+            if self._auto and self._cal_table:
+                self._calibrated_step()
+            if self._sim_t + 1e-9 >= self._next_sample:
+                self._next_sample += self.telemetry_interval
+                distance = self.plant.read_distance()
+                self._print(f"Current distance: {distance:.2f} cm")
+                if self._auto and not self._cal_table:
+                    self._auto_step(distance)
+
+    def _auto_step(self, distance: float) -> None:
+        stepper = self.plant.stepper
+        if self._state == "MOVING_DOWN" and distance <= DIST_LOWER_TARGET + DIST_MARGIN:
+            stepper.halt()
+            self._print("Lower limit reached. Dwelling for capture.")
+            self._print("CAPTURE")
+            self._dwell_start = self._sim_t
+            self._state = "DWELLING"
+        elif self._state == "DWELLING" and self._sim_t - self._dwell_start >= self.dwell:
+            self._print("Capture dwell elapsed. Moving up.")
+            self._start_ascent()
+        elif self._state == "MOVING_UP" and distance >= DIST_UPPER_TARGET - DIST_MARGIN:
+            stepper.stop()
+            self._print("Upper limit reached. Moving down.")
+            stepper.move_to(1e11)
+            self._state = "MOVING_DOWN"
+
+    def _calibrated_step(self) -> None:
+        stepper = self.plant.stepper
+        arrived = stepper.speed == 0.0 and stepper.position == stepper.target
+        lower, upper = self._cal_targets
+        if self._state == "MOVING_DOWN" and arrived:
+            self._verify(DIST_LOWER_TARGET)
+            self._print("Lower limit reached. Dwelling for capture.")
+            self._print("CAPTURE")
+            self._dwell_start = self._sim_t
+            self._state = "DWELLING"
+        elif self._state == "DWELLING" and self._sim_t - self._dwell_start >= self.dwell:
+            self._print("Capture dwell elapsed. Moving up.")
+            self._start_ascent()
+        elif self._state == "MOVING_UP" and arrived:
+            self._verify(DIST_UPPER_TARGET)
+            self._print("Upper limit reached. Moving down.")
+            stepper.move_to(lower)
+            self._state = "MOVING_DOWN"
+
+    def _verify(self, expected: float) -> None:
+        measured = self.plant.read_distance()
+        if abs(measured - expected) > CAL_VERIFY_TOLERANCE_CM:
+            self._print(f"CAL_MISMATCH {expected:.2f} {measured:.2f}")
+
+    def _start_ascent(self) -> None:
+        self.plant.stepper.move_to(self._cal_targets[1] if self._cal_table else -1e11)
+        self._state = "MOVING_UP"
+
+    def _calibration(self, cmd: str) -> None:
+        stepper = self.plant.stepper
+        if cmd == "CAL_CLEAR":
+            self._cal_points = []
+        elif cmd == "CAL_ZERO":
+            self.plant.set_current_position(0)
+        elif cmd.startswith("CAL_POINT "):
+            try:
+                distance, steps = float(cmd.split()[1]), int(cmd.split()[2])
+            except (IndexError, ValueError):
+                self._print("CAL_ERR")
+                return
+            last = self._cal_points[-1] if self._cal_points else None
+            if len(self._cal_points) >= CAL_TABLE_CAPACITY or (last and (distance >= last[1] or steps <= last[0])):
+                self._print("CAL_ERR")
+                return
+            self._cal_points.append((steps, distance))
+        elif cmd.startswith("CAL_MOVE "):
+            self._auto, self._manual, self._state = False, 0, "IDLE"
+            stepper.move_to(int(cmd[9:]))
+            self._cal_moving = True
+            return
+        else:
+            self._print("CAL_ERR")
+            return
+        self._print(f"CAL_OK {len(self._cal_points)}")
+
+    def _process_input(self) -> None:
+        while b"\n" in self._in:
+            idx = self._in.find(b"\n")
+            raw = bytes(self._in[:idx])
+            del self._in[:idx + 1]
+            try:
+                cmd = raw.decode("utf-8").strip()
+            except UnicodeDecodeError:
+                cmd = None
+            if cmd is None or not cmd.isprintable():
+                self._unknown()
+                continue
+            self._command(cmd)
+
+    def _unknown(self) -> None:
+        self._print("Unknown command.")
+        self._link_errors += 1
+        if self._link_errors >= 3 and self.device_baud != SIM_DEFAULT_BAUD:
+            failed = self.device_baud
+            self.device_baud = SIM_DEFAULT_BAUD
+            self._previous_baud = SIM_DEFAULT_BAUD
+            self._baud_pending_since = None
+            self._print(f"BAUD_REVERT {failed}")
+
+    def _command(self, cmd: str) -> None:
+        stepper = self.plant.stepper
+        if cmd.startswith("PING"):
+            self._print("PONG" + cmd[4:])
+            return
+        if cmd == "BAUD_COMMIT":
+            if self._baud_pending_since is not None:
+                self._baud_pending_since = None
+                self._previous_baud = self.device_baud
+            self._print(f"BAUD_COMMITTED {self.device_baud}")
+            return
+        if cmd.startswith("BAUD "):
+            rate = int(cmd[5:]) if cmd[5:].isdigit() else 0
+            if rate not in SIM_SUPPORTED_BAUD_RATES:
+                self._print(f"BAUD_ERR {rate}")
+                return
+            self._print(f"BAUD_OK {rate}")
+            if self._baud_pending_since is None:
+                self._previous_baud = self.device_baud
+            self.device_baud = rate
+            self._baud_pending_since = self._sim_t
+            return
+        if cmd.startswith("CAL_"):
+            self._calibration(cmd)
+            return
+        self.received.append(cmd)
+        self._print(f"Command received: {cmd}")
+        self._cal_moving = False
+        if cmd == "AUTO":
+            self._print("Auto mode activated.")
+            self._auto, self._manual, self._state = True, 0, "MOVING_DOWN"
+            self._cal_table = CalibrationTable(self._cal_points) if len(self._cal_points) >= 2 else None
+            if self._cal_table:
+                self.plant.set_current_position(self._cal_table.steps_for(self.plant.read_distance()))
+                self._cal_targets = (self._cal_table.steps_for(DIST_LOWER_TARGET),
+                                     self._cal_table.steps_for(DIST_UPPER_TARGET))
+                self._print("Using calibrated step targets.")
+                stepper.move_to(self._cal_targets[0])
+            else:
+                stepper.move_to(10000)
+        elif cmd in ("UP", "DOWN"):
+            self._print(f"Manual mode: Continuous {cmd.lower()}.")
+            self._auto, self._state = False, "IDLE"
+            self._manual = 1 if cmd == "UP" else -1
+        elif cmd == "STOP":
+            self._print("Stopping manual motion.")
+            self._manual, self._state = 0, "IDLE"
+            stepper.stop()
+        elif cmd.startswith("SET_SPEED"):
+            try:
+                stepper.max_speed = float(cmd.split()[1])
+                self._print(f"Max speed set to: {stepper.max_speed:.2f} steps/s.")
+            except (IndexError, ValueError):
+                self._print("Incorrect SET_SPEED format.")
+        elif cmd == "RESUME":
+            if self._auto and self._state == "DWELLING":
+                self._print("Capture confirmed. Moving up.")
+                self._start_ascent()
+        elif cmd == "PUMP_ON":
+            self._print("Vacuum pump ON.")
+        elif cmd == "PUMP_OFF":
+            self._print("Vacuum pump OFF.")
+        else:
+            self._print("Unknown command.")
+            return
+        self._link_errors = 0
+
+
+def simulate_legacy_approach(noise_cm: float = 0.0, duration: float = 5.0,
+                             seed: Optional[int] = 1) -> StepResponseMetrics:
+    """
+    Approach the lower target the way auto mode does: run toward a far target and
+    stop() once a 10 Hz sample crosses the threshold.
+
+    :param noise_cm: Sensor noise standard deviation (cm).
+    :param duration: Simulated time (s).
+    :param seed: Random seed for the sensor noise.
+    :return: Step-response metrics of the true distance.
+    """
+    plant = ActuatorPlant(noise_cm=noise_cm, seed=seed)
+    stepper = plant.stepper
+    stepper.move_to(10000)
+    t, next_sample, stopped = 0.0, SENSOR_READ_INTERVAL_S, False
+    trace = [(0.0, plant.true_distance())]
+    while t < duration:
+        stepper.step(SIM_DT)
+        t += SIM_DT
+        if t + 1e-9 >= next_sample:
+            next_sample += SENSOR_READ_INTERVAL_S
+            if not stopped and plant.read_distance() <= DIST_LOWER_TARGET + DIST_MARGIN:
+                stepper.stop()
+                stopped = True
+        trace.append((t, plant.true_distance()))
+    return StepResponseMetrics(trace, DIST_LOWER_TARGET)
+
+
+def simulate_distance_control(setpoint: float = DIST_LOWER_TARGET, pid: Optional[PIDController] = None,
+                              rate_hz: float = 1.0 / SENSOR_READ_INTERVAL_S, noise_cm: float = 0.0,
+                              duration: float = 5.0, seed: Optional[int] = 1) -> StepResponseMetrics:
+    """
+    Approach a setpoint with the PID distance controller in simulated time.
+
+    The controller sees only the 10 Hz sensor samples and commands velocities
+    that the firmware ramps at MOTOR_ACCELERATION, as with the VEL command.
+
+    :param setpoint: Target distance (cm).
+    :param pid: Controller to test (defaults to the tuned gains).
+    :param rate_hz: Control loop rate.
+    :param noise_cm: Sensor noise standard deviation (cm).
+    :param duration: Simulated time (s).
+    :param seed: Random seed for the sensor noise.
+    :return: Step-response metrics of the true distance.
+    """
+    pid = pid or PIDController()
+    plant = ActuatorPlant(noise_cm=noise_cm, seed=seed)
+    stepper = plant.stepper
+    stepper.run_velocity(0.0)
+    period = 1.0 / rate_hz
+    t, next_sample, next_control = 0.0, 0.0, 0.0
+    measurement = None
+    trace = [(0.0, plant.true_distance())]
+    while t < duration:
+        if t + 1e-9 >= next_sample:
+            next_sample += SENSOR_READ_INTERVAL_S
+            measurement = plant.read_distance()
+        if t + 1e-9 >= next_control:
+            next_control += period
+            if measurement is not None:
+                stepper.run_velocity(-pid.update(setpoint, measurement, period))
+        stepper.step(SIM_DT)
+        t += SIM_DT
+        trace.append((t, plant.true_distance()))
+    return StepResponseMetrics(trace, setpoint)
+
+
+def compare_cycle_times(cycles: int = 3, dwell: float = CAPTURE_DWELL_S,
+                        max_speed: float = MOTOR_MAX_SPEED, acceleration: float = MOTOR_ACCELERATION,
+                        jerk: Optional[float] = None) -> Dict[str, float]:
+    """
+    Compare the legacy auto cycle with a streamed planned cycle on the simulator.
+
+    :param cycles: Number of cycles to simulate for each strategy.
+    :param dwell: Capture dwell used by both strategies (s).
+    :param max_speed: Cruise speed of both cycles (steps/s).
+    :param acceleration: Acceleration of both cycles (steps/s²).
+    :param jerk: Optional jerk limit for an S-curve planned cycle.
+    :return: Mean cycle times and the relative saving.
+    """
+    # Same motor settings for both, so the saving is the planner's alone.
+    legacy = LegacyAutoCycle(ActuatorPlant(stepper=StepperModel(max_speed, acceleration)), dwell).run(cycles)
+    legacy_mean = sum(legacy) / len(legacy)
+
+    planner = TrajectoryPlanner()
+    lines = planner.plan(plan_cycle(dwell=dwell, down_speed=max_speed, down_accel=acceleration,
+                                    up_speed=max_speed, up_accel=acceleration, jerk=jerk))
+    executor = TrajectoryExecutor()
+    for _ in range(cycles + 1):
+        executor.run(lines)
+    captures = [t for t, name in executor.events if name == "CAPTURE"]
+    planned = [b - a for a, b in zip(captures, captures[1:])]
+    planned_mean = sum(planned) / len(planned)
+    return {
+        "legacy_cycle_s": legacy_mean,
+        "planned_cycle_s": planned_mean,
+        "saving_pct": 100.0 * (legacy_mean - planned_mean) / legacy_mean,
+        "final_position_error_steps": abs(executor.plant.stepper.position),
+    }
+
+
+def sweep_plant(plant: ActuatorPlant, positions: Sequence[int], samples_per_point: int = 5) -> List[tuple]:
+    """
+    Calibration sweep on the plant: stop at each position and average readings.
+
+    :param plant: Simulated actuator.
+    :param positions: Step positions.
+    :param samples_per_point: Readings averaged per stop.
+    :return: (steps, mean distance) samples.
+    """
+    samples = []
+    for position in positions:
+        plant.stepper.position = float(position)
+        plant.stepper.target = float(position)
+        readings = [plant.read_distance() for _ in range(samples_per_point)]
+        samples.append((position, sum(readings) / len(readings)))
+    return samples
+
+
+def compare_calibrated_cycle(cycles: int = 3, dwell: float = CAPTURE_DWELL_S, max_speed: float = 2000.0,
+                             acceleration: float = 6000.0, noise_cm: float = 0.05, bias_cm: float = 0.3,
+                             seed: Optional[int] = 1) -> Dict[str, float]:
+    """
+    Calibrate a plant with a nonlinear, noisy sensor, check the interpolation
+    accuracy of the reduced table and compare sensor-threshold cycles with
+    calibrated step-target cycles.
+
+    :param cycles: Cycles simulated per strategy.
+    :param dwell: Capture dwell (s).
+    :param max_speed: Full speed of the calibrated cycle (steps/s).
+    :param acceleration: Acceleration of the calibrated cycle (steps/s²).
+    :param noise_cm: Sensor noise standard deviation (cm).
+    :param bias_cm: Amplitude of the systematic sensor nonlinearity (cm).
+    :param seed: Random seed for the sensor noise.
+    :return: Interpolation errors, mean cycle times and capture position errors.
+    """
+    def bias(d: float) -> float:
+        return bias_cm * math.sin(math.pi * (d - 8.0) / 14.0)
+
+    def plant(speed: float = MOTOR_MAX_SPEED, accel: float = MOTOR_ACCELERATION) -> ActuatorPlant:
+        return ActuatorPlant(noise_cm=noise_cm, seed=seed, sensor_bias=bias,
+                             stepper=StepperModel(speed, accel))
+
+    def mean(values: Sequence[float]) -> float:
+        return sum(values) / len(values)
+
+    reference = plant()
+    positions = range(-250, int((DIST_UPPER_TARGET - DIST_LOWER_TARGET + 1.0) * STEPS_PER_CM) + 1, 125)
+    table = CalibrationTable.fit(sweep_plant(reference, positions)).reduce()
+    grid = range(-250, positions[-1] + 1, 5)
+    accuracy = table.accuracy(reference.expected_reading, grid)
+
+    legacy = LegacyAutoCycle(plant(), dwell)
+    legacy_fast = LegacyAutoCycle(plant(max_speed, acceleration), dwell)
+    calibrated = CalibratedAutoCycle(table, plant(), dwell)
+    calibrated_fast = CalibratedAutoCycle(table, plant(max_speed, acceleration), dwell)
+    results = {"table_points": len(table.points), **{f"interp_{k}": v for k, v in accuracy.items()}}
+    for name, cycle in (("legacy", legacy), ("legacy_fast", legacy_fast),
+                        ("calibrated", calibrated), ("calibrated_fast", calibrated_fast)):
+        results[f"{name}_cycle_s"] = mean(cycle.run(cycles))
+        results[f"{name}_capture_error_cm"] = max(abs(e) for e in cycle.capture_errors)
+    # saving_s also includes the higher speed; equal_speed_saving_s isolates the calibration.
+    results["saving_s"] = results["legacy_cycle_s"] - results["calibrated_fast_cycle_s"]
+    results["equal_speed_saving_s"] = results["legacy_fast_cycle_s"] - results["calibrated_fast_cycle_s"]
+    return results
+
+
+def compare_capture_overlap(cycles: int = 5, connect_time: float = 1.5, exec_time: float = 0.5,
+                            exposure_time: float = 0.8, noise_cm: float = 0.05,
+                            seed: Optional[int] = 1) -> Dict[str, float]:
+    """
+    Compare the fixed 10 s dwell with dwells ended by the capture confirmation.
+
+    Strategies: legacy fixed dwell; reactive (RESUME, but SSH connects only
+    after CAPTURE); predictive (SSH warmed up from the time-to-threshold
+    estimate, closed after each capture); persistent (session kept warm).
+
+    :param cycles: Cycles simulated per strategy.
+    :param connect_time: SSH connection setup (s).
+    :param exec_time: Script start-up until the cameras are ready (s).
+    :param exposure_time: Exposure until the script confirms it (s).
+    :param noise_cm: Sensor noise standard deviation (cm).
+    :param seed: Random seed for the sensor noise.
+    :return: Mean cycle time per strategy, savings and predictor lead times.
+    """
+    def mean(values: Sequence[float]) -> float:
+        return sum(values) / len(values) if values else 0.0
+
+    def plant() -> ActuatorPlant:
+        return ActuatorPlant(noise_cm=noise_cm, seed=seed)
+
+    timing = {"connect_time": connect_time, "exec_time": exec_time, "exposure_time": exposure_time}
+    legacy = mean(LegacyAutoCycle(plant()).run(cycles))
+    reactive = mean(OverlappedAutoCycle(plant(), predict=False, **timing).run(cycles))
+    predictive_cycle = OverlappedAutoCycle(plant(), predict=True, **timing)
+    predictive = mean(predictive_cycle.run(cycles))
+    persistent = mean(OverlappedAutoCycle(plant(), keep_warm=True, **timing).run(cycles))
+    return {
+        "legacy_cycle_s": legacy,
+        "reactive_cycle_s": reactive,
+        "predictive_cycle_s": predictive,
+        "persistent_cycle_s": persistent,
+        "predictive_saving_s": legacy - predictive,
+        "predictive_saving_pct": 100.0 * (legacy - predictive) / legacy,
+        "mean_warmup_lead_s": mean(predictive_cycle.warmup_leads),
+        "min_warmup_lead_s": min(predictive_cycle.warmup_leads, default=0.0),
+        "mean_capture_latency_s": mean(predictive_cycle.capture_latencies),
+    }
+
+
+if __name__ == "__main__":
+    print(f"legacy approach: {simulate_legacy_approach(noise_cm=0.05)}")
+    print(f"PID approach:    {simulate_distance_control(noise_cm=0.05)}")
+    for label, kwargs in (("trapezoidal", {}), ("s-curve", {"jerk": 20000.0}),
+                          ("trapezoidal, both at 2000 steps/s", {"max_speed": 2000.0, "acceleration": 6000.0})):
+        result = compare_cycle_times(**kwargs)
+        print(f"{label}: legacy {result['legacy_cycle_s']:.3f} s, planned {result['planned_cycle_s']:.3f} s "
+              f"({result['saving_pct']:.1f}% faster), final error {result['final_position_error_steps']:.1f} steps")
+    cal = compare_calibrated_cycle()
+    print(f"calibration: {cal['table_points']} points, interpolation error max {cal['interp_max_error_cm']:.3f} cm "
+          f"({cal['interp_max_error_steps']} steps), mean {cal['interp_mean_error_cm']:.3f} cm")
+    for name in ("legacy", "legacy_fast", "calibrated", "calibrated_fast"):
+        print(f"  {name}: cycle {cal[name + '_cycle_s']:.2f} s, capture error {cal[name + '_capture_error_cm']:.2f} cm")
+    print(f"  saving at equal speed {cal['equal_speed_saving_s']:.2f} s, with the faster speed {cal['saving_s']:.2f} s")
+    overlap = compare_capture_overlap()
+    print(f"capture overlap: legacy {overlap['legacy_cycle_s']:.2f} s, reactive {overlap['reactive_cycle_s']:.2f} s, "
+          f"predictive {overlap['predictive_cycle_s']:.2f} s ({overlap['predictive_saving_s']:.2f} s saved), "
+          f"persistent {overlap['persistent_cycle_s']:.2f} s; warm-up lead min {overlap['min_warmup_lead_s']:.2f} s")
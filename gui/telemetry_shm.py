@@ -0,0 +1,386 @@
+"""
+Telemetry Shared Memory Module
+
+Publishes the live distance/state telemetry into a multiprocessing.shared_memory
+ring so local analysis processes (vision, QA scripts) can read it directly
+instead of tailing logs/app.log: no sockets, no parsing, one memory copy of a
+few dozen bytes per read.
+
+Layout (little endian):
+
+    header   magic "CSTM", version u16, record size u16, capacity u32, owner pid u32,
+             seq u64 (seqlock), count u64 (records ever written)
+    records  capacity x (index u64, t f64, mono f64, distance f64, state u32, pad u32)
+
+There is a single writer. It makes seq odd, writes the record at slot
+count % capacity, advances count and makes seq even again. Readers copy what
+they need and retry if seq was odd or changed meanwhile, so they never see a
+torn record and never block the writer.
+
+`mono` is time.monotonic() at publish time; on Linux it is shared by all
+processes, so readers can compute the age of a sample directly.
+
+The owner pid lets a new publisher tell a segment left behind by a crashed
+process (replaced) from one still in use (FileExistsError).
+
+Classes:
+    TelemetrySample: One decoded record.
+    TelemetryPublisher: Ring writer fed from the event bus.
+    TelemetryReader: Ring reader for external processes.
+"""
+
+import logging
+import math
+import os
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional
+
+import psutil
+
+from .event_bus import DISTANCE, DROP_OLDEST, STATE, Event, EventBus, Subscription
+from .serial_comm import STATE_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHM_NAME = "control_system_telemetry"
+HISTORY_RECORDS = 600    # Ring capacity: 60 s of 10 Hz telemetry.
+MAGIC = b"CSTM"
+VERSION = 1
+READ_RETRIES = 1000      # Seqlock retries before a read gives up.
+MIN_POLL_INTERVAL = 1e-4  # Shortest sleep between wait() polls (s); wait() never spins.
+
+_HEADER = struct.Struct("<4sHHII")  # magic, version, record size, capacity, owner pid
+_SEQ = struct.Struct("<Q")
+_COUNT = struct.Struct("<Q")
+_RECORD = struct.Struct("<QdddI4x")
+SEQ_OFFSET = _HEADER.size
+COUNT_OFFSET = SEQ_OFFSET + _SEQ.size
+RECORDS_OFFSET = COUNT_OFFSET + _COUNT.size
+
+# State codes stored in the ring; 0 means no state seen yet.
+STATE_NAMES = ("UNKNOWN",) + tuple(dict.fromkeys(STATE_MESSAGES.values()))
+STATE_CODES = {name: code for code, name in enumerate(STATE_NAMES)}
+
+
+def segment_size(capacity: int) -> int:
+    """Bytes needed for a ring of `capacity` records."""
+    return RECORDS_OFFSET + capacity * _RECORD.size
+
+
+class TelemetrySample:
+    """
+    One telemetry record.
+
+    Attributes:
+        index (int): Sequence number of the record (0-based, never reused).
+        t (float): Publish time (epoch s).
+        mono (float): Publish time (time.monotonic(), shared by local processes).
+        distance (float | None): Last distance (cm), None before the first sample.
+        state (str): Last state from STATE_MESSAGES, or UNKNOWN.
+    """
+    __slots__ = ("index", "t", "mono", "distance", "state")
+
+    def __init__(self, index: int, t: float, mono: float, distance: Optional[float], state: str) -> None:
+        self.index = index
+        self.t = t
+        self.mono = mono
+        self.distance = distance
+        self.state = state
+
+    @property
+    def age(self) -> float:
+        """Seconds since the record was published."""
+        return time.monotonic() - self.mono
+
+    def __repr__(self) -> str:
+        return f"TelemetrySample({self.index}, distance={self.distance}, state={self.state})"
+
+
+class TelemetryPublisher:
+    """
+    Writes telemetry into the shared-memory ring.
+
+    Every DISTANCE event appends a record with the current state; every STATE
+    event appends one with the last distance, so the ring always holds both.
+
+    Attributes:
+        name (str): Shared memory segment name.
+        capacity (int): Records kept in the ring.
+        published (int): Records written.
+    """
+    def __init__(self, name: str = DEFAULT_SHM_NAME, capacity: int = HISTORY_RECORDS) -> None:
+        """
+        Create the segment, replacing one left behind by a publisher that is no longer running.
+
+        :param name: Shared memory segment name.
+        :param capacity: Records kept in the ring.
+        :raises FileExistsError: If a running process already publishes under this name.
+        """
+        self.name = name
+        self.capacity = capacity
+        size = segment_size(capacity)
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            _remove_stale(name)
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self._buf = self._shm.buf
+        _HEADER.pack_into(self._buf, 0, MAGIC, VERSION, _RECORD.size, capacity, os.getpid())
+        _SEQ.pack_into(self._buf, SEQ_OFFSET, 0)
+        _COUNT.pack_into(self._buf, COUNT_OFFSET, 0)
+        self.published = 0
+        self._seq = 0
+        self._distance = math.nan
+        self._state = 0
+        self._lock = threading.Lock()
+        self._bus: Optional[EventBus] = None
+        self._subscription: Optional[Subscription] = None
+        self._publish_ns = 0
+        logger.info(f"Telemetry ring '{name}' ready ({capacity} records, {size} bytes).")
+
+    def attach(self, bus: EventBus) -> Subscription:
+        """
+        Feed the ring from DISTANCE and STATE events.
+
+        :param bus: Bus of the SerialInterface.
+        :return: The subscription.
+        """
+        self._bus = bus
+        self._subscription = bus.subscribe((DISTANCE, STATE), name="telemetry-shm", policy=DROP_OLDEST,
+                                           maxsize=1000, handler=self.handle_event)
+        return self._subscription
+
+    def handle_event(self, event: Event) -> None:
+        """
+        Bus handler for DISTANCE and STATE events.
+
+        :param event: The event.
+        """
+        if event.topic is DISTANCE:
+            self.publish(distance=event.payload.distance, t=event.t)
+        else:
+            self.publish(state=event.payload, t=event.t)
+
+    def publish(self, distance: Optional[float] = None, state: Optional[str] = None,
+                t: Optional[float] = None) -> int:
+        """
+        Append a record; omitted fields keep their last value.
+
+        :param distance: New distance (cm).
+        :param state: New state name.
+        :param t: Event time (epoch s); defaults to now.
+        :return: Index of the record.
+        """
+        start = time.perf_counter_ns()
+        with self._lock:
+            if distance is not None:
+                self._distance = distance
+            if state is not None:
+                self._state = STATE_CODES.get(state, 0)
+            buf = self._buf
+            index = self.published
+            self._seq += 1
+            _SEQ.pack_into(buf, SEQ_OFFSET, self._seq)
+            _RECORD.pack_into(buf, RECORDS_OFFSET + (index % self.capacity) * _RECORD.size,
+                              index, t if t is not None else time.time(), time.monotonic(),
+                              self._distance, self._state)
+            _COUNT.pack_into(buf, COUNT_OFFSET, index + 1)
+            self._seq += 1
+            _SEQ.pack_into(buf, SEQ_OFFSET, self._seq)
+            self.published = index + 1
+        self._publish_ns += time.perf_counter_ns() - start
+        return index
+
+    @property
+    def mean_publish_us(self) -> float:
+        return self._publish_ns / self.published / 1000 if self.published else 0.0
+
+    def close(self) -> None:
+        """Stop feeding, release and remove the segment."""
+        if self._subscription and self._bus:
+            self._bus.unsubscribe(self._subscription)
+            self._subscription = None
+        self._buf = None
+        self._shm.close()
+        try:
+            _unlink(self._shm)
+        except FileNotFoundError:
+            pass
+        logger.info(f"Telemetry ring '{self.name}' closed after {self.published} records "
+                    f"(mean publish {self.mean_publish_us:.1f} us).")
+
+
+class TelemetryReader:
+    """
+    Reads the shared-memory ring from any local process.
+
+    Usage:
+        reader = TelemetryReader()
+        sample = reader.latest()
+        for sample in reader.wait(after=sample.index, timeout=1.0): ...
+
+    Attributes:
+        name (str): Shared memory segment name.
+        capacity (int): Records kept in the ring.
+        retries (int): Reads repeated because the writer was active.
+        missed (int): Records overwritten before read_since()/wait() got them.
+    """
+    def __init__(self, name: str = DEFAULT_SHM_NAME) -> None:
+        self.name = name
+        self._shm = _attach(name)
+        self._buf = self._shm.buf
+        magic, version, record_size, capacity, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION or record_size != _RECORD.size:
+            self.close()
+            raise ValueError(f"Segment '{name}' is not a version {VERSION} telemetry ring.")
+        self.capacity = capacity
+        self.retries = 0
+        self.missed = 0
+
+    def _snapshot(self, first: Optional[int], limit: int) -> List[TelemetrySample]:
+        """
+        Consistent copy of the records from index `first` (or the last `limit`).
+
+        The records are copied in at most two slices and decoded only after the
+        sequence check, which keeps the window the writer can hit short.
+
+        :return: Samples in publish order.
+        :raises RuntimeError: If no consistent copy was obtained in READ_RETRIES attempts.
+        """
+        buf = self._buf
+        capacity = self.capacity
+        size = _RECORD.size
+        for _ in range(READ_RETRIES):
+            seq = _SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+            if seq & 1:
+                self.retries += 1
+                time.sleep(0)  # Let a preempted writer finish.
+                continue
+            count = _COUNT.unpack_from(buf, COUNT_OFFSET)[0]
+            oldest = max(0, count - capacity)
+            start = max(oldest, count - limit) if first is None else max(oldest, first)
+            head = RECORDS_OFFSET + (start % capacity) * size
+            n = count - start
+            wrap = min(n, capacity - start % capacity)
+            raw = bytes(buf[head:head + wrap * size])
+            if n > wrap:
+                raw += bytes(buf[RECORDS_OFFSET:RECORDS_OFFSET + (n - wrap) * size])
+            if _SEQ.unpack_from(buf, SEQ_OFFSET)[0] != seq:
+                self.retries += 1
+                time.sleep(0)
+                continue
+            if first is not None and start > first:
+                self.missed += start - first
+            return [TelemetrySample(index, t, mono, None if math.isnan(distance) else distance,
+                                    STATE_NAMES[state] if state < len(STATE_NAMES) else "UNKNOWN")
+                    for index, t, mono, distance, state in _RECORD.iter_unpack(raw)]
+        raise RuntimeError(f"Telemetry ring '{self.name}' kept changing during {READ_RETRIES} reads.")
+
+    @property
+    def count(self) -> int:
+        """Records ever written (index of the next record)."""
+        return _COUNT.unpack_from(self._buf, COUNT_OFFSET)[0]
+
+    def latest(self) -> Optional[TelemetrySample]:
+        """
+        Most recent record.
+
+        :return: The sample, or None if nothing was published yet.
+        """
+        samples = self._snapshot(None, 1)
+        return samples[0] if samples else None
+
+    def history(self, n: Optional[int] = None) -> List[TelemetrySample]:
+        """
+        The last n records (the whole ring by default), oldest first.
+
+        :param n: Number of records.
+        """
+        return self._snapshot(None, self.capacity if n is None else min(n, self.capacity))
+
+    def read_since(self, after: int) -> List[TelemetrySample]:
+        """
+        Records newer than index `after`; overwritten ones are counted in missed.
+
+        :param after: Last index already seen (-1 for everything still in the ring).
+        """
+        return self._snapshot(after + 1, self.capacity)
+
+    def wait(self, after: int = -1, timeout: Optional[float] = None,
+             poll_interval: float = 0.0005) -> List[TelemetrySample]:
+        """
+        Poll until records newer than `after` exist.
+
+        :param after: Last index already seen.
+        :param timeout: Maximum wait (s); None waits forever.
+        :param poll_interval: Sleep between polls (s), at least MIN_POLL_INTERVAL.
+        :return: New samples (empty on timeout).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        poll_interval = max(poll_interval, MIN_POLL_INTERVAL)
+        while self.count <= after + 1:
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+            time.sleep(poll_interval)
+        return self.read_since(after)
+
+    def close(self) -> None:
+        """Unmap the segment (the publisher owns and removes it)."""
+        self._buf = None
+        self._shm.close()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to an existing segment without letting this process remove it.
+
+    Every attaching process registers the segment with its resource tracker,
+    which unlinks it when that process exits. Python 3.13+ skips that with
+    track=False; before, the registration is dropped right after attaching.
+    Spawned children share their parent's tracker, so a reader in a child of
+    the publisher drops the publisher's registration too: the segment then
+    outlives a crashed publisher until the next one replaces it (see
+    _remove_stale), and _unlink() registers again before removing it.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _unlink(shm: shared_memory.SharedMemory) -> None:
+    """
+    Remove a segment whose tracker registration may have been dropped by _attach().
+
+    unlink() unregisters the segment from the resource tracker, which reports an
+    error for names it does not hold; it keeps a set, so registering again first
+    is harmless either way.
+    """
+    if os.name == "posix" and getattr(shm, "_track", True):
+        resource_tracker.register(shm._name, "shared_memory")
+    shm.unlink()
+
+
+def _remove_stale(name: str) -> None:
+    """
+    Remove a segment left behind by a publisher that did not exit cleanly.
+
+    :param name: Shared memory segment name.
+    :raises FileExistsError: If the process that created it is still running.
+    """
+    segment = _attach(name)
+    try:
+        magic, _, _, _, owner = _HEADER.unpack_from(segment.buf, 0)
+    finally:
+        segment.close()
+    if magic == MAGIC and owner and psutil.pid_exists(owner):
+        raise FileExistsError(f"Telemetry segment '{name}' is in use by process {owner}.")
+    logger.warning(f"Replacing stale telemetry segment '{name}' (owner {owner or 'unknown'} not running).")
+    _unlink(segment)
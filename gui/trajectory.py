@@ -0,0 +1,483 @@
+"""
+Trajectory Planning Module
+
+Computes trapezoidal and S-curve (jerk-limited) motion profiles on the host and
+streams them to the Arduino as compact batches of setpoints. The firmware only
+interpolates linearly between setpoints, so speed, acceleration and dwell can
+be tuned per segment without reflashing.
+
+Wire format (one command per line, see Logic::handleTrajectory):
+    TRAJ_BEGIN <period_ms>   Clears the board buffer and anchors the current position.
+    TRAJ <tok> <tok> ...     Appends entries; a token is "<delta>", "<delta>*<repeat>"
+                             or "C" (print CAPTURE when reached).
+    TRAJ_RUN                 Starts executing the buffered entries.
+    TRAJ_END                 No more entries follow; the board reports TRAJ_DONE.
+
+The board answers every TRAJ line with "TRAJ_ACK <free>" and reports
+"TRAJ_UNDERRUN" if its buffer runs dry before TRAJ_END.
+
+Classes:
+    MotionProfile: Base class for symmetric point-to-point profiles.
+    TrapezoidalProfile: Acceleration-limited profile.
+    SCurveProfile: Jerk-limited profile.
+    Segment: One move of a planned sequence.
+    TrajectoryPlanner: Samples segments into setpoints and encodes them.
+    TrajectoryStreamer: Streams encoded lines with credit-based flow control.
+"""
+
+import logging
+import math
+import threading
+from collections import deque
+from typing import Callable, Deque, List, Optional, Sequence
+
+from .config import (
+    CAPTURE_DWELL_S,
+    DIST_LOWER_TARGET,
+    DIST_UPPER_TARGET,
+    MOTOR_ACCELERATION,
+    MOTOR_MAX_SPEED,
+    STEPS_PER_CM,
+    TRAJ_BUFFER_CAPACITY,
+    TRAJ_PERIOD_MS,
+    TRAJ_TOKENS_PER_LINE,
+)
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_MARKER = "C"
+
+
+class MotionProfile:
+    """
+    Symmetric point-to-point motion profile starting and ending at rest.
+
+    Subclasses describe the acceleration phase; deceleration mirrors it and a
+    constant-speed cruise fills the remaining distance.
+
+    Attributes:
+        distance (float): Signed travel in steps.
+        peak_speed (float): Highest speed reached (steps/s).
+        accel_time (float): Duration of the acceleration phase (s).
+        cruise_time (float): Duration of the constant-speed phase (s).
+        duration (float): Total duration of the move (s).
+    """
+    def __init__(self, distance: float, max_speed: float) -> None:
+        """
+        Initialize the profile for the given travel.
+
+        :param distance: Signed travel in steps.
+        :param max_speed: Maximum speed in steps/s.
+        """
+        if max_speed <= 0:
+            raise ValueError("max_speed must be positive.")
+        self.distance = float(distance)
+        self._sign = 1.0 if distance >= 0 else -1.0
+        travel = abs(self.distance)
+        if travel == 0:
+            self.peak_speed = 0.0
+        elif 2 * self._accel_distance(max_speed) <= travel:
+            self.peak_speed = float(max_speed)
+        else:
+            self.peak_speed = self._solve_peak_speed(travel, max_speed)
+        self.accel_time = self._accel_time(self.peak_speed) if travel else 0.0
+        accel_distance = self._accel_distance(self.peak_speed) if travel else 0.0
+        cruise_distance = max(0.0, travel - 2 * accel_distance)
+        self.cruise_time = cruise_distance / self.peak_speed if self.peak_speed else 0.0
+        self._accel_travel = accel_distance
+        self.duration = 2 * self.accel_time + self.cruise_time
+
+    def _solve_peak_speed(self, travel: float, max_speed: float) -> float:
+        """Bisect the peak speed whose accel + decel phases cover the travel exactly."""
+        low, high = 0.0, float(max_speed)
+        for _ in range(60):
+            mid = (low + high) / 2
+            if 2 * self._accel_distance(mid) > travel:
+                high = mid
+            else:
+                low = mid
+        return low
+
+    def _accel_time(self, speed: float) -> float:
+        raise NotImplementedError
+
+    def _accel_distance(self, speed: float) -> float:
+        raise NotImplementedError
+
+    def _accel_position(self, tau: float) -> float:
+        raise NotImplementedError
+
+    def position(self, t: float) -> float:
+        """
+        Signed displacement from the start at time t.
+
+        :param t: Time since the start of the move (s).
+        :return: Displacement in steps.
+        """
+        travel = abs(self.distance)
+        if t <= 0 or travel == 0:
+            return 0.0
+        if t >= self.duration:
+            return self.distance
+        if t < self.accel_time:
+            p = self._accel_position(t)
+        elif t < self.accel_time + self.cruise_time:
+            p = self._accel_travel + self.peak_speed * (t - self.accel_time)
+        else:
+            p = travel - self._accel_position(self.duration - t)
+        return self._sign * p
+
+
+class TrapezoidalProfile(MotionProfile):
+    """
+    Acceleration-limited profile (triangular when the cruise speed is never reached).
+
+    Matches what AccelStepper produces for a single moveTo().
+    """
+    def __init__(self, distance: float, max_speed: float, acceleration: float) -> None:
+        """
+        :param distance: Signed travel in steps.
+        :param max_speed: Maximum speed in steps/s.
+        :param acceleration: Acceleration in steps/s².
+        """
+        if acceleration <= 0:
+            raise ValueError("acceleration must be positive.")
+        self.acceleration = float(acceleration)
+        super().__init__(distance, max_speed)
+
+    def _accel_time(self, speed: float) -> float:
+        return speed / self.acceleration
+
+    def _accel_distance(self, speed: float) -> float:
+        return speed * speed / (2 * self.acceleration)
+
+    def _accel_position(self, tau: float) -> float:
+        return 0.5 * self.acceleration * tau * tau
+
+
+class SCurveProfile(MotionProfile):
+    """
+    Jerk-limited (7-phase) profile; smoother than a trapezoid at the same peak
+    acceleration, which reduces ringing on the lead screw.
+    """
+    def __init__(self, distance: float, max_speed: float, acceleration: float, jerk: float) -> None:
+        """
+        :param distance: Signed travel in steps.
+        :param max_speed: Maximum speed in steps/s.
+        :param acceleration: Maximum acceleration in steps/s².
+        :param jerk: Maximum jerk in steps/s³.
+        """
+        if acceleration <= 0 or jerk <= 0:
+            raise ValueError("acceleration and jerk must be positive.")
+        self.acceleration = float(acceleration)
+        self.jerk = float(jerk)
+        super().__init__(distance, max_speed)
+        self._phases = self._accel_phases(self.peak_speed)
+
+    def _accel_phases(self, speed: float):
+        """Return (jerk time, constant-acceleration time, peak acceleration) for a speed."""
+        if speed >= self.acceleration ** 2 / self.jerk:
+            t_j = self.acceleration / self.jerk
+            return t_j, speed / self.acceleration - t_j, self.acceleration
+        t_j = math.sqrt(speed / self.jerk)
+        return t_j, 0.0, self.jerk * t_j
+
+    def _accel_time(self, speed: float) -> float:
+        t_j, t_c, _ = self._accel_phases(speed)
+        return 2 * t_j + t_c
+
+    def _accel_distance(self, speed: float) -> float:
+        # The velocity curve of the acceleration phase is point-symmetric, so the
+        # distance is the mean speed times the phase duration.
+        return speed * self._accel_time(speed) / 2
+
+    def _accel_position(self, tau: float) -> float:
+        t_j, t_c, a = self._phases
+        j = self.jerk
+        v1 = 0.5 * j * t_j * t_j
+        p1 = j * t_j ** 3 / 6
+        if tau < t_j:
+            return j * tau ** 3 / 6
+        if tau < t_j + t_c:
+            s = tau - t_j
+            return p1 + v1 * s + 0.5 * a * s * s
+        v2 = v1 + a * t_c
+        p2 = p1 + v1 * t_c + 0.5 * a * t_c * t_c
+        s = min(tau - t_j - t_c, t_j)
+        return p2 + v2 * s + 0.5 * a * s * s - j * s ** 3 / 6
+
+
+class Segment:
+    """
+    One move of a planned sequence.
+
+    Attributes:
+        target (int): Absolute target position in steps (relative to TRAJ_BEGIN).
+        max_speed (float): Cruise speed for this move (steps/s).
+        acceleration (float): Acceleration for this move (steps/s²).
+        jerk (float | None): Jerk limit; None selects a trapezoidal profile.
+        dwell (float): Time to hold at the target after arriving (s).
+        capture (bool): Emit a CAPTURE marker on arrival.
+    """
+    def __init__(self, target: int, max_speed: float = MOTOR_MAX_SPEED,
+                 acceleration: float = MOTOR_ACCELERATION, jerk: Optional[float] = None,
+                 dwell: float = 0.0, capture: bool = False) -> None:
+        self.target = int(target)
+        self.max_speed = max_speed
+        self.acceleration = acceleration
+        self.jerk = jerk
+        self.dwell = dwell
+        self.capture = capture
+
+    def profile(self, start: int) -> MotionProfile:
+        """
+        Build the motion profile for this segment from a start position.
+
+        :param start: Start position in steps.
+        :return: The profile covering start -> target.
+        """
+        if self.jerk:
+            return SCurveProfile(self.target - start, self.max_speed, self.acceleration, self.jerk)
+        return TrapezoidalProfile(self.target - start, self.max_speed, self.acceleration)
+
+
+def plan_cycle(travel_steps: Optional[int] = None, dwell: float = CAPTURE_DWELL_S,
+               down_speed: float = MOTOR_MAX_SPEED, down_accel: float = MOTOR_ACCELERATION,
+               up_speed: float = MOTOR_MAX_SPEED, up_accel: float = MOTOR_ACCELERATION,
+               jerk: Optional[float] = None) -> List[Segment]:
+    """
+    Build the segments of one auto-mode cycle: descend, dwell with capture, ascend.
+
+    The cycle starts and ends at the upper target.
+
+    :param travel_steps: Steps between the upper and lower targets (defaults to config).
+    :param dwell: Hold time at the lower target (s).
+    :param down_speed: Descent speed (steps/s).
+    :param down_accel: Descent acceleration (steps/s²).
+    :param up_speed: Ascent speed (steps/s).
+    :param up_accel: Ascent acceleration (steps/s²).
+    :param jerk: Optional jerk limit for S-curve profiles.
+    :return: List of segments.
+    """
+    if travel_steps is None:
+        travel_steps = round((DIST_UPPER_TARGET - DIST_LOWER_TARGET) * STEPS_PER_CM)
+    return [
+        Segment(travel_steps, down_speed, down_accel, jerk, dwell=dwell, capture=True),
+        Segment(0, up_speed, up_accel, jerk),
+    ]
+
+
+class TrajectoryPlanner:
+    """
+    Samples segments into fixed-period setpoints and encodes them for streaming.
+
+    Attributes:
+        period_ms (int): Setpoint period in milliseconds.
+        tokens_per_line (int): Maximum number of tokens per TRAJ line.
+    """
+    def __init__(self, period_ms: int = TRAJ_PERIOD_MS, tokens_per_line: int = TRAJ_TOKENS_PER_LINE) -> None:
+        self.period_ms = period_ms
+        self.tokens_per_line = tokens_per_line
+
+    def sample(self, segments: Sequence[Segment], start: int = 0) -> List[object]:
+        """
+        Sample segments into absolute setpoints, one per period.
+
+        Capture markers are inserted as the string CAPTURE_MARKER at the point
+        where the segment arrives at its target.
+
+        :param segments: Segments to execute in order.
+        :param start: Start position in steps.
+        :return: List of int setpoints and capture markers.
+        """
+        dt = self.period_ms / 1000.0
+        points: List[object] = []
+        position = start
+        for segment in segments:
+            profile = segment.profile(position)
+            steps = math.ceil(profile.duration / dt - 1e-9)
+            for i in range(1, steps + 1):
+                points.append(position + round(profile.position(i * dt)))
+            position = segment.target
+            if segment.capture:
+                points.append(CAPTURE_MARKER)
+            hold = round(segment.dwell / dt)
+            points.extend([position] * hold)
+        return points
+
+    def encode(self, points: Sequence[object], start: int = 0) -> List[str]:
+        """
+        Encode setpoints as run-length compressed TRAJ lines.
+
+        :param points: Output of sample().
+        :param start: Position the first delta is relative to.
+        :return: List of "TRAJ ..." command strings.
+        """
+        tokens: List[str] = []
+        previous = start
+        run_delta, run_length = None, 0
+
+        def flush():
+            if run_length:
+                tokens.append(str(run_delta) if run_length == 1 else f"{run_delta}*{run_length}")
+
+        for point in points:
+            if point == CAPTURE_MARKER:
+                flush()
+                run_delta, run_length = None, 0
+                tokens.append(CAPTURE_MARKER)
+                continue
+            delta = point - previous
+            previous = point
+            if delta == run_delta and run_length < 0xFFFF:
+                run_length += 1
+            else:
+                flush()
+                run_delta, run_length = delta, 1
+        flush()
+
+        n = self.tokens_per_line
+        return ["TRAJ " + " ".join(tokens[i:i + n]) for i in range(0, len(tokens), n)]
+
+    def plan(self, segments: Sequence[Segment], start: int = 0) -> List[str]:
+        """
+        Sample and encode segments in one step.
+
+        :param segments: Segments to execute in order.
+        :param start: Start position in steps.
+        :return: List of "TRAJ ..." command strings.
+        """
+        return self.encode(self.sample(segments, start), start)
+
+    def duration(self, segments: Sequence[Segment]) -> float:
+        """
+        Total execution time of the segments including dwells.
+
+        :param segments: Segments to execute in order.
+        :return: Duration in seconds.
+        """
+        return len([p for p in self.sample(segments) if p != CAPTURE_MARKER]) * self.period_ms / 1000.0
+
+
+def count_entries(line: str) -> int:
+    """
+    Number of firmware buffer entries a TRAJ line occupies.
+
+    :param line: A "TRAJ ..." command string.
+    :return: Entry count.
+    """
+    return len(line.split()) - 1
+
+
+class TrajectoryStreamer:
+    """
+    Streams encoded TRAJ lines to the board without overrunning its buffer.
+
+    The streamer tracks the free space the board last reported and subtracts the
+    entries sent since that acknowledgement (credit-based flow control).
+
+    Attributes:
+        send (Callable[[str], bool]): Function that writes one command line.
+        capacity (int): Firmware buffer capacity in entries.
+        active (bool): True while a trajectory is being streamed or executed.
+        repeat (bool): Restart the same trajectory after TRAJ_DONE.
+    """
+    def __init__(self, send: Callable[[str], bool], capacity: int = TRAJ_BUFFER_CAPACITY,
+                 period_ms: int = TRAJ_PERIOD_MS) -> None:
+        self.send = send
+        self.capacity = capacity
+        self.period_ms = period_ms
+        self.active = False
+        self.repeat = False
+        self.underruns = 0
+        self._lines: List[str] = []
+        self._next = 0
+        self._free = capacity
+        self._unacked: Deque[int] = deque()
+        self._end_sent = False
+        self._lock = threading.Lock()
+
+    def start(self, lines: Sequence[str], repeat: bool = False) -> bool:
+        """
+        Begin streaming a trajectory.
+
+        :param lines: Encoded TRAJ lines from TrajectoryPlanner.
+        :param repeat: Restart the trajectory each time it completes.
+        :return: True if the stream was started, False on a send error.
+        """
+        with self._lock:
+            self._lines = list(lines)
+            self.repeat = repeat
+            return self._begin()
+
+    def _begin(self) -> bool:
+        self._next = 0
+        self._free = self.capacity
+        self._unacked.clear()
+        self._end_sent = False
+        if not self.send(f"TRAJ_BEGIN {self.period_ms}"):
+            self.active = False
+            return False
+        self.active = True
+        self._pump()
+        if not self.send("TRAJ_RUN"):
+            self.active = False
+            return False
+        logger.info(f"Trajectory started: {len(self._lines)} lines.")
+        return True
+
+    def _pump(self) -> None:
+        """Send as many lines as the current credit allows."""
+        while self._next < len(self._lines):
+            line = self._lines[self._next]
+            entries = count_entries(line)
+            if entries > self._free:
+                return
+            if not self.send(line):
+                return
+            self._free -= entries
+            self._unacked.append(entries)
+            self._next += 1
+        if not self._end_sent and self.send("TRAJ_END"):
+            self._end_sent = True
+
+    def handle_line(self, data: str) -> bool:
+        """
+        Consume a flow-control line from the board.
+
+        :param data: A line received from the serial port.
+        :return: True if the line belonged to the trajectory protocol.
+        """
+        if not data.startswith("TRAJ_"):
+            return False
+        with self._lock:
+            if data.startswith("TRAJ_ACK"):
+                try:
+                    free = int(data.split()[1])
+                except (IndexError, ValueError):
+                    logger.warning(f"Malformed trajectory ack: {data}")
+                    return True
+                if self._unacked:
+                    self._unacked.popleft()
+                self._free = free - sum(self._unacked)
+                if self.active:
+                    self._pump()
+            elif data.startswith("TRAJ_UNDERRUN"):
+                self.underruns += 1
+                logger.warning("Trajectory buffer underrun on the board.")
+            elif data.startswith("TRAJ_DONE"):
+                if self.active and self.repeat:
+                    self._begin()
+                else:
+                    self.active = False
+                    logger.info("Trajectory completed.")
+        return True
+
+    def abort(self) -> None:
+        """
+        Stop streaming. The board clears its buffer on STOP.
+        """
+        with self._lock:
+            self.active = False
+            self.repeat = False
+            self._lines = []
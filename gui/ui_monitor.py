@@ -0,0 +1,439 @@
+"""
+UI Monitor Module
+
+Instrumentation for the Tk main thread, meant to stay enabled in production:
+
+- LoopLagMonitor schedules a heartbeat with after() and measures how late it
+  fires, i.e. how long the event loop was unable to service timers.
+- Every Python callback Tk invokes (after() timers, event bindings, widget
+  commands) is timed; callbacks slower than a threshold are logged with their
+  name and duration and aggregated per name.
+- ProfilerToggle starts and stops a cProfile or sampling profiler of the main
+  thread on demand (hidden menu on Ctrl+F12, or SIGUSR1 on POSIX) and dumps
+  the result to logs/.
+
+Classes:
+    CallbackStats: Aggregated timings of one callback.
+    LoopLagMonitor: Event-loop lag heartbeat and callback timing.
+    SamplingProfiler: Periodic stack sampler of one thread.
+    ProfilerToggle: On/off switch for the profilers with file dumps.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tkinter as tk
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = "logs"
+HEARTBEAT_MS = 100
+SLOW_CALLBACK_MS = 50.0
+SAMPLE_INTERVAL_S = 0.005
+MENU_SEQUENCE = "<Control-F12>"
+CPROFILE = "cprofile"
+SAMPLING = "sampling"
+
+
+def callback_name(func) -> str:
+    """
+    Readable name of a Tk callback.
+
+    :param func: Function registered with Tk.
+    :return: Qualified name; after() timers are prefixed with "after:".
+    """
+    qualname = getattr(func, "__qualname__", None) or type(func).__name__
+    if qualname.endswith("after.<locals>.callit"):
+        # Misc.after() wraps the target and copies its __name__ only.
+        return f"after:{func.__name__}"
+    return qualname
+
+
+class CallbackStats:
+    """
+    Aggregated timings of one callback.
+
+    Attributes:
+        count (int): Calls measured.
+        total (float): Total duration (s).
+        max (float): Longest call (s).
+        slow (int): Calls above the slow threshold.
+    """
+    __slots__ = ("count", "total", "max", "slow")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+
+    def add(self, duration: float, slow: bool) -> None:
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        if slow:
+            self.slow += 1
+
+
+class LoopLagMonitor:
+    """
+    Event-loop lag heartbeat and callback timing for one Tk application.
+
+    Attributes:
+        root (tk.Misc): Widget used to schedule the heartbeat.
+        interval_ms (int): Heartbeat period.
+        slow_ms (float): Callbacks (and lags) above this are logged.
+        callbacks (dict): CallbackStats per callback name.
+        slow_calls (deque): Recent (time, name, duration_ms) of slow callbacks.
+    """
+    _active: Optional["LoopLagMonitor"] = None
+
+    def __init__(self, root: tk.Misc, interval_ms: int = HEARTBEAT_MS, slow_ms: float = SLOW_CALLBACK_MS,
+                 history: int = 2000) -> None:
+        self.root = root
+        self.interval_ms = interval_ms
+        self.slow_ms = slow_ms
+        self.callbacks: Dict[str, CallbackStats] = {}
+        self.slow_calls: Deque[Tuple[float, str, float]] = deque(maxlen=200)
+        self._lags: Deque[float] = deque(maxlen=history)
+        self._lag_max = 0.0
+        self._expected = 0.0
+        self._after_id: Optional[str] = None
+        self._original_wrapper = None
+
+    # Callback timing
+
+    def install(self) -> None:
+        """
+        Time every callback registered from now on and start the heartbeat.
+
+        Replaces tkinter.CallWrapper, which Tk uses for every Python callback;
+        callbacks registered before install() are not timed.
+        """
+        if self._original_wrapper is None:
+            self._original_wrapper = tk.CallWrapper
+            tk.CallWrapper = _TimedCallWrapper
+        LoopLagMonitor._active = self
+        self._schedule()
+        logger.info(f"UI monitor installed (heartbeat {self.interval_ms} ms, slow callbacks > {self.slow_ms} ms).")
+
+    def uninstall(self) -> None:
+        """Stop the heartbeat and restore the default callback wrapper."""
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        if self._original_wrapper is not None:
+            tk.CallWrapper = self._original_wrapper
+            self._original_wrapper = None
+        if LoopLagMonitor._active is self:
+            LoopLagMonitor._active = None
+
+    def record_callback(self, name: str, duration: float) -> None:
+        """
+        Account one callback execution.
+
+        :param name: Callback name.
+        :param duration: Execution time (s).
+        """
+        slow = duration * 1000 > self.slow_ms
+        stats = self.callbacks.get(name)
+        if stats is None:
+            stats = self.callbacks[name] = CallbackStats()
+        stats.add(duration, slow)
+        if slow:
+            self.slow_calls.append((time.time(), name, duration * 1000))
+            logger.warning(f"Slow UI callback {name}: {duration * 1000:.1f} ms")
+
+    # Heartbeat
+
+    def _schedule(self) -> None:
+        self._expected = time.perf_counter() + self.interval_ms / 1000
+        self._after_id = self.root.after(self.interval_ms, self._heartbeat)
+
+    def _heartbeat(self) -> None:
+        lag = max(0.0, time.perf_counter() - self._expected)
+        self._lags.append(lag)
+        if lag > self._lag_max:
+            self._lag_max = lag
+        if lag * 1000 > self.slow_ms:
+            logger.warning(f"UI event loop lagged {lag * 1000:.1f} ms")
+        self._schedule()
+
+    # Reporting
+
+    def lag_stats(self) -> Dict[str, float]:
+        """
+        Lag of the recent heartbeats.
+
+        :return: Dict with samples, mean_ms, p99_ms, max_ms (recent window) and worst_ms (ever).
+        """
+        lags = sorted(self._lags)
+        if not lags:
+            return {"samples": 0, "mean_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0, "worst_ms": self._lag_max * 1000}
+        return {
+            "samples": len(lags),
+            "mean_ms": 1000 * sum(lags) / len(lags),
+            "p99_ms": 1000 * lags[min(len(lags) - 1, int(0.99 * len(lags)))],
+            "max_ms": 1000 * lags[-1],
+            "worst_ms": 1000 * self._lag_max,
+        }
+
+    def summary(self) -> str:
+        """One-line lag summary."""
+        s = self.lag_stats()
+        return f"UI lag mean {s['mean_ms']:.1f} ms, p99 {s['p99_ms']:.1f} ms, worst {s['worst_ms']:.1f} ms"
+
+    def report(self, top: int = 20) -> str:
+        """
+        Text report of loop lag, the most expensive callbacks and recent slow calls.
+
+        :param top: Number of callbacks listed.
+        :return: Report text.
+        """
+        lines = [self.summary(), "", f"{'callback':50} {'calls':>8} {'total ms':>10} {'mean ms':>8} "
+                                     f"{'max ms':>8} {'slow':>6}"]
+        ranked = sorted(self.callbacks.items(), key=lambda item: item[1].total, reverse=True)
+        for name, s in ranked[:top]:
+            lines.append(f"{name[:50]:50} {s.count:8d} {s.total * 1000:10.1f} {s.total * 1000 / s.count:8.2f} "
+                         f"{s.max * 1000:8.1f} {s.slow:6d}")
+        if self.slow_calls:
+            lines += ["", "Recent slow callbacks:"]
+            for t, name, ms in list(self.slow_calls)[-top:]:
+                lines.append(f"{time.strftime('%H:%M:%S', time.localtime(t))} {name} {ms:.1f} ms")
+        return "\n".join(lines)
+
+    def dump(self, directory: str = PROFILE_DIR) -> str:
+        """
+        Write report() to a timestamped file.
+
+        :param directory: Output directory.
+        :return: Path of the written file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"ui-lag-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.report() + "\n")
+        logger.info(f"UI lag report written to {path}")
+        return path
+
+
+class _TimedCallWrapper(tk.CallWrapper):
+    """CallWrapper that reports the duration of every call to the active monitor."""
+
+    def __init__(self, func, subst, widget) -> None:
+        super().__init__(func, subst, widget)
+        self.name = callback_name(func)
+
+    def __call__(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().__call__(*args)
+        finally:
+            monitor = LoopLagMonitor._active
+            if monitor is not None:
+                monitor.record_callback(self.name, time.perf_counter() - start)
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval from a helper thread.
+
+    Low overhead compared to cProfile, and it also catches time spent inside
+    Tcl (attributed to the Python frame that called into Tk).
+
+    Attributes:
+        thread_id (int): Ident of the sampled thread.
+        interval (float): Sampling period (s).
+        samples (Counter): Collapsed stacks ("outer;...;inner") and their counts.
+    """
+    def __init__(self, thread_id: Optional[int] = None, interval: float = SAMPLE_INTERVAL_S) -> None:
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self.samples.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def report(self, top: int = 30) -> str:
+        """
+        Functions ranked by inclusive and exclusive sample counts.
+
+        :param top: Number of functions listed.
+        :return: Report text.
+        """
+        total = sum(self.samples.values())
+        inclusive: Counter = Counter()
+        exclusive: Counter = Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(";")
+            exclusive[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        lines = [f"{total} samples at {self.interval * 1000:.1f} ms", "", "Exclusive:"]
+        lines += [f"{100 * n / total:6.1f}% {frame}" for frame, n in exclusive.most_common(top)] if total else []
+        lines += ["", "Inclusive:"]
+        lines += [f"{100 * n / total:6.1f}% {frame}" for frame, n in inclusive.most_common(top)] if total else []
+        return "\n".join(lines)
+
+
+class ProfilerToggle:
+    """
+    Starts and stops a profiler of the Tk main thread and dumps its results.
+
+    cProfile must be enabled on the profiled thread, so toggle() is expected to
+    run on the main thread (menu command, key binding or signal handler).
+
+    Attributes:
+        monitor (LoopLagMonitor | None): Lag report included in every dump.
+        directory (str): Dump directory.
+        mode (str | None): Running profiler (CPROFILE or SAMPLING), None when idle.
+    """
+    def __init__(self, monitor: Optional[LoopLagMonitor] = None, directory: str = PROFILE_DIR) -> None:
+        self.monitor = monitor
+        self.directory = directory
+        self.mode: Optional[str] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[SamplingProfiler] = None
+        self._started = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self.mode is not None
+
+    def start(self, mode: str = SAMPLING) -> None:
+        """
+        Start profiling (no-op if a profiler is already running).
+
+        :param mode: CPROFILE or SAMPLING.
+        """
+        if self.running:
+            return
+        if mode == CPROFILE:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif mode == SAMPLING:
+            self._sampler = SamplingProfiler()
+            self._sampler.start()
+        else:
+            raise ValueError(f"Unknown profiler: {mode}")
+        self.mode = mode
+        self._started = time.time()
+        logger.info(f"Profiler started ({mode}).")
+
+    def stop(self) -> Optional[str]:
+        """
+        Stop profiling and dump the results.
+
+        :return: Path of the text report, or None if nothing was running.
+        """
+        if not self.running:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(self.directory, f"profile-{self.mode}-{stamp}")
+        header = f"{self.mode} profile, {time.time() - self._started:.1f} s\n"
+        if self.monitor:
+            header += self.monitor.report() + "\n"
+        if self.mode == CPROFILE:
+            self._profile.disable()
+            self._profile.dump_stats(base + ".prof")  # Load with pstats or snakeviz.
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(40)
+            body = out.getvalue()
+            self._profile = None
+        else:
+            self._sampler.stop()
+            body = self._sampler.report()
+            with open(base + ".folded", "w", encoding="utf-8") as f:  # flamegraph.pl input
+                for stack, count in self._sampler.samples.items():
+                    f.write(f"{stack} {count}\n")
+            self._sampler = None
+        path = base + ".txt"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(header + "\n" + body)
+        logger.info(f"Profiler stopped ({self.mode}), results in {path}")
+        self.mode = None
+        return path
+
+    def toggle(self, mode: str = SAMPLING) -> Optional[str]:
+        """
+        Start the profiler if idle, otherwise stop it and dump.
+
+        :param mode: Profiler to start.
+        :return: Report path when stopping, None when starting.
+        """
+        if self.running:
+            return self.stop()
+        self.start(mode)
+        return None
+
+    def install_signal(self, signum: Optional[int] = getattr(signal, "SIGUSR1", None), mode: str = SAMPLING) -> bool:
+        """
+        Toggle the profiler on a POSIX signal (e.g. `kill -USR1 <pid>`).
+
+        Python runs the handler on the main thread the next time it executes
+        bytecode; the lag monitor heartbeat guarantees that happens while Tk idles.
+
+        :param signum: Signal number (SIGUSR1 by default).
+        :param mode: Profiler started by the signal.
+        :return: False where the signal is unavailable (Windows).
+        """
+        if signum is None:
+            return False
+        signal.signal(signum, lambda *_: self.toggle(mode))
+        logger.info(f"Profiler toggle bound to signal {signum} (pid {os.getpid()}).")
+        return True
+
+    def install_menu(self, root: tk.Misc, sequence: str = MENU_SEQUENCE) -> tk.Menu:
+        """
+        Bind a hidden diagnostics popup menu to a key sequence.
+
+        :param root: Window receiving the binding.
+        :param sequence: Tk event sequence opening the menu.
+        :return: The menu.
+        """
+        menu = tk.Menu(root, tearoff=0)
+        menu.add_command(label="Start sampling profiler", command=lambda: self.start(SAMPLING))
+        menu.add_command(label="Start cProfile", command=lambda: self.start(CPROFILE))
+        menu.add_command(label="Stop profiler and dump", command=self.stop)
+        if self.monitor:
+            menu.add_command(label="Dump UI lag report", command=self.monitor.dump)
+
+        def popup(event: tk.Event) -> None:
+            menu.tk_popup(event.x_root, event.y_root)
+
+        root.bind_all(sequence, popup)
+        return menu
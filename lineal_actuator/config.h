@@ -31,6 +31,27 @@ const float MOTOR_MAX_SPEED      = 1000.0;  ///< Maximum motor speed (in steps/s
 const unsigned long SENSOR_READ_INTERVAL_MS = 100;      ///< Interval between sensor readings (in ms).
 const unsigned long ULTRASONIC_TIMEOUT_US     = 30000;    ///< Timeout for ultrasonic sensor response (in µs).
 
+// Serial link parameters (see SerialInterface.negotiate_baudrate)
+const unsigned long SERIAL_DEFAULT_BAUD     = 9600;  ///< Baud rate after reset.
+const unsigned long BAUD_CONFIRM_TIMEOUT_MS = 2000;  ///< Revert if BAUD_COMMIT does not arrive in time.
+const uint8_t LINK_ERROR_LIMIT              = 3;     ///< Consecutive garbled commands before reverting to the default rate.
+const unsigned long SUPPORTED_BAUD_RATES[]  = {9600, 57600, 115200, 250000, 500000, 1000000};  ///< Rates accepted by BAUD.
+
+// Trajectory streaming parameters (see gui/trajectory.py)
+const uint8_t TRAJ_BUFFER_CAPACITY = 32;   ///< Entries in the trajectory ring buffer.
+const uint16_t TRAJ_DEFAULT_PERIOD_MS = 20; ///< Default setpoint period (in ms).
+
+// Capture parameters (see gui/capture_scheduler.py)
+const unsigned long CAPTURE_DWELL_MS = 10000;  ///< Longest dwell at the lower limit; RESUME ends it earlier.
+
+// Calibration parameters (see gui/calibration.py)
+const uint8_t CAL_TABLE_CAPACITY      = 16;   ///< Points in the distance-to-step table.
+const float CAL_VERIFY_TOLERANCE_CM   = 0.5;  ///< Allowed sensor deviation at a calibrated target.
+const uint8_t CAL_MISMATCH_LIMIT      = 3;    ///< Consecutive mismatches before falling back to sensor thresholds.
+
+// Velocity control parameters (see gui/controller.py)
+const unsigned long VEL_WATCHDOG_MS = 500;  ///< Ramp to zero if no VEL command arrives within this time.
+
 // Motor state enumeration
 /**
  * @enum MotorState
@@ -39,6 +60,7 @@ const unsigned long ULTRASONIC_TIMEOUT_US     = 30000;    ///< Timeout for ultra
 enum class MotorState {
   MOVING_DOWN,  ///< The motor is moving downward.
   MOVING_UP,    ///< The motor is moving upward.
+  DWELLING,     ///< Auto mode is holding at the lower limit for the capture.
   IDLE          ///< The motor is idle.
 };
 
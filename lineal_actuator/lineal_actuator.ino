@@ -17,7 +17,7 @@ Sensor sensor(SENSOR_TRIG_PIN, SENSOR_ECHO_PIN);   ///< Instantiate the sensor o
 Logic logic(motor, sensor);                        ///< Instantiate the logic controller.
 
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(SERIAL_DEFAULT_BAUD);
   LOG_INFO("Head control system started.");
 
   // Initialize vacuum pump control pin.
@@ -16,13 +16,26 @@ const String CMD_STOP      = "STOP";       ///< Command to stop movement.
 const String CMD_SET_SPEED = "SET_SPEED";  ///< Command to set motor speed.
 const String CMD_PUMP_ON   = "PUMP_ON";    ///< Command to activate the vacuum pump.
 const String CMD_PUMP_OFF  = "PUMP_OFF";   ///< Command to deactivate the vacuum pump.
+const String CMD_TRAJ      = "TRAJ";       ///< Prefix of the trajectory streaming commands.
+const String CMD_VEL       = "VEL";        ///< Command to run at a velocity (closed-loop control).
+const String CMD_RESUME    = "RESUME";     ///< Capture confirmed: end the dwell and move up.
+const String CMD_CAL       = "CAL_";       ///< Prefix of the calibration commands.
 
 Logic::Logic(Motor& motor, Sensor& sensor)
   : motor_(motor), sensor_(sensor),
     currentState_(MotorState::IDLE), previousState_(MotorState::IDLE),
-    autoMode_(false), previousDistanceMillis_(0),
+    autoMode_(false), previousDistanceMillis_(0), dwellStartMillis_(0),
     currentDistance_(0.0),
-    movingUp(false), movingDown(false), targetPosition(0)
+    movingUp(false), movingDown(false), targetPosition(0),
+    baudRate_(SERIAL_DEFAULT_BAUD), previousBaud_(SERIAL_DEFAULT_BAUD),
+    baudPending_(false), baudSwitchMillis_(0), linkErrors_(0),
+    velocityMode_(false), velocityTarget_(0.0), velocityCurrent_(0.0),
+    velocityLastMicros_(0), velocityCmdMillis_(0),
+    calCount_(0), calibrated_(false), calLowerSteps_(0), calUpperSteps_(0),
+    calMoving_(false), calMismatches_(0),
+    trajHead_(0), trajCount_(0), trajActive_(false), trajRunning_(false),
+    trajEnded_(false), trajStarved_(false), trajPeriodMs_(TRAJ_DEFAULT_PERIOD_MS),
+    trajLastMillis_(0), trajSetpoint_(0)
 {
     // Set the initial target position to the current motor position.
     targetPosition = motor_.currentPosition();
@@ -47,6 +60,14 @@ void Logic::initialize() {
  */
 void Logic::update() {
   unsigned long now = millis();
+  if (baudPending_ && now - baudSwitchMillis_ >= BAUD_CONFIRM_TIMEOUT_MS) {
+    // The host never confirmed the new rate: go back to the last working one.
+    unsigned long failed = baudRate_;
+    switchBaud(previousBaud_);
+    baudPending_ = false;
+    Serial.print(F("BAUD_REVERT "));
+    Serial.println(failed);
+  }
   if (now - previousDistanceMillis_ >= SENSOR_READ_INTERVAL_MS) {
     previousDistanceMillis_ = now;
     currentDistance_ = sensor_.readDistance();
@@ -57,11 +78,32 @@ void Logic::update() {
       Serial.print(currentDistance_);
       Serial.println(F(" cm"));
     }
-    if (autoMode_) {
+    if (autoMode_ && !calibrated_) {
       processState();
     }
   }
+  if (autoMode_ && calibrated_) {
+    // Arrival at a step target is exact; check it on every pass, not at 10 Hz.
+    processState();
+  }
+  if (calMoving_ && motor_.distanceToGo() == 0) {
+    Serial.print(F("CAL_AT "));
+    Serial.println(motor_.currentPosition());
+    calMoving_ = false;
+  }
   
+  if (velocityMode_) {
+    updateVelocity();
+    motor_.runSpeed();
+    return;
+  }
+
+  if (trajActive_) {
+    updateTrajectory();
+    motor_.runSpeed();
+    return;
+  }
+
   const int deltaSteps = 10;  // Step increment for manual control.
   if (!autoMode_) {
     if (movingUp) {
@@ -87,13 +129,54 @@ void Logic::handleSerialCommands() {
   while (Serial.available() > 0) {
     String cmd = Serial.readStringUntil('\n');
     cmd.trim();
+    if (handleLinkCommand(cmd)) {
+      continue;
+    }
+    if (cmd.startsWith(CMD_TRAJ)) {
+      // Trajectory lines are acknowledged with TRAJ_ACK instead of an echo.
+      handleTrajectory(cmd);
+      continue;
+    }
+    if (cmd.startsWith(CMD_CAL)) {
+      // Calibration lines are acknowledged with CAL_OK/CAL_ERR instead of an echo.
+      handleCalibration(cmd);
+      continue;
+    }
+    if (cmd.startsWith(CMD_VEL)) {
+      // Sent several times per second by the controller; not echoed.
+      handleVelocity(cmd);
+      continue;
+    }
+    if (velocityMode_ && !cmd.startsWith(CMD_SET_SPEED)) {
+      velocityMode_ = false;
+      motor_.setSpeed(0);
+      motor_.moveTo(motor_.currentPosition());
+      targetPosition = motor_.currentPosition();
+    }
     Serial.print(F("Command received: "));
     Serial.println(cmd);
+    if (trajActive_ && !cmd.startsWith(CMD_SET_SPEED)) {
+      clearTrajectory();
+    }
+
+    calMoving_ = false;
 
     if (cmd.equalsIgnoreCase(CMD_AUTO)) {
       LOG_INFO("Auto mode activated.");
       setAutoMode(true);
-      motor_.moveTo(10000); // Command a long downward move.
+      calibrated_ = calCount_ >= 2 && currentDistance_ > 0.0;
+      if (calibrated_) {
+        // Anchor the step counter to the table with the last reading, then
+        // move to exact step targets at full speed.
+        motor_.setCurrentPosition(calStepsFor(currentDistance_));
+        calLowerSteps_ = calStepsFor(DIST_LOWER_TARGET);
+        calUpperSteps_ = calStepsFor(DIST_UPPER_TARGET);
+        calMismatches_ = 0;
+        LOG_INFO("Using calibrated step targets.");
+        motor_.moveTo(calLowerSteps_);
+      } else {
+        motor_.moveTo(10000); // Command a long downward move.
+      }
       currentState_ = MotorState::MOVING_DOWN;
       previousState_ = MotorState::MOVING_DOWN;
       movingUp = false;
@@ -139,6 +222,12 @@ void Logic::handleSerialCommands() {
         LOG_ERROR("Incorrect SET_SPEED format.");
       }
     }
+    else if (cmd.equalsIgnoreCase(CMD_RESUME)) {
+      if (autoMode_ && currentState_ == MotorState::DWELLING) {
+        LOG_INFO("Capture confirmed. Moving up.");
+        startAscent();
+      }
+    }
     else if (cmd.equalsIgnoreCase(CMD_PUMP_ON)) {
       LOG_INFO("Vacuum pump ON.");
       digitalWrite(RELAY_PUMP_PIN, HIGH);
@@ -149,8 +238,387 @@ void Logic::handleSerialCommands() {
     }
     else {
       LOG_ERROR("Unknown command.");
+      // Garbled input at a raised rate means the link is unreliable: fall back.
+      if (++linkErrors_ >= LINK_ERROR_LIMIT && baudRate_ != SERIAL_DEFAULT_BAUD) {
+        unsigned long failed = baudRate_;
+        switchBaud(SERIAL_DEFAULT_BAUD);
+        baudPending_ = false;
+        previousBaud_ = SERIAL_DEFAULT_BAUD;
+        Serial.print(F("BAUD_REVERT "));
+        Serial.println(failed);
+      }
+      continue;
+    }
+    linkErrors_ = 0;
+  }
+}
+
+/**
+ * @brief Handles the serial link commands.
+ *
+ * BAUD <rate> acknowledges with BAUD_OK at the old rate and then switches;
+ * the switch is kept only if BAUD_COMMIT arrives within BAUD_CONFIRM_TIMEOUT_MS.
+ * PING <n> answers PONG <n> so the host can probe the link.
+ *
+ * @param cmd Trimmed command line.
+ * @return true if the command belonged to the link protocol.
+ */
+bool Logic::handleLinkCommand(const String& cmd) {
+  if (cmd.startsWith("PING")) {
+    Serial.print(F("PONG"));
+    Serial.println(cmd.substring(4));
+    return true;
+  }
+  if (cmd.equals("BAUD_COMMIT")) {
+    if (baudPending_) {
+      baudPending_ = false;
+      previousBaud_ = baudRate_;
+    }
+    Serial.print(F("BAUD_COMMITTED "));
+    Serial.println(baudRate_);
+    return true;
+  }
+  if (cmd.startsWith("BAUD ")) {
+    unsigned long rate = cmd.substring(5).toInt();
+    bool supported = false;
+    for (unsigned long candidate : SUPPORTED_BAUD_RATES) {
+      if (candidate == rate) {
+        supported = true;
+      }
+    }
+    if (!supported) {
+      Serial.print(F("BAUD_ERR "));
+      Serial.println(rate);
+      return true;
+    }
+    Serial.print(F("BAUD_OK "));
+    Serial.println(rate);
+    if (!baudPending_) {
+      previousBaud_ = baudRate_;
+    }
+    switchBaud(rate);
+    baudPending_ = true;
+    baudSwitchMillis_ = millis();
+    return true;
+  }
+  return false;
+}
+
+/**
+ * @brief Switches the serial port to a new baud rate.
+ *
+ * Waits for pending output to drain so the acknowledgement is sent at the old rate.
+ *
+ * @param rate New baud rate.
+ */
+void Logic::switchBaud(unsigned long rate) {
+  Serial.flush();
+  Serial.end();
+  Serial.begin(rate);
+  baudRate_ = rate;
+}
+
+/**
+ * @brief Handles the VEL command from the host-side distance controller.
+ *
+ * Switches to velocity mode (manual, no thresholds) and sets the speed the
+ * motor ramps toward. The value is clamped to MOTOR_MAX_SPEED.
+ *
+ * @param cmd Trimmed command line "VEL <steps/s>".
+ */
+void Logic::handleVelocity(const String& cmd) {
+  int spaceIdx = cmd.indexOf(' ');
+  if (spaceIdx == -1) {
+    LOG_ERROR("Incorrect VEL format.");
+    return;
+  }
+  if (!velocityMode_) {
+    setAutoMode(false);
+    clearTrajectory();
+    currentState_ = MotorState::IDLE;
+    velocityMode_ = true;
+    velocityCurrent_ = 0.0;
+    velocityLastMicros_ = micros();
+  }
+  float speed = cmd.substring(spaceIdx + 1).toFloat();
+  velocityTarget_ = constrain(speed, -MOTOR_MAX_SPEED, MOTOR_MAX_SPEED);
+  velocityCmdMillis_ = millis();
+}
+
+/**
+ * @brief Ramps the motor toward the commanded velocity at MOTOR_ACCELERATION.
+ *
+ * Falls back to zero speed if the host stops sending VEL commands.
+ */
+void Logic::updateVelocity() {
+  if (millis() - velocityCmdMillis_ > VEL_WATCHDOG_MS) {
+    velocityTarget_ = 0.0;
+  }
+  unsigned long now = micros();
+  float dt = (now - velocityLastMicros_) * 1e-6;
+  if (dt < 0.001) {
+    return;
+  }
+  velocityLastMicros_ = now;
+  float maxChange = MOTOR_ACCELERATION * dt;
+  float change = constrain(velocityTarget_ - velocityCurrent_, -maxChange, maxChange);
+  velocityCurrent_ += change;
+  motor_.setSpeed(velocityCurrent_);
+}
+
+/**
+ * @brief Handles the trajectory streaming commands.
+ *
+ * TRAJ_BEGIN anchors the setpoint at the current position, TRAJ appends entries
+ * (acknowledged with the free buffer space), TRAJ_RUN starts execution and
+ * TRAJ_END marks the end of the stream.
+ *
+ * @param cmd Trimmed command line starting with "TRAJ".
+ */
+void Logic::handleTrajectory(const String& cmd) {
+  if (cmd.startsWith("TRAJ_BEGIN")) {
+    setAutoMode(false);
+    velocityMode_ = false;
+    movingUp = false;
+    movingDown = false;
+    currentState_ = MotorState::IDLE;
+    clearTrajectory();
+    int spaceIdx = cmd.indexOf(' ');
+    long period = spaceIdx != -1 ? cmd.substring(spaceIdx + 1).toInt() : TRAJ_DEFAULT_PERIOD_MS;
+    trajPeriodMs_ = period > 0 ? period : TRAJ_DEFAULT_PERIOD_MS;
+    trajSetpoint_ = motor_.currentPosition();
+    trajActive_ = true;
+  }
+  else if (cmd.equals("TRAJ_RUN")) {
+    if (trajActive_ && !trajRunning_) {
+      trajRunning_ = true;
+      trajLastMillis_ = millis() - trajPeriodMs_;
+    }
+  }
+  else if (cmd.equals("TRAJ_END")) {
+    trajEnded_ = true;
+  }
+  else if (cmd.startsWith("TRAJ ")) {
+    if (!trajActive_) {
+      LOG_ERROR("TRAJ without TRAJ_BEGIN.");
+      return;
+    }
+    int start = 5;
+    while (start < (int)cmd.length()) {
+      int end = cmd.indexOf(' ', start);
+      if (end == -1) {
+        end = cmd.length();
+      }
+      if (end > start && !pushTrajToken(cmd.substring(start, end))) {
+        LOG_ERROR("Trajectory entry rejected.");
+      }
+      start = end + 1;
+    }
+    Serial.print(F("TRAJ_ACK "));
+    Serial.println(TRAJ_BUFFER_CAPACITY - trajCount_);
+  }
+  else {
+    LOG_ERROR("Unknown trajectory command.");
+  }
+}
+
+/**
+ * @brief Parses one TRAJ token and appends it to the ring buffer.
+ *
+ * @param token "<delta>", "<delta>*<repeat>" or "C".
+ * @return false if the token is invalid or the buffer is full.
+ */
+bool Logic::pushTrajToken(const String& token) {
+  if (trajCount_ >= TRAJ_BUFFER_CAPACITY) {
+    return false;
+  }
+  TrajEntry entry;
+  if (token.equals("C")) {
+    entry.delta = 0;
+    entry.repeat = 0;
+  } else {
+    int starIdx = token.indexOf('*');
+    if (starIdx == -1) {
+      entry.delta = token.toInt();
+      entry.repeat = 1;
+    } else {
+      entry.delta = token.substring(0, starIdx).toInt();
+      entry.repeat = token.substring(starIdx + 1).toInt();
+      if (entry.repeat == 0) {
+        return false;
+      }
+    }
+  }
+  trajBuffer_[(trajHead_ + trajCount_) % TRAJ_BUFFER_CAPACITY] = entry;
+  trajCount_++;
+  trajStarved_ = false;
+  return true;
+}
+
+/**
+ * @brief Advances the streamed trajectory by one period when due.
+ *
+ * The motor runs at the constant speed that reaches the next setpoint by the
+ * end of the period, i.e. position is interpolated linearly between setpoints.
+ * Speed is recomputed from the actual position so rounding never accumulates.
+ */
+void Logic::updateTrajectory() {
+  if (!trajRunning_) {
+    return;
+  }
+  unsigned long now = millis();
+  if (now - trajLastMillis_ < trajPeriodMs_) {
+    return;
+  }
+  trajLastMillis_ += trajPeriodMs_;
+
+  while (trajCount_ > 0 && trajBuffer_[trajHead_].repeat == 0) {
+    Serial.println(F("CAPTURE"));
+    trajHead_ = (trajHead_ + 1) % TRAJ_BUFFER_CAPACITY;
+    trajCount_--;
+  }
+  if (trajCount_ == 0) {
+    motor_.setSpeed((trajSetpoint_ - motor_.currentPosition()) * 1000.0 / trajPeriodMs_);
+    if (trajEnded_) {
+      if (motor_.currentPosition() == trajSetpoint_) {
+        clearTrajectory();
+        Serial.println(F("TRAJ_DONE"));
+      }
+    } else if (!trajStarved_) {
+      trajStarved_ = true;
+      trajLastMillis_ = now;
+      Serial.println(F("TRAJ_UNDERRUN"));
+    }
+    return;
+  }
+
+  TrajEntry& entry = trajBuffer_[trajHead_];
+  trajSetpoint_ += entry.delta;
+  if (--entry.repeat == 0) {
+    trajHead_ = (trajHead_ + 1) % TRAJ_BUFFER_CAPACITY;
+    trajCount_--;
+  }
+  motor_.setSpeed((trajSetpoint_ - motor_.currentPosition()) * 1000.0 / trajPeriodMs_);
+}
+
+/**
+ * @brief Discards any loaded trajectory and holds the current position.
+ */
+void Logic::clearTrajectory() {
+  trajHead_ = 0;
+  trajCount_ = 0;
+  trajActive_ = false;
+  trajRunning_ = false;
+  trajEnded_ = false;
+  trajStarved_ = false;
+  motor_.setSpeed(0);
+  motor_.moveTo(motor_.currentPosition());
+  targetPosition = motor_.currentPosition();
+}
+
+/**
+ * @brief Handles the calibration commands.
+ *
+ * CAL_CLEAR empties the table, CAL_POINT <distance> <steps> appends a point
+ * (distances must strictly decrease as steps increase) and both answer
+ * CAL_OK <count> or CAL_ERR. For the host-side sweep, CAL_ZERO makes the
+ * current position step 0 (answering CAL_OK) and CAL_MOVE <steps> moves to an
+ * absolute position and reports CAL_AT <position> on arrival.
+ *
+ * @param cmd Trimmed command line starting with "CAL_".
+ */
+void Logic::handleCalibration(const String& cmd) {
+  if (cmd.equals("CAL_CLEAR")) {
+    calCount_ = 0;
+    calibrated_ = false;
+  }
+  else if (cmd.equals("CAL_ZERO")) {
+    motor_.setCurrentPosition(0);
+    targetPosition = 0;
+  }
+  else if (cmd.startsWith("CAL_POINT ")) {
+    int spaceIdx = cmd.indexOf(' ', 10);
+    if (spaceIdx == -1 || calCount_ >= CAL_TABLE_CAPACITY) {
+      Serial.println(F("CAL_ERR"));
+      return;
+    }
+    float distance = cmd.substring(10, spaceIdx).toFloat();
+    long steps = cmd.substring(spaceIdx + 1).toInt();
+    if (calCount_ > 0 && (distance >= calDistance_[calCount_ - 1] || steps <= calSteps_[calCount_ - 1])) {
+      Serial.println(F("CAL_ERR"));
+      return;
+    }
+    calDistance_[calCount_] = distance;
+    calSteps_[calCount_] = steps;
+    calCount_++;
+  }
+  else if (cmd.startsWith("CAL_MOVE ")) {
+    setAutoMode(false);
+    velocityMode_ = false;
+    if (trajActive_) {
+      clearTrajectory();
     }
+    movingUp = false;
+    movingDown = false;
+    currentState_ = MotorState::IDLE;
+    targetPosition = cmd.substring(9).toInt();
+    calMoving_ = true;
+    motor_.moveTo(targetPosition);
+    return;
   }
+  else {
+    Serial.println(F("CAL_ERR"));
+    return;
+  }
+  Serial.print(F("CAL_OK "));
+  Serial.println(calCount_);
+}
+
+/**
+ * @brief Interpolates the calibration table linearly.
+ *
+ * @param distance Distance in cm.
+ * @return Step position of the distance (extrapolated beyond the table ends).
+ */
+long Logic::calStepsFor(float distance) {
+  uint8_t i = 1;
+  while (i < calCount_ - 1 && distance < calDistance_[i]) {
+    i++;
+  }
+  float d0 = calDistance_[i - 1];
+  float d1 = calDistance_[i];
+  float fraction = (distance - d0) / (d1 - d0);
+  return lround(calSteps_[i - 1] + fraction * (calSteps_[i] - calSteps_[i - 1]));
+}
+
+/**
+ * @brief Compares a fresh sensor reading with a calibrated target.
+ *
+ * @param expected Distance the motor should be at (in cm).
+ */
+void Logic::verifyPosition(float expected) {
+  float measured = sensor_.readDistance();
+  if (measured >= 0.0 && fabs(measured - expected) <= CAL_VERIFY_TOLERANCE_CM) {
+    calMismatches_ = 0;
+    return;
+  }
+  Serial.print(F("CAL_MISMATCH "));
+  Serial.print(expected);
+  Serial.print(' ');
+  Serial.println(measured);
+  if (++calMismatches_ >= CAL_MISMATCH_LIMIT) {
+    calibrated_ = false;
+    LOG_ERROR("Calibration disabled, using sensor thresholds.");
+  }
+}
+
+/**
+ * @brief Ends the capture dwell and starts the ascent.
+ */
+void Logic::startAscent() {
+  motor_.moveTo(calibrated_ ? calUpperSteps_ : -100000000000);
+  currentState_ = MotorState::MOVING_UP;
+  previousState_ = MotorState::MOVING_UP;
 }
 
 /**
@@ -158,25 +626,39 @@ void Logic::handleSerialCommands() {
  *
  * When certain distance thresholds are reached, stops the motor,
  * triggers remote capture if needed, and commands the motor to change direction.
+ * The capture dwell does not block: the ascent starts when the host confirms
+ * the exposure (RESUME) or after CAPTURE_DWELL_MS at the latest.
  */
 void Logic::transitionState() {
   switch (currentState_) {
     case MotorState::MOVING_DOWN:
-      if (currentDistance_ <= DIST_LOWER_TARGET + DIST_MARGIN) {
-        motor_.stop();
-        LOG_INFO("Lower limit reached. Stopping for 5 seconds for capture, then moving up.");
+      if (calibrated_ ? motor_.distanceToGo() == 0 : currentDistance_ <= DIST_LOWER_TARGET + DIST_MARGIN) {
+        if (calibrated_) {
+          verifyPosition(DIST_LOWER_TARGET);
+        }
+        // Halt in place, as the motor did while delay() blocked the loop.
+        motor_.setSpeed(0);
+        motor_.moveTo(motor_.currentPosition());
+        LOG_INFO("Lower limit reached. Dwelling for capture.");
         Serial.println("CAPTURE");
-        delay(10000);  // Wait for 10 seconds (adjustable as needed)
-        motor_.moveTo(-100000000000);
-        currentState_ = MotorState::MOVING_UP;
-        previousState_ = MotorState::MOVING_UP;
+        dwellStartMillis_ = millis();
+        currentState_ = MotorState::DWELLING;
+      }
+      break;
+    case MotorState::DWELLING:
+      if (millis() - dwellStartMillis_ >= CAPTURE_DWELL_MS) {
+        LOG_INFO("Capture dwell elapsed. Moving up.");
+        startAscent();
       }
       break;
     case MotorState::MOVING_UP:
-      if (currentDistance_ >= DIST_UPPER_TARGET - DIST_MARGIN) {
+      if (calibrated_ ? motor_.distanceToGo() == 0 : currentDistance_ >= DIST_UPPER_TARGET - DIST_MARGIN) {
+        if (calibrated_) {
+          verifyPosition(DIST_UPPER_TARGET);
+        }
         motor_.stop();
         LOG_INFO("Upper limit reached. Moving down.");
-        motor_.moveTo(100000000000);
+        motor_.moveTo(calibrated_ ? calLowerSteps_ : 100000000000);
         currentState_ = MotorState::MOVING_DOWN;
         previousState_ = MotorState::MOVING_DOWN;
       }
@@ -184,12 +666,10 @@ void Logic::transitionState() {
     case MotorState::IDLE:
       if (autoMode_) {
         if (previousState_ == MotorState::MOVING_DOWN) {
-          motor_.moveTo(-100000000000);
-          currentState_ = MotorState::MOVING_UP;
-          previousState_ = MotorState::MOVING_UP;
+          startAscent();
         }
         else if (previousState_ == MotorState::MOVING_UP) {
-          motor_.moveTo(100000000000);
+          motor_.moveTo(calibrated_ ? calLowerSteps_ : 100000000000);
           currentState_ = MotorState::MOVING_DOWN;
           previousState_ = MotorState::MOVING_DOWN;
         }
@@ -6,6 +6,18 @@
 #include "Sensor.h"
 #include "Config.h"
 
+/**
+ * @struct TrajEntry
+ * @brief One entry of the streamed trajectory buffer.
+ *
+ * The setpoint advances by @c delta steps once per period, @c repeat times.
+ * An entry with @c repeat == 0 is a capture marker.
+ */
+struct TrajEntry {
+  int16_t delta;    ///< Setpoint increment per period (in steps).
+  uint16_t repeat;  ///< Number of periods; 0 marks a capture point.
+};
+
 /**
  * @class Logic
  * @brief Implements the control logic for the linear actuator system.
@@ -80,8 +92,122 @@ private:
     long targetPosition;   ///< Target motor position.
     
     unsigned long previousDistanceMillis_;  ///< Timestamp of the last sensor read.
+    unsigned long dwellStartMillis_;        ///< Start of the capture dwell.
     float currentDistance_;                   ///< Most recent distance measurement.
     
+    unsigned long baudRate_;           ///< Current serial baud rate.
+    unsigned long previousBaud_;       ///< Rate to revert to if the switch is not confirmed.
+    bool baudPending_;                 ///< A BAUD switch awaits BAUD_COMMIT.
+    unsigned long baudSwitchMillis_;   ///< Time of the last BAUD switch.
+    uint8_t linkErrors_;               ///< Consecutive unrecognized commands.
+
+    bool velocityMode_;                ///< Host-side closed-loop control is driving the motor.
+    float velocityTarget_;             ///< Commanded speed (steps/s).
+    float velocityCurrent_;            ///< Ramped speed applied to the motor (steps/s).
+    unsigned long velocityLastMicros_; ///< Timestamp of the last ramp update.
+    unsigned long velocityCmdMillis_;  ///< Timestamp of the last VEL command.
+
+    float calDistance_[CAL_TABLE_CAPACITY];  ///< Calibration distances (in cm), strictly decreasing.
+    long calSteps_[CAL_TABLE_CAPACITY];      ///< Step positions of the calibration distances.
+    uint8_t calCount_;                 ///< Number of calibration points.
+    bool calibrated_;                  ///< Auto mode moves to calibrated step targets.
+    long calLowerSteps_;               ///< Step target of DIST_LOWER_TARGET.
+    long calUpperSteps_;               ///< Step target of DIST_UPPER_TARGET.
+    bool calMoving_;                   ///< A CAL_MOVE awaits its CAL_AT report.
+    uint8_t calMismatches_;            ///< Consecutive failed verifications.
+
+    TrajEntry trajBuffer_[TRAJ_BUFFER_CAPACITY];  ///< Ring buffer of streamed setpoints.
+    uint8_t trajHead_;                 ///< Index of the next entry to execute.
+    uint8_t trajCount_;                ///< Number of buffered entries.
+    bool trajActive_;                  ///< A trajectory is loaded (TRAJ_BEGIN received).
+    bool trajRunning_;                 ///< Execution started (TRAJ_RUN received).
+    bool trajEnded_;                   ///< No more entries will follow (TRAJ_END received).
+    bool trajStarved_;                 ///< Underrun already reported.
+    uint16_t trajPeriodMs_;            ///< Setpoint period (in ms).
+    unsigned long trajLastMillis_;     ///< Start of the current setpoint period.
+    long trajSetpoint_;                ///< Current interpolation target (in steps).
+
+    /**
+     * @brief Handles the BAUD, BAUD_COMMIT and PING link commands.
+     *
+     * @param cmd Trimmed command line.
+     * @return true if the command belonged to the link protocol.
+     */
+    bool handleLinkCommand(const String& cmd);
+
+    /**
+     * @brief Switches the serial port to a new baud rate.
+     *
+     * @param rate New baud rate.
+     */
+    void switchBaud(unsigned long rate);
+
+    /**
+     * @brief Handles the VEL command from the host-side distance controller.
+     *
+     * @param cmd Trimmed command line "VEL <steps/s>".
+     */
+    void handleVelocity(const String& cmd);
+
+    /**
+     * @brief Ramps the motor toward the commanded velocity.
+     */
+    void updateVelocity();
+
+    /**
+     * @brief Handles the TRAJ_* command family.
+     *
+     * @param cmd Trimmed command line starting with "TRAJ".
+     */
+    void handleTrajectory(const String& cmd);
+
+    /**
+     * @brief Parses one TRAJ token and appends it to the buffer.
+     *
+     * @param token "<delta>", "<delta>*<repeat>" or "C".
+     * @return false if the token is invalid or the buffer is full.
+     */
+    bool pushTrajToken(const String& token);
+
+    /**
+     * @brief Advances the streamed trajectory by one period when due.
+     */
+    void updateTrajectory();
+
+    /**
+     * @brief Discards any loaded trajectory and holds the current position.
+     */
+    void clearTrajectory();
+
+    /**
+     * @brief Handles the CAL_* command family.
+     *
+     * @param cmd Trimmed command line starting with "CAL_".
+     */
+    void handleCalibration(const String& cmd);
+
+    /**
+     * @brief Interpolates the calibration table.
+     *
+     * @param distance Distance in cm.
+     * @return Step position of the distance (extrapolated beyond the table ends).
+     */
+    long calStepsFor(float distance);
+
+    /**
+     * @brief Compares a fresh sensor reading with a calibrated target.
+     *
+     * Falls back to sensor thresholds after CAL_MISMATCH_LIMIT consecutive failures.
+     *
+     * @param expected Distance the motor should be at (in cm).
+     */
+    void verifyPosition(float expected);
+
+    /**
+     * @brief Ends the capture dwell and starts the ascent.
+     */
+    void startAscent();
+
     /**
      * @brief Transitions the motor state based on sensor data.
      */
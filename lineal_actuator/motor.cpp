@@ -94,6 +94,22 @@ void Motor::setMaxSpeed(float speed) {
   stepper.setMaxSpeed(speed);
 }
 
+/**
+ * @brief Sets a constant speed for runSpeed().
+ *
+ * @param speed Signed speed in steps per second.
+ */
+void Motor::setSpeed(float speed) {
+  stepper.setSpeed(speed);
+}
+
+/**
+ * @brief Steps at the constant speed without acceleration.
+ */
+void Motor::runSpeed() {
+  stepper.runSpeed();
+}
+
 /**
  * @brief Retrieves the current motor position.
  *
@@ -102,3 +118,21 @@ void Motor::setMaxSpeed(float speed) {
 long Motor::currentPosition() {
   return stepper.currentPosition();
 }
+
+/**
+ * @brief Retrieves the remaining distance of the current move.
+ *
+ * @return Steps from the current position to the target.
+ */
+long Motor::distanceToGo() {
+  return stepper.distanceToGo();
+}
+
+/**
+ * @brief Redefines the current position without moving the motor.
+ *
+ * @param position New current position in steps.
+ */
+void Motor::setCurrentPosition(long position) {
+  stepper.setCurrentPosition(position);
+}
@@ -73,6 +73,18 @@ public:
    */
   void setMaxSpeed(float speed);
 
+  /**
+   * @brief Sets a constant speed for runSpeed().
+   *
+   * @param speed Signed speed in steps/s.
+   */
+  void setSpeed(float speed);
+
+  /**
+   * @brief Steps at the constant speed set by setSpeed(); must be called repeatedly.
+   */
+  void runSpeed();
+
   /**
    * @brief Gets the current motor position.
    *
@@ -80,6 +92,20 @@ public:
    */
   long currentPosition();
 
+  /**
+   * @brief Gets the remaining distance of the current move.
+   *
+   * @return Steps from the current position to the target.
+   */
+  long distanceToGo();
+
+  /**
+   * @brief Redefines the current position (the motor does not move).
+   *
+   * @param position New current position in steps.
+   */
+  void setCurrentPosition(long position);
+
 private:
   AccelStepper stepper;  ///< Instance of the AccelStepper library for motor control.
 };
@@ -4,10 +4,26 @@ Remote Capture Trigger using Paramiko
 
 This script connects to a Raspberry Pi via SSH using the Paramiko library,
 automatically supplies the password, and executes a remote capture script.
+The captured images can then be fetched over SFTP on the same SSH session,
+one channel per camera in parallel, into a local content-addressed cache.
+
+CaptureSession keeps the SSH connection open between captures so it can be
+warmed up before the actuator reaches the capture position, and fetches the
+images of every capture once the exposure is confirmed.
 """
 
 import paramiko
+import hashlib
+import json
 import logging
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
 
 # Configure logging at module level.
 logging.basicConfig(
@@ -16,17 +32,452 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def capture_images(pi_ip: str, username: str = "dev", password: str = "admin0", script_path: str = "/home/dev/Desktop/automata/capture_both_cameras.py") -> bool:
+# Directories written by capture_both_cameras.py, one per camera.
+REMOTE_CAPTURE_DIRS = {
+    "cam0": "/home/dev/Desktop/automata/captures/cam0",
+    "cam1": "/home/dev/Desktop/automata/captures/cam1",
+}
+IMAGE_CACHE_DIR = os.path.join("captures", "cache")
+CHUNK_SIZE = 32768  # SFTP read size; paramiko caps a single request at 32 KiB.
+
+
+class SFTPTransport:
+    """
+    Remote file access over an SFTP channel of an open SSH session.
+
+    Each instance owns its own channel, so several can transfer in parallel
+    over the same SSH connection.
+    """
+    def __init__(self, ssh_client: paramiko.SSHClient) -> None:
+        self.sftp = ssh_client.open_sftp()
+
+    def list_files(self, directory: str) -> List[Tuple[str, int, float]]:
+        """
+        List regular files in a directory.
+
+        :param directory: Remote directory.
+        :return: (path, size, mtime) tuples.
+        """
+        entries = []
+        for attr in self.sftp.listdir_attr(directory):
+            if stat.S_ISREG(attr.st_mode or 0):
+                entries.append((f"{directory}/{attr.filename}", attr.st_size, attr.st_mtime))
+        return entries
+
+    def open(self, path: str, size: int) -> BinaryIO:
+        """
+        Open a remote file for pipelined reading.
+
+        prefetch() queues all read requests up front, so chunks stream back
+        without waiting one round trip per chunk.
+
+        :param path: Remote path.
+        :param size: File size in bytes.
+        :return: File-like object.
+        """
+        handle = self.sftp.open(path, "rb")
+        handle.prefetch(size)
+        return handle
+
+    def close(self) -> None:
+        self.sftp.close()
+
+
+class LocalTransport:
+    """
+    Filesystem-backed stand-in for SFTPTransport; remote paths are resolved
+    under a local root directory.
+    """
+    def __init__(self, root: str = "/") -> None:
+        self.root = root
+
+    def _local(self, path: str) -> str:
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def list_files(self, directory: str) -> List[Tuple[str, int, float]]:
+        entries = []
+        local_dir = self._local(directory)
+        if not os.path.isdir(local_dir):
+            return entries
+        for name in sorted(os.listdir(local_dir)):
+            st = os.stat(os.path.join(local_dir, name))
+            if stat.S_ISREG(st.st_mode):
+                entries.append((f"{directory}/{name}", st.st_size, st.st_mtime))
+        return entries
+
+    def open(self, path: str, size: int) -> BinaryIO:
+        return open(self._local(path), "rb")
+
+    def close(self) -> None:
+        pass
+
+
+class ImageCache:
+    """
+    Local content-addressed image store.
+
+    Files are stored under objects/<sha256[:2]>/<sha256>; index.json maps each
+    remote file (path, size, mtime) to its digest so already-fetched files are
+    skipped without transferring them again.
+
+    Attributes:
+        root (str): Cache directory.
+    """
+    def __init__(self, root: str = IMAGE_CACHE_DIR) -> None:
+        self.root = root
+        self._index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                self._index: Dict[str, str] = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    @staticmethod
+    def key(path: str, size: int, mtime: float) -> str:
+        return f"{path}|{size}|{int(mtime)}"
+
+    def object_path(self, digest: str) -> str:
+        """Local path of a stored object."""
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        Digest of an already-fetched remote file.
+
+        :param key: Key built with ImageCache.key().
+        :return: The digest, or None if not cached.
+        """
+        with self._lock:
+            digest = self._index.get(key)
+        if digest and os.path.exists(self.object_path(digest)):
+            return digest
+        return None
+
+    def store(self, key: str, source: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Tuple[str, int]:
+        """
+        Stream a file into the cache, hashing it on the fly.
+
+        :param key: Key built with ImageCache.key().
+        :param source: Readable file-like object.
+        :param chunk_size: Read size in bytes.
+        :return: (digest, bytes written).
+        """
+        digest = hashlib.sha256()
+        written = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    written += len(chunk)
+            hexdigest = digest.hexdigest()
+            target = self.object_path(hexdigest)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.exists(target):
+                os.remove(tmp_path)  # Same content fetched under another name.
+            else:
+                shutil.move(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._index[key] = hexdigest
+        return hexdigest, written
+
+    def save_index(self) -> None:
+        """Persist the remote-file index atomically."""
+        with self._lock:
+            data = json.dumps(self._index, indent=1)
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self._index_path)
+
+
+class TransferStats:
+    """
+    Metrics of one fetch.
+
+    Attributes:
+        fetched (int): Files transferred.
+        skipped (int): Files already in the cache.
+        bytes (int): Bytes transferred.
+        elapsed (float): Wall time of the whole fetch (s).
+        latencies (dict): Per-image transfer time (s) keyed by remote path.
+        digests (dict): Content digest keyed by remote path (fetched and skipped).
+        errors (list): Error messages.
+    """
+    def __init__(self) -> None:
+        self.fetched = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.latencies: Dict[str, float] = {}
+        self.digests: Dict[str, str] = {}
+        self.errors: List[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def bytes_per_s(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        latencies = sorted(self.latencies.values())
+        worst = f", max latency {latencies[-1] * 1000:.0f} ms" if latencies else ""
+        return (f"{self.fetched} fetched, {self.skipped} cached, {self.bytes} bytes in {self.elapsed:.2f} s "
+                f"({self.bytes_per_s / 1024:.0f} KiB/s){worst}")
+
+
+def _fetch_directory(transport, directory: str, cache: ImageCache, stats: TransferStats,
+                     chunk_size: int) -> None:
+    """Fetch every file of one camera directory that is not cached yet."""
+    for path, size, mtime in transport.list_files(directory):
+        key = ImageCache.key(path, size, mtime)
+        digest = cache.lookup(key)
+        if digest:
+            with stats._lock:
+                stats.skipped += 1
+                stats.digests[path] = digest
+            continue
+        start = time.perf_counter()
+        try:
+            with transport.open(path, size) as source:
+                digest, written = cache.store(key, source, chunk_size)
+        except Exception as e:
+            logger.error(f"Transfer of {path} failed: {e}")
+            with stats._lock:
+                stats.errors.append(f"{path}: {e}")
+            continue
+        with stats._lock:
+            stats.fetched += 1
+            stats.bytes += written
+            stats.latencies[path] = time.perf_counter() - start
+            stats.digests[path] = digest
+
+
+def fetch_images(transport_factory: Callable[[], object], camera_dirs: Dict[str, str] = REMOTE_CAPTURE_DIRS,
+                 cache: Optional[ImageCache] = None, chunk_size: int = CHUNK_SIZE) -> TransferStats:
+    """
+    Fetch captured images of all cameras in parallel into the local cache.
+
+    :param transport_factory: Returns a new transport (one per camera), e.g.
+                              lambda: SFTPTransport(client) or lambda: LocalTransport(root).
+    :param camera_dirs: Remote directory per camera.
+    :param cache: Destination cache (defaults to IMAGE_CACHE_DIR).
+    :param chunk_size: Read size in bytes.
+    :return: TransferStats for the whole fetch.
+    """
+    cache = cache or ImageCache()
+    stats = TransferStats()
+    start = time.perf_counter()
+
+    def worker(directory: str) -> None:
+        transport = None
+        try:
+            transport = transport_factory()
+            _fetch_directory(transport, directory, cache, stats, chunk_size)
+        except Exception as e:
+            logger.error(f"Listing {directory} failed: {e}")
+            with stats._lock:
+                stats.errors.append(f"{directory}: {e}")
+        finally:
+            if transport is not None:
+                transport.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, len(camera_dirs))) as pool:
+        list(pool.map(worker, camera_dirs.values()))
+    stats.elapsed = time.perf_counter() - start
+    cache.save_index()
+    logger.info(f"Image fetch: {stats}")
+    return stats
+
+
+class CaptureSession:
+    """
+    Persistent SSH session for repeated captures.
+
+    warm() connects ahead of time so a capture only pays for running the
+    script. Exposure is confirmed when the script prints exposure_marker (if
+    set) or exits successfully; the on_exposed callback fires at that moment,
+    while the rest of the script output is still being read. With fetch set,
+    capture() then retrieves the images over SFTP on the same session and a
+    failed fetch fails the capture; fetch_captured() does the same on its own,
+    so a caller can run it while the next capture executes.
+
+    Attributes:
+        pi_ip (str): Raspberry Pi address.
+        script_path (str): Capture script on the Raspberry Pi.
+        exposure_marker (str | None): Output line substring confirming the exposure.
+        connect_time (float | None): Duration of the last connection setup (s).
+        client_factory: Callable creating the SSH client (paramiko.SSHClient or a simulation).
+        fetch (bool): Fetch the images after every capture.
+        cache (ImageCache | None): Destination of fetched images (created on the first fetch).
+        camera_dirs (dict): Remote image directory per camera.
+        last_transfer (TransferStats | None): Stats of the most recent fetch.
+    """
+    def __init__(self, pi_ip: str, username: str = "dev", password: str = "admin0",
+                 script_path: str = "/home/dev/Desktop/automata/capture_both_cameras.py",
+                 exposure_marker: Optional[str] = None, keepalive: int = 15,
+                 client_factory: Optional[Callable[[], paramiko.SSHClient]] = None,
+                 fetch: bool = True, cache: Optional[ImageCache] = None,
+                 camera_dirs: Dict[str, str] = REMOTE_CAPTURE_DIRS) -> None:
+        self.pi_ip = pi_ip
+        self.username = username
+        self.password = password
+        self.script_path = script_path
+        self.exposure_marker = exposure_marker
+        self.keepalive = keepalive
+        self.client_factory = client_factory or paramiko.SSHClient
+        self.fetch = fetch
+        self.cache = cache
+        self.camera_dirs = camera_dirs
+        self.last_transfer: Optional[TransferStats] = None
+        self.connect_time: Optional[float] = None
+        self._client: Optional[paramiko.SSHClient] = None
+        self._lock = threading.Lock()
+        self._warming: Optional[threading.Thread] = None
+
+    @property
+    def is_warm(self) -> bool:
+        client = self._client
+        transport = client.get_transport() if client else None
+        return bool(transport and transport.is_active())
+
+    def warm(self) -> bool:
+        """
+        Connect unless a live connection already exists.
+
+        :return: True if the session is connected.
+        """
+        with self._lock:
+            if self.is_warm:
+                return True
+            if self._client:
+                self._client.close()
+            client = self.client_factory()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            start = time.perf_counter()
+            try:
+                client.connect(self.pi_ip, username=self.username, password=self.password)
+            except Exception as e:
+                logger.error(f"SSH warm-up to {self.pi_ip} failed: {e}")
+                client.close()
+                self._client = None
+                return False
+            client.get_transport().set_keepalive(self.keepalive)
+            self.connect_time = time.perf_counter() - start
+            self._client = client
+            logger.info(f"SSH session to {self.pi_ip} ready in {self.connect_time:.2f} s.")
+            return True
+
+    def warm_async(self) -> None:
+        """Start warm() on a background thread unless one is already running."""
+        if self.is_warm or (self._warming and self._warming.is_alive()):
+            return
+        self._warming = threading.Thread(target=self.warm, name="ssh-warmup", daemon=True)
+        self._warming.start()
+
+    def capture(self, on_exposed: Optional[Callable[[], None]] = None, fetch: Optional[bool] = None,
+                cache: Optional[ImageCache] = None) -> bool:
+        """
+        Run the capture script on the (warm) session.
+
+        :param on_exposed: Called once when the exposure is confirmed.
+        :param fetch: Retrieve the captured images into the local cache afterwards
+                      (defaults to the session's fetch setting).
+        :param cache: Destination cache for fetched images (defaults to the session's cache).
+        :return: True if the script succeeded (and the fetch, if requested).
+        """
+        self.last_transfer = None
+        if not self.warm():
+            return False
+        exposed = False
+        stdout = None
+        try:
+            stdin, stdout, stderr = self._client.exec_command(f"python3 {self.script_path}")
+            for line in stdout:
+                line = line.strip()
+                if line:
+                    logger.info("Capture output: " + line)
+                if not exposed and self.exposure_marker and self.exposure_marker in line:
+                    exposed = True
+                    if on_exposed:
+                        on_exposed()
+            status = stdout.channel.recv_exit_status()
+            error_output = stderr.read().decode('utf-8').strip()
+            if error_output:
+                logger.error("Capture error: " + error_output)
+            if status != 0:
+                logger.error(f"Capture script exited with status {status}.")
+                return False
+            if not exposed and on_exposed:
+                on_exposed()
+            if self.fetch if fetch is None else fetch:
+                return not self.fetch_captured(cache).errors
+            return True
+        except Exception as e:
+            logger.error("SSH capture error: " + str(e))
+            self.close()
+            return False
+        finally:
+            # Each exec opens a channel on the shared transport; release it now, not on GC.
+            if stdout is not None:
+                stdout.channel.close()
+
+    def fetch_captured(self, cache: Optional[ImageCache] = None) -> TransferStats:
+        """
+        Fetch the captured images not cached yet over the open session.
+
+        SFTP uses channels of its own, so this may run while the next capture executes.
+
+        :param cache: Destination cache (defaults to the session's cache).
+        :return: Transfer stats; errors is set if the fetch failed or the session is closed.
+        """
+        if cache is None:
+            if self.cache is None:
+                self.cache = ImageCache()
+            cache = self.cache
+        client = self._client
+        if client is None:
+            stats = TransferStats()
+            stats.errors.append("SSH session closed")
+        else:
+            stats = fetch_images(lambda: SFTPTransport(client), self.camera_dirs, cache)
+        self.last_transfer = stats
+        if stats.errors:
+            logger.error(f"Image fetch failed: {'; '.join(stats.errors)}")
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._client:
+                self._client.close()
+                self._client = None
+
+
+def capture_images(pi_ip: str, username: str = "dev", password: str = "admin0",
+                   script_path: str = "/home/dev/Desktop/automata/capture_both_cameras.py",
+                   fetch: bool = False, cache: Optional[ImageCache] = None) -> bool:
     """
     Executes the capture script on the Raspberry Pi via SSH.
 
     Connects to the specified Raspberry Pi using SSH credentials, then executes
-    the capture_both_cameras.py script located at the given path.
+    the capture_both_cameras.py script located at the given path. When fetch is
+    set, the resulting images are retrieved over SFTP on the same session.
 
     :param pi_ip: IP address of the Raspberry Pi.
     :param username: SSH username (default is "dev").
     :param password: SSH password (default is "admin0").
     :param script_path: Full path to the capture script on the Raspberry Pi.
+    :param fetch: Retrieve the captured images into the local cache.
+    :param cache: Destination cache for fetched images.
     :return: True if the command executed successfully, False otherwise.
     """
     client = paramiko.SSHClient()
@@ -46,7 +497,12 @@ def capture_images(pi_ip: str, username: str = "dev", password: str = "admin0",
             logger.info("Capture output: " + output)
         if error_output:
             logger.error("Capture error: " + error_output)
-        
+
+        if fetch:
+            stats = fetch_images(lambda: SFTPTransport(client), cache=cache)
+            if stats.errors:
+                return False
+
         return True
     except Exception as e:
         logger.error("SSH connection or execution error: " + str(e))
@@ -56,7 +512,7 @@ def capture_images(pi_ip: str, username: str = "dev", password: str = "admin0",
 
 if __name__ == "__main__":
     raspberry_ip = "192.168.1.96"  # Replace with your Raspberry Pi's IP address.
-    if capture_images(raspberry_ip):
+    if capture_images(raspberry_ip, fetch=True):
         logger.info("Images captured successfully.")
     else:
         logger.error("Image capture failed.")
@@ -10,7 +10,11 @@ import sys
 import tkinter as tk
 import ttkbootstrap as ttkb
 from gui import MotorControlGUI
+from gui.gui import FETCH_IMAGES
 from gui.serial_comm import SerialInterface
+from gui.calibration import DEFAULT_CALIBRATION_PATH, CalibrationRoutine, CalibrationTable
+from gui.session_store import DEFAULT_DB_PATH, SessionStore
+from gui.telemetry_shm import DEFAULT_SHM_NAME, TelemetryPublisher
 import logging
 import os
 
@@ -52,21 +56,61 @@ def main():
     setup_logging()
     parser = argparse.ArgumentParser(description="Stepper Motor Control GUI")
     parser.add_argument('--port', type=str, default='COM3', help="Serial port for Arduino (e.g., COM3)")
+    parser.add_argument('--baudrate', type=int, default=9600, help="Initial baud rate (firmware default is 9600)")
+    parser.add_argument('--negotiate', action='store_true',
+                        help="Negotiate the fastest reliable baud rate with the firmware after connecting")
+    parser.add_argument('--db', type=str, default=DEFAULT_DB_PATH,
+                        help="SQLite session store path (empty string disables recording)")
+    parser.add_argument('--calibration', type=str, default=DEFAULT_CALIBRATION_PATH,
+                        help="Distance-to-step table pushed to the board (empty string disables)")
+    parser.add_argument('--calibrate', action='store_true',
+                        help="Sweep the axis and save a new calibration table before starting")
+    parser.add_argument('--no-fetch', dest='fetch_images', action='store_false', default=FETCH_IMAGES,
+                        help="Do not fetch the captured images into the local image cache")
+    parser.add_argument('--telemetry-shm', type=str, default=DEFAULT_SHM_NAME,
+                        help="Shared memory name for the live telemetry feed (empty string disables)")
     args = parser.parse_args()
     
-    serial_comm = SerialInterface(port=args.port)
+    serial_comm = SerialInterface(port=args.port, baudrate=args.baudrate)
     logging.info(f"Connecting to serial port {serial_comm.port}.")
     if not serial_comm.connect():
         logging.error("Failed to connect to serial. Exiting.")
         sys.exit(1)
+    if args.negotiate:
+        serial_comm.negotiate_baudrate()
+        logging.info(f"Serial link: {serial_comm.stats}")
+    if args.calibration:
+        routine = CalibrationRoutine(serial_comm)
+        if args.calibrate:
+            try:
+                routine.calibrate(args.calibration)
+            except ValueError as e:
+                # E.g. the sweep timed out or was aborted before collecting two points.
+                logging.error(f"Calibration failed ({e}); keeping the previous table.")
+        if os.path.exists(args.calibration):
+            try:
+                routine.push(CalibrationTable.load(args.calibration))
+            except (OSError, ValueError, KeyError) as e:
+                logging.error(f"Calibration table {args.calibration} unusable ({e}); running without it.")
+    telemetry = None
+    if args.telemetry_shm:
+        try:
+            telemetry = TelemetryPublisher(args.telemetry_shm)
+            telemetry.attach(serial_comm.bus)
+        except FileExistsError as e:
+            # Another GUI on this host already publishes under this name.
+            logging.error(f"{e} Telemetry disabled; pick another name with --telemetry-shm.")
     
     # Create the main window using ttkbootstrap for theming.
     root = ttkb.Window(themename="superhero")
     root.title("Motor and Vacuum Pump Control")
-    app = MotorControlGUI(root, serial_comm)
+    session_store = SessionStore(args.db, port=args.port) if args.db else None
+    app = MotorControlGUI(root, serial_comm, session_store, fetch_images=args.fetch_images)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
     
+    if telemetry:
+        telemetry.close()
     serial_comm.disconnect()
     logging.info("Application closed successfully.")
 
@@ -0,0 +1,33 @@
+"""Benchmark comparison tests: normalised metrics are compared as such, and foreign baselines never gate."""
+
+from benchmarks.run_benchmarks import compare, machine_mismatch, metric
+
+MACHINE = {"python": "3.11.7", "platform": "Linux-x86_64", "machine": "x86_64", "cpus": 4, "tk": "stub"}
+
+
+def results(value, normalized=None, **meta):
+    rate = metric(value, "lines/s", True, cpu_bound=normalized is not None)
+    if normalized is not None:
+        rate["normalized"] = normalized
+    return {"meta": dict(MACHINE, **meta), "metrics": {"bench.rate": rate}}
+
+
+def test_normalised_value_decides_regression():
+    # Half the raw rate on a machine that ran half as fast is not a regression.
+    [row] = compare(results(500.0, normalized=1.0), results(1000.0, normalized=1.0))
+    assert row["normalized"] and row["change_pct"] == 0.0 and not row["regressed"]
+    [row] = compare(results(500.0, normalized=0.5), results(1000.0, normalized=1.0))
+    assert row["regressed"]
+
+
+def test_raw_value_used_without_normalisation():
+    [row] = compare(results(500.0), results(1000.0))
+    assert not row["normalized"] and row["change_pct"] == -50.0 and row["regressed"]
+
+
+def test_baseline_from_other_machine_never_regresses():
+    baseline = results(1000.0, cpus=16, python="3.12.1")
+    current = results(100.0)
+    assert machine_mismatch(current, baseline) == ["python: 3.12.1 -> 3.11.7", "cpus: 16 -> 4"]
+    [row] = compare(current, baseline)
+    assert row["change_pct"] == -90.0 and not row["regressed"]
@@ -0,0 +1,65 @@
+"""Calibration tests: interpolation accuracy of fitted, reduced tables and persistence."""
+
+import math
+import random
+
+import pytest
+
+from gui.calibration import CalibrationTable, make_monotonic
+from gui.config import CAL_TABLE_CAPACITY, CAL_VERIFY_TOLERANCE_CM, STEPS_PER_CM
+
+POSITIONS = range(-250, 2751, 125)  # The default sweep: 0.5 cm stops, 1 cm beyond both targets.
+GRID = range(-250, 2751, 5)
+
+
+def reference(steps):
+    """Nonlinear sensor: linear travel plus a 0.3 cm systematic bias."""
+    return 20.0 - steps / STEPS_PER_CM + 0.3 * math.sin(math.pi * steps / 1500.0)
+
+
+def sweep(noise_cm, seed, samples_per_point=5):
+    rng = random.Random(seed)
+    return [(s, sum(reference(s) + rng.gauss(0.0, noise_cm) for _ in range(samples_per_point)) / samples_per_point)
+            for s in POSITIONS]
+
+
+def test_make_monotonic_pools_violations():
+    fitted = make_monotonic([(0, 20.0), (100, 19.0), (200, 19.4), (300, 18.0)])
+    assert [s for s, _ in fitted] == [0, 100, 200, 300]
+    assert fitted[1][1] == fitted[2][1] == pytest.approx(19.2)
+    assert all(d0 >= d1 for (_, d0), (_, d1) in zip(fitted, fitted[1:]))
+
+
+def test_noise_free_table_interpolates_closely():
+    table = CalibrationTable.fit([(s, reference(s)) for s in POSITIONS]).reduce()
+    accuracy = table.accuracy(reference, GRID)
+    assert len(table.points) <= CAL_TABLE_CAPACITY
+    assert accuracy["max_error_cm"] < 0.02
+    assert accuracy["max_error_steps"] <= 5
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_noisy_table_stays_within_bounds(seed):
+    table = CalibrationTable.fit(sweep(noise_cm=0.05, seed=seed)).reduce()
+    accuracy = table.accuracy(reference, GRID)
+    assert len(table.points) <= CAL_TABLE_CAPACITY
+    assert accuracy["max_error_cm"] < 0.1
+    assert accuracy["max_error_steps"] <= 25
+    assert accuracy["max_error_cm"] < CAL_VERIFY_TOLERANCE_CM
+
+
+def test_fit_rejects_sweeps_without_two_points():
+    with pytest.raises(ValueError):
+        CalibrationTable.fit([(0, 20.0)])
+    with pytest.raises(ValueError):
+        CalibrationTable.fit([])
+
+
+def test_save_load_round_trip(tmp_path):
+    table = CalibrationTable.fit(sweep(noise_cm=0.05, seed=1)).reduce()
+    path = str(tmp_path / "calibration" / "table.json")
+    table.save(path)
+    loaded = CalibrationTable.load(path)
+    assert loaded.points == table.points
+    assert loaded.created == table.created
+    assert loaded.commands() == table.commands()
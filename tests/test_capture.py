@@ -0,0 +1,167 @@
+"""Capture tests: images are fetched after every capture, a failed fetch fails the capture and a slow
+fetch does not block the next capture."""
+
+import os
+import threading
+import time
+
+import pytest
+
+from gui.capture_scheduler import CaptureScheduler
+from remote_capture import CaptureSession, ImageCache
+
+
+class FakeFile:
+    def __init__(self, path):
+        self._f = open(path, "rb")
+
+    def prefetch(self, size):
+        pass
+
+    def read(self, n=-1):
+        return self._f.read(n)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+
+
+class FakeSFTP:
+    def __init__(self, root, fail, delay=0.0):
+        self.root = root
+        self.fail = fail
+        self.delay = delay
+
+    def listdir_attr(self, directory):
+        time.sleep(self.delay)
+        if self.fail:
+            raise IOError("SFTP channel closed")
+        local = os.path.join(self.root, directory.lstrip("/"))
+        entries = []
+        for name in sorted(os.listdir(local)):
+            st = os.stat(os.path.join(local, name))
+            attr = type("Attr", (), {})()
+            attr.filename, attr.st_mode, attr.st_size, attr.st_mtime = name, st.st_mode, st.st_size, st.st_mtime
+            entries.append(attr)
+        return entries
+
+    def open(self, path, mode):
+        return FakeFile(os.path.join(self.root, path.lstrip("/")))
+
+    def close(self):
+        pass
+
+
+class FakeStream:
+    def __init__(self, lines=()):
+        self.lines = list(lines)
+        self.channel = self
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def recv_exit_status(self):
+        return 0
+
+    def read(self):
+        return b""
+
+    def close(self):
+        pass
+
+
+class FakeClient:
+    """paramiko.SSHClient stand-in: the capture script succeeds, SFTP serves a local directory."""
+    def __init__(self, root, fail_fetch=False, fetch_delay=0.0):
+        self.root = root
+        self.fail_fetch = fail_fetch
+        self.fetch_delay = fetch_delay
+        self.transport = self
+
+    def set_missing_host_key_policy(self, policy):
+        pass
+
+    def connect(self, host, username=None, password=None):
+        pass
+
+    def get_transport(self):
+        return self.transport
+
+    def is_active(self):
+        return True
+
+    def set_keepalive(self, interval):
+        pass
+
+    def exec_command(self, command):
+        return FakeStream(), FakeStream(["cam0 ok", "cam1 ok"]), FakeStream()
+
+    def open_sftp(self):
+        return FakeSFTP(self.root, self.fail_fetch, self.fetch_delay)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def remote(tmp_path):
+    dirs = {}
+    for cam in ("cam0", "cam1"):
+        directory = tmp_path / "remote" / cam
+        directory.mkdir(parents=True)
+        (directory / "img.jpg").write_bytes(cam.encode() * 1000)
+        dirs[cam] = f"/remote/{cam}"
+    return tmp_path, dirs
+
+
+def run_capture(root, dirs, fail_fetch=False):
+    session = CaptureSession("pi", client_factory=lambda: FakeClient(str(root), fail_fetch),
+                             cache=ImageCache(str(root / "cache")), camera_dirs=dirs)
+    results = []
+    done = threading.Event()
+    scheduler = CaptureScheduler(session, lambda command: True,
+                                 on_result=lambda *args: (results.append(args), done.set()))
+    assert scheduler.trigger()
+    assert done.wait(5)
+    return results[0]
+
+
+def test_capture_fetches_images_by_default(remote):
+    root, dirs = remote
+    success, _, latency, _, transfer = run_capture(root, dirs)
+    assert success
+    assert latency is not None
+    assert transfer.fetched == 2 and not transfer.errors
+    assert len(set(transfer.digests.values())) == 2
+
+
+def test_failed_fetch_fails_the_capture(remote):
+    root, dirs = remote
+    success, _, _, _, transfer = run_capture(root, dirs, fail_fetch=True)
+    assert not success
+    assert transfer.errors
+
+
+def test_slow_fetch_does_not_block_next_capture(remote):
+    root, dirs = remote
+    session = CaptureSession("pi", client_factory=lambda: FakeClient(str(root), fetch_delay=0.5),
+                             cache=ImageCache(str(root / "cache")), camera_dirs=dirs)
+    sent, results = [], []
+    done = threading.Event()
+    scheduler = CaptureScheduler(session, lambda command: sent.append(command) or True,
+                                 on_result=lambda *args: (results.append(args), len(results) == 2 and done.set()))
+    assert scheduler.trigger(resume=True, t=1.0)
+    deadline = time.monotonic() + 5
+    while sent != ["RESUME"] or scheduler._busy.locked():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    # The first capture's images are still being fetched when the next CAPTURE arrives.
+    assert not results
+    assert scheduler.trigger(resume=True, t=2.0)
+    assert done.wait(5)
+    assert sent == ["RESUME", "RESUME"]
+    assert [(success, start) for success, start, *_ in results] == [(True, 1.0), (True, 2.0)]
+    assert results[0][4].fetched == 2 and results[1][4].skipped == 2
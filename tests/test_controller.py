@@ -0,0 +1,40 @@
+"""Distance controller tests: a sensor that stops reporting stops the loop."""
+
+import time
+
+from gui.controller import STALE_MEASUREMENT_S, DistanceController
+
+
+def wait_stopped(controller, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while controller.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return not controller.active
+
+
+def test_stale_measurement_sends_zero_velocity_and_stops():
+    sent, faults = [], []
+    controller = DistanceController(lambda line: sent.append(line) or True, on_fault=faults.append)
+    controller.start(10.0)
+    controller.update_measurement(15.0)
+
+    assert wait_stopped(controller)
+    assert any(line != "VEL 0" for line in sent[:-1])  # It drove while the sample was fresh.
+    assert sent[-1] == "VEL 0"
+    assert len(faults) == 1
+    count = len(sent)
+    time.sleep(3 * STALE_MEASUREMENT_S)
+    assert len(sent) == count  # No keepalive after the stop.
+
+
+def test_restart_ignores_measurement_of_previous_run():
+    sent = []
+    controller = DistanceController(lambda line: sent.append(line) or True)
+    controller.start(10.0)
+    controller.update_measurement(15.0)
+    assert wait_stopped(controller)
+
+    sent.clear()
+    controller.start(10.0)
+    assert wait_stopped(controller)
+    assert sent == ["VEL 0"]
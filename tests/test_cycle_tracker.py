@@ -0,0 +1,57 @@
+"""Cycle tracker tests: late capture results and bounded history."""
+
+from gui.cycle_tracker import CycleTracker
+
+
+def run_cycle(tracker, t0):
+    """Feed one auto cycle starting at t0; CAPTURE happens at t0 + 5."""
+    tracker.on_event("AUTO", t0)
+    tracker.on_event("CAPTURE", t0 + 5.0)
+    tracker.on_distance(10.0, t0 + 5.1)
+    tracker.on_distance(11.0, t0 + 6.0)
+    tracker.on_event("UPPER_LIMIT", t0 + 10.0)
+    return t0 + 5.0
+
+
+def test_capture_finishing_after_the_cycle_updates_that_cycle():
+    finished = []
+    tracker = CycleTracker(on_cycle=finished.append)
+    capture_t = run_cycle(tracker, 0.0)
+    run_cycle(tracker, 20.0)
+    # The first script only returns now, while the third cycle is running.
+    tracker.on_event("AUTO", 40.0)
+    tracker.on_event("CAPTURE", 45.0)
+
+    assert tracker.on_capture(7.5, t=capture_t) == 1
+    assert finished[0].phases["capture"] == 7.5
+    assert finished[1].phases["capture"] is None
+    assert tracker.on_capture(1.0, t=45.0) == 3
+    assert tracker.on_capture(1.0, t=123.0) is None
+
+
+def test_capture_of_aborted_cycle_is_not_applied_to_the_restart():
+    tracker = CycleTracker()
+    tracker.on_event("AUTO", 0.0)
+    tracker.on_event("CAPTURE", 5.0)
+    tracker.on_event("STOPPED", 6.0)
+    tracker.on_event("AUTO", 7.0)
+    assert tracker.on_capture(2.0, t=5.0) is None
+
+
+def test_history_is_bounded_and_numbering_continues():
+    tracker = CycleTracker(window=5, history_size=10)
+    for i in range(30):
+        run_cycle(tracker, i * 20.0)
+    assert tracker.completed == 30
+    assert tracker.cycle_number == 31
+    assert len(tracker.history) == 10
+    assert tracker.history[-1].number == 30
+    assert tracker.stats()["count"] == 5
+
+
+def test_export_writes_given_cycles(tmp_path):
+    tracker = CycleTracker(window=2, history_size=2)
+    for i in range(4):
+        run_cycle(tracker, i * 20.0)
+    assert tracker.export(str(tmp_path / "recent.csv")) == 2
+    assert tracker.export(str(tmp_path / "all.json"), list(tracker.history) * 2) == 4
@@ -0,0 +1,86 @@
+"""Event bus tests: overflow policies, publisher isolation from slow handlers and publish counters."""
+
+import threading
+import time
+
+from gui.event_bus import BLOCK, DROP_OLDEST, LATEST_ONLY, SERIAL_LINE, EventBus
+
+
+def payloads(events):
+    return [event.payload for event in events]
+
+
+def test_drop_oldest_keeps_newest_events():
+    bus = EventBus()
+    subscription = bus.subscribe(SERIAL_LINE, policy=DROP_OLDEST, maxsize=3)
+    for i in range(5):
+        bus.publish(SERIAL_LINE, str(i))
+    assert payloads(subscription.drain()) == ["2", "3", "4"]
+    assert subscription.dropped == 2
+
+
+def test_latest_only_keeps_last_event():
+    bus = EventBus()
+    subscription = bus.subscribe(SERIAL_LINE, policy=LATEST_ONLY, maxsize=100)
+    for i in range(5):
+        bus.publish(SERIAL_LINE, str(i))
+    assert payloads(subscription.drain()) == ["4"]
+    assert subscription.dropped == 4
+
+
+def test_block_waits_for_room_then_drops_after_timeout():
+    bus = EventBus()
+    subscription = bus.subscribe(SERIAL_LINE, policy=BLOCK, maxsize=1, block_timeout=5.0)
+    bus.publish(SERIAL_LINE, "0")
+    publisher = threading.Thread(target=bus.publish, args=(SERIAL_LINE, "1"))
+    publisher.start()
+    time.sleep(0.2)
+    assert publisher.is_alive()  # Full queue: the publisher waits.
+    assert payloads(subscription.drain()) == ["0"]
+    publisher.join(timeout=1)
+    assert not publisher.is_alive()
+    assert payloads(subscription.drain()) == ["1"]
+    assert subscription.dropped == 0
+
+    subscription.block_timeout = 0.1
+    bus.publish(SERIAL_LINE, "2")
+    start = time.monotonic()
+    bus.publish(SERIAL_LINE, "3")
+    assert 0.1 <= time.monotonic() - start < 1.0
+    assert payloads(subscription.drain()) == ["2"]
+    assert subscription.dropped == 1
+
+
+def test_slow_handler_does_not_delay_publish():
+    bus = EventBus()
+    handled = []
+    bus.subscribe(SERIAL_LINE, policy=DROP_OLDEST, maxsize=10,
+                  handler=lambda event: (time.sleep(0.2), handled.append(event.payload)))
+    start = time.monotonic()
+    for i in range(5):
+        bus.publish(SERIAL_LINE, str(i))
+    assert time.monotonic() - start < 0.1
+    deadline = time.monotonic() + 3
+    while len(handled) < 5 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert handled == ["0", "1", "2", "3", "4"]
+    for subscription in bus.subscriptions():
+        bus.unsubscribe(subscription)
+
+
+def test_publish_counters_from_several_threads():
+    bus = EventBus()
+    bus.subscribe(SERIAL_LINE, policy=DROP_OLDEST, maxsize=10)
+
+    def publish_many():
+        for _ in range(5000):
+            bus.publish(SERIAL_LINE, "x")
+
+    threads = [threading.Thread(target=publish_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = bus.stats()
+    assert stats["published"] == 20000
+    assert 0 < stats["mean_publish_us"] <= stats["max_publish_us"]
@@ -0,0 +1,36 @@
+"""GUI threading tests: worker threads never touch Tk widgets directly."""
+
+import threading
+
+import pytest
+
+from benchmarks.headless import build_gui, shutdown_gui
+from gui.event_bus import EventBus
+from gui.serial_comm import SerialInterface
+
+
+@pytest.fixture
+def gui():
+    gui, master = build_gui(SerialInterface(port="TEST", bus=EventBus()))
+    yield gui
+    shutdown_gui(gui, master)
+
+
+def test_capture_result_is_logged_on_the_ui_thread(gui):
+    lines_before = list(gui.text_log.lines)
+    worker = threading.Thread(target=gui.on_capture_result, args=(True, 0.0, 0.5, 1.0))
+    worker.start()
+    worker.join()
+    assert gui.text_log.lines == lines_before
+
+    gui.process_queue()
+    assert any("Remote capture succeeded." in line for line in gui.text_log.lines)
+
+
+def test_log_message_from_worker_is_deferred(gui):
+    worker = threading.Thread(target=gui.log_message, args=("from worker", "WARNING"))
+    worker.start()
+    worker.join()
+    assert not any("from worker" in line for line in gui.text_log.lines)
+    gui.process_queue()
+    assert any("from worker" in line for line in gui.text_log.lines)
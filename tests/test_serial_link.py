@@ -0,0 +1,67 @@
+"""Baud negotiation tests against the simulated device: upgrade, revert and automatic fallback."""
+
+import functools
+import time
+
+import pytest
+
+from gui.event_bus import EventBus
+from gui.serial_comm import DEFAULT_BAUDRATE, LINK_ERROR_WINDOW_LIMIT, NEGOTIATION_RATES, SerialInterface
+from gui.simulator import SimulatedSerialDevice
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+@pytest.fixture
+def connect():
+    interfaces = []
+
+    def factory(**device):
+        serial_comm = SerialInterface(port="SIM", bus=EventBus(), serial_factory=functools.partial(
+            SimulatedSerialDevice, time_scale=10.0, seed=1, **device))
+        assert serial_comm.connect()
+        interfaces.append(serial_comm)
+        return serial_comm, serial_comm.serial_conn
+
+    yield factory
+    for serial_comm in interfaces:
+        serial_comm.disconnect()
+
+
+def test_negotiates_fastest_rate(connect):
+    serial_comm, device = connect()
+    assert serial_comm.negotiate_baudrate(probes=5) == NEGOTIATION_RATES[0]
+    assert device.device_baud == device.baudrate == NEGOTIATION_RATES[0]
+    assert serial_comm.stats.probe_failures == 0
+    assert serial_comm.stats.rtt_ms is not None
+
+
+def test_unreliable_rates_revert_to_the_next_candidate(connect):
+    serial_comm, device = connect(max_reliable_baud=250000, error_rate=1.0)
+    assert serial_comm.negotiate_baudrate(probes=5) == 250000
+    assert device.device_baud == device.baudrate == 250000
+    # 1000000 and 500000 each lost their first probe and were rolled back.
+    assert serial_comm.stats.probe_failures == 2
+    assert serial_comm.stats.fallbacks == 0
+
+
+def test_errors_after_switch_fall_back_to_default_rate(connect):
+    serial_comm, device = connect()
+    assert serial_comm.negotiate_baudrate(probes=5) == NEGOTIATION_RATES[0]
+    errors_before = serial_comm.stats.line_errors
+
+    # The link degrades after the commit: every line from the board arrives garbled.
+    device.max_reliable_baud, device.error_rate = 500000, 1.0
+    assert wait_for(lambda: serial_comm.baudrate == device.device_baud == DEFAULT_BAUDRATE)
+
+    assert serial_comm.stats.baudrate == DEFAULT_BAUDRATE
+    assert serial_comm.stats.fallbacks == 1
+    assert serial_comm.stats.line_errors - errors_before >= LINK_ERROR_WINDOW_LIMIT
+    # The link works again at the default rate.
+    assert serial_comm.send_command("STOP")
+    assert wait_for(lambda: "STOP" in device.received)
@@ -0,0 +1,50 @@
+"""Session store tests: batched rows keep their queue order and close() never hangs."""
+
+import sqlite3
+import time
+
+from gui.session_store import SessionStore
+
+
+def wait_written(store, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while store.written < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return store.written >= count
+
+
+def test_late_capture_updates_follow_their_cycle_in_one_batch(tmp_path):
+    store = SessionStore(str(tmp_path / "s.db"), flush_interval=0.05)
+    store.record_cycle(1, 100.0, 107.0, {"descent": 2.0})
+    assert wait_written(store, 1)
+
+    # Hold the write lock so the next rows pile up into a single batch.
+    lock = sqlite3.connect(store.path, timeout=5.0)
+    lock.execute("BEGIN IMMEDIATE")
+    store.record_distance(12.0)
+    store.record_cycle_capture(1, 1.5)
+    store.record_cycle(2, 107.0, 114.0, {"descent": 2.0})
+    store.record_cycle_capture(2, 1.6)
+    time.sleep(0.2)
+    lock.rollback()
+    lock.close()
+    store.close()
+
+    assert [(cycle, capture) for cycle, _, _, _, _, capture, _ in store.cycles()] == [(1, 1.5), (2, 1.6)]
+
+
+def test_zero_time_is_kept(tmp_path):
+    store = SessionStore(str(tmp_path / "s.db"))
+    store.record_distance(12.0, t=0.0)
+    store.close()
+    assert store.distance_samples() == [(0.0, 12.0)]
+
+
+def test_close_returns_when_writer_is_gone_and_queue_full(tmp_path):
+    store = SessionStore(str(tmp_path / "s.db"), max_queue=2)
+    store.close()
+    store.record_distance(1.0)
+    store.record_distance(2.0)
+    start = time.monotonic()
+    store.close()
+    assert time.monotonic() - start < 1.0
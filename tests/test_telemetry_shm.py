@@ -0,0 +1,61 @@
+"""Telemetry ring tests: stale segments are replaced, live ones are not, and readers never remove the ring."""
+
+import os
+import subprocess
+import sys
+import time
+from multiprocessing import shared_memory
+
+import pytest
+
+from gui.telemetry_shm import (_HEADER, MAGIC, VERSION, _RECORD, TelemetryPublisher, TelemetryReader,
+                               segment_size)
+
+
+@pytest.fixture
+def name():
+    return f"test_telemetry_{os.getpid()}_{time.monotonic_ns()}"
+
+
+def leave_segment(name, owner):
+    """Create a segment as a crashed publisher would leave it and release this process's handle."""
+    shm = shared_memory.SharedMemory(name=name, create=True, size=segment_size(4))
+    _HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, _RECORD.size, 4, owner)
+    shm.close()
+    return shm
+
+
+def test_publisher_replaces_segment_of_dead_owner(name):
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                          capture_output=True, text=True, check=True)
+    leave_segment(name, int(dead.stdout))
+    publisher = TelemetryPublisher(name, capacity=8)
+    try:
+        assert TelemetryReader(name).capacity == 8
+    finally:
+        publisher.close()
+
+
+def test_publisher_refuses_segment_of_running_owner(name):
+    stale = leave_segment(name, os.getpid())
+    try:
+        with pytest.raises(FileExistsError, match=str(os.getpid())):
+            TelemetryPublisher(name, capacity=8)
+    finally:
+        stale.unlink()
+
+
+def test_reader_close_keeps_segment_and_wait_times_out(name):
+    publisher = TelemetryPublisher(name, capacity=8)
+    try:
+        publisher.publish(distance=12.5, state="AUTO")
+        reader = TelemetryReader(name)
+        reader.close()
+        reader = TelemetryReader(name)
+        assert reader.latest().distance == 12.5
+        start = time.monotonic()
+        assert reader.wait(after=0, timeout=0.05, poll_interval=0) == []
+        assert time.monotonic() - start >= 0.05
+        reader.close()
+    finally:
+        publisher.close()
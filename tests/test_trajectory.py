@@ -0,0 +1,51 @@
+"""Trajectory planner tests: planned vs. legacy cycle time and TRAJ encoding."""
+
+import pytest
+
+from gui.config import TRAJ_TOKENS_PER_LINE
+from gui.simulator import TrajectoryExecutor, compare_cycle_times
+from gui.trajectory import CAPTURE_MARKER, TrajectoryPlanner, count_entries, plan_cycle
+
+
+def expand(lines, start=0):
+    """Rebuild absolute setpoints from TRAJ lines the way the firmware does."""
+    points, position = [], start
+    for entry in TrajectoryExecutor.decode(lines):
+        if entry == CAPTURE_MARKER:
+            points.append(CAPTURE_MARKER)
+        else:
+            position += entry
+            points.append(position)
+    return points
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"jerk": 20000.0}, {"max_speed": 2000.0, "acceleration": 6000.0}])
+def test_planned_cycle_is_faster_than_legacy(kwargs):
+    # Both cycles run with the same max_speed/acceleration: the saving is the planner's.
+    result = compare_cycle_times(cycles=2, **kwargs)
+    assert result["planned_cycle_s"] < result["legacy_cycle_s"]
+    assert result["saving_pct"] > 0
+    assert result["final_position_error_steps"] < 1
+
+
+@pytest.mark.parametrize("jerk", [None, 20000.0])
+@pytest.mark.parametrize("start", [0, 137])
+def test_encode_round_trips_sampled_profile(jerk, start):
+    planner = TrajectoryPlanner()
+    segments = plan_cycle(dwell=0.5, jerk=jerk)
+    points = planner.sample(segments, start)
+    lines = planner.encode(points, start)
+
+    assert expand(lines, start) == points
+    assert points.count(CAPTURE_MARKER) == 1
+    assert points[-1] == 0
+    assert all(line.startswith("TRAJ ") for line in lines)
+    assert all(count_entries(line) <= TRAJ_TOKENS_PER_LINE for line in lines)
+
+
+def test_encode_compresses_long_holds():
+    planner = TrajectoryPlanner()
+    points = [5] * 70000 + [CAPTURE_MARKER, 4]
+    lines = planner.encode(points)
+    assert expand(lines) == points
+    assert sum(count_entries(line) for line in lines) == 5  # 5, 0*65535, 0*4464, C, -1